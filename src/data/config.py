@@ -1,4 +1,5 @@
 import logging
+import os
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,59 @@ TIME_RANGE: list[int] = [2002, 2024]
 
 BACI_VERSION: str = "202601"
 
+# Rows read per chunk when streaming raw BACI files. Set to None to read each
+# year file in one go.
+BACI_CHUNK_SIZE: int | None = 2_000_000
+
+# Worker processes used to aggregate BACI years in parallel (1 runs serially).
+BUILD_WORKERS: int = 1
+
+# Threads compressing dataset partitions in parallel when writing the output
+# (1 writes serially).
+WRITE_WORKERS: int = os.cpu_count() or 1
+
+# Partners kept per country, flow, category and year in the top partners rollup.
+ROLLUP_TOP_PARTNERS: int = 20
+
+# Benchmark parquet codecs and value column encodings on a sample of each
+# partitioned dataset before writing it, and write it with the settings that
+# load fastest at TUNING_BANDWIDTH (see encoding.py). When off, the last tuned
+# settings in PATHS.PARQUET_ENCODING are used, if any.
+AUTO_TUNE_ENCODING: bool = False
+TUNING_BANDWIDTH: float = 200_000  # bytes per second, a slow mobile connection
+TUNING_SAMPLE_PARTITIONS: int = 8
+
+# Extra per-stage profiling on top of the timing report written for every run
+# to PATHS.PROFILES: None, "cprofile" (function profiles of top-level stages)
+# or "tracemalloc" (peak Python/NumPy allocations per stage).
+PROFILE_MODE: str | None = None
+
+# Persist the output of each pipeline stage so re-runs resume from the first
+# stage whose inputs or settings changed.
+USE_STAGE_CACHE: bool = True
+
+# Read exchange rates and deflators only from the prebuilt factor table
+# (PATHS.FACTOR_TABLE) instead of resolving IMF data through pydeflate.
+OFFLINE_FACTORS: bool = False
+
+# Execution backend for the pipeline stages: "pandas", "arrow" to keep the
+# data in pyarrow Tables from the BACI cache through to the final write, or
+# "duckdb" to run the whole build as SQL that spills to disk.
+ENGINES: tuple[str, ...] = ("pandas", "arrow", "duckdb")
+ENGINE: str = "pandas"
+
+# Memory DuckDB may use before spilling to PATHS.DUCKDB_TEMP (duckdb engine).
+DUCKDB_MEMORY_LIMIT: str = "4GB"
+
+# Peak memory target of the pandas and arrow engines, e.g. "6GB". When set,
+# BACI years are processed in chunks sized to fit and streamed into the
+# dataset writer (see chunked.py); None processes every year at once.
+MEMORY_BUDGET: str | None = None
+
+# Product granularity of the duckdb engine: "section" (hs_sections.json) or
+# "chapter" (HS2 chapters from hs_categories.json).
+PRODUCT_LEVEL: str = "section"
+
 
 class PATHS:
     """Class to store the paths to the data."""
@@ -33,10 +87,23 @@ class PATHS:
     HS_SECTIONS = SETTINGS / "hs_sections.json"
     HS_CATEGORIES = SETTINGS / "hs_categories.json"
     COUNTRY_GROUPS = SETTINGS / "country_groups.json"
+    PARQUET_ENCODING = SETTINGS / "parquet_encoding.json"
 
     DATA = SRC / "data" / "raw_data"
     PYDEFLATE = DATA / "pydeflate"
     BACI = DATA / f"BACI_HS02_V{BACI_VERSION}"
     COUNTRY_CODES = BACI / f"country_codes_V{BACI_VERSION}.csv"
+    PRODUCT_CODES = BACI / f"product_codes_HS02_V{BACI_VERSION}.csv"
+    TRADE_CACHE = DATA / "trade_cache"
+    STAGE_CACHE = DATA / "stage_cache"
+    FACTOR_TABLE = DATA / "conversion_factors.parquet"
+    PLACE_NAMES = DATA / "place_names.json"
+    MAPPINGS_SNAPSHOT = DATA / "mappings.pickle"
+    BUILD_STATE = DATA / "build_state.json"
+    DUCKDB_TEMP = DATA / "duckdb_tmp"
+    CHUNK_SPILL = DATA / "chunk_spill"
+    PROFILES = DATA / "profiles"
+    SYNTHETIC_BACI = DATA / "synthetic_baci"
+    BENCHMARKS = DATA / "benchmarks"
 
     COMPONENTS = SRC / "components"
@@ -0,0 +1,407 @@
+from collections.abc import Callable, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.data.config import logger
+from src.data.scripts.codes import FLOWS, TOTAL_CATEGORY
+from src.data.scripts.transformations import (
+    factor_lookup,
+    group_index,
+    group_view_codes,
+    pydeflate_factors,
+)
+
+# Index type of every dictionary column built by the Arrow stages, so chunks
+# from different stages can always be concatenated.
+DICTIONARY_INDEX = pa.int32()
+
+# pyarrow 25 takes null placement per sort key and deprecates the global option.
+NULLS_PER_SORT_KEY: bool = int(pa.__version__.split(".")[0]) >= 25
+
+
+def dictionary_array(codes: np.ndarray, dictionary: pa.Array) -> pa.DictionaryArray:
+    """Build a dictionary array from integer codes (-1 for null)."""
+    indices = pa.array(codes.astype("int32"), mask=codes < 0)
+    return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+
+def column_dictionary(column: pa.ChunkedArray) -> pa.Array:
+    """Return the dictionary of a column encoded by ``encode_dictionary``."""
+    if column.num_chunks == 0:
+        return pa.array([], column.type.value_type)
+    return column.chunk(0).dictionary
+
+
+def encode_dictionary(column: pa.ChunkedArray, dictionary: pa.Array) -> pa.ChunkedArray:
+    """Return ``column`` as dictionary chunks sharing ``dictionary``.
+
+    Chunks already using ``dictionary`` only have their indices cast; other
+    dictionary chunks are remapped through their (small) dictionary, and plain
+    chunks are looked up value by value. Values outside ``dictionary`` become
+    null.
+    """
+    chunks = []
+    for chunk in column.chunks:
+        if pa.types.is_dictionary(chunk.type):
+            if chunk.dictionary.equals(dictionary):
+                indices = chunk.indices
+            else:
+                remap = pc.index_in(chunk.dictionary, value_set=dictionary)
+                indices = pc.take(remap, chunk.indices)
+        else:
+            indices = pc.index_in(chunk, value_set=dictionary)
+        chunks.append(
+            pa.DictionaryArray.from_arrays(indices.cast(DICTIONARY_INDEX), dictionary)
+        )
+    return pa.chunked_array(chunks, type=pa.dictionary(DICTIONARY_INDEX, dictionary.type))
+
+
+def encode_table(table: pa.Table, dictionaries: Mapping[str, pa.Array]) -> pa.Table:
+    """Encode the given columns of ``table`` over fixed dictionaries."""
+    for name, dictionary in dictionaries.items():
+        table = table.set_column(
+            table.schema.get_field_index(name),
+            name,
+            encode_dictionary(table[name], dictionary),
+        )
+    return table
+
+
+def dictionary_indices(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Return the indices of a column encoded by ``encode_dictionary``."""
+    return pa.chunked_array(
+        [chunk.indices for chunk in column.chunks], type=column.type.index_type
+    )
+
+
+def dictionary_codes(column: pa.ChunkedArray) -> np.ndarray:
+    """Return the indices of a dictionary column as int64 codes (-1 for null)."""
+    return (
+        pc.fill_null(dictionary_indices(column), -1).to_numpy().astype("int64")
+    )
+
+
+def sort_table(table: pa.Table, keys: Sequence[str]) -> pa.Table:
+    """Stable sort of ``table`` by ``keys``, with nulls last.
+
+    Dictionary columns are sorted by their indices. Every dictionary built by
+    this pipeline is sorted, so this matches sorting by value.
+    """
+    if not keys:
+        return table
+    sort_keys = pa.table(
+        {
+            key: dictionary_indices(table[key])
+            if pa.types.is_dictionary(table.schema.field(key).type)
+            else table[key]
+            for key in keys
+        }
+    )
+    if NULLS_PER_SORT_KEY:
+        order = pc.sort_indices(
+            sort_keys, sort_keys=[(key, "ascending", "at_end") for key in keys]
+        )
+    else:
+        order = pc.sort_indices(
+            sort_keys,
+            sort_keys=[(key, "ascending") for key in keys],
+            null_placement="at_end",
+        )
+    return table.take(order)
+
+
+def long_with_totals_table(
+    table: pa.Table,
+    sections: pd.CategoricalDtype,
+) -> pa.Table:
+    """Drop missing values and add "All products" totals to long trade data.
+
+    Arrow counterpart of ``melt_with_totals``: the aggregated BACI data is
+    already long, so no pivot/melt round trip is needed.
+
+    Args:
+        table: Aggregated trade (year, exporter_iso3, importer_iso3, category, value).
+        sections: HS section code table used to encode ``category``.
+    """
+    base_cols = ["year", "exporter_iso3", "importer_iso3"]
+    dictionary = pa.array(sections.categories, pa.string())
+
+    table = table.filter(pc.is_valid(table["value"]))
+    table = encode_table(table, {"category": dictionary})
+
+    grouped = table.group_by(base_cols).aggregate([("value", "sum")])
+    total_code = np.full(grouped.num_rows, sections.categories.get_loc(TOTAL_CATEGORY))
+    totals = pa.table(
+        {
+            **{col: grouped[col] for col in base_cols},
+            "category": dictionary_array(total_code, dictionary),
+            "value": grouped["value_sum"],
+        }
+    )
+
+    return pa.concat_tables([table, totals.select(table.column_names)])
+
+
+def add_currencies_and_prices_table(
+    table: pa.Table,
+    id_column: str,
+    factor_source: Callable[[pd.DataFrame, str], pd.DataFrame] = pydeflate_factors,
+) -> pa.Table:
+    """Arrow counterpart of ``add_currencies_and_prices``.
+
+    Factors are looked up per unique ``(id_column, year)`` pair from the id
+    column's dictionary codes and applied with Arrow compute kernels.
+    """
+    if id_column not in table.column_names:
+        raise KeyError(f"'{id_column}' column not found in table")
+
+    logger.info("Adding currency and price columns")
+
+    value_cols, factor_matrix, positions = factor_lookup(
+        dictionary_codes(table[id_column]),
+        column_dictionary(table[id_column]).to_pylist(),
+        table["year"].to_numpy(),
+        id_column,
+        factor_source,
+    )
+
+    value = pc.cast(table["value"], pa.float32())
+    positions = pa.array(positions)
+    converted = {
+        col: pc.multiply(
+            pa.array(factor_matrix[:, j], from_pandas=True).take(positions), value
+        )
+        for j, col in enumerate(value_cols)
+    }
+    result = table.drop_columns("value")
+    for col in value_cols:
+        result = result.append_column(col, converted[col])
+
+    if value_cols:
+        zero_mask = pc.fill_null(pc.equal(converted[value_cols[0]], 0), False)
+        for col in value_cols[1:]:
+            zero_mask = pc.or_(zero_mask, pc.fill_null(pc.equal(converted[col], 0), False))
+        n_zero = pc.sum(zero_mask).as_py() or 0
+        if n_zero:
+            logger.info(
+                "Dropping %s rows with zero values across currency columns",
+                f"{n_zero:,}",
+            )
+            result = result.filter(pc.invert(zero_mask))
+
+    return result
+
+
+def remap_dictionary_column(
+    column: pa.ChunkedArray,
+    codes: np.ndarray,
+    dictionary: pa.Array,
+) -> pa.DictionaryArray:
+    """Map each dictionary entry of ``column`` to a code of a new dictionary.
+
+    Args:
+        column: Column encoded by ``encode_dictionary``.
+        codes: New code for each entry of the column's dictionary (-1: null).
+        dictionary: The new dictionary.
+    """
+    # Null entries (-1) index the trailing sentinel
+    remap = np.append(codes, -1)
+    return dictionary_array(remap[dictionary_codes(column)], dictionary)
+
+
+def add_country_groups_table(
+    table: pa.Table,
+    membership: pd.DataFrame,
+    group_to_iso: Mapping[str, Sequence[str]],
+) -> pa.Table:
+    """Arrow counterpart of ``add_country_groups``.
+
+    The views are computed by ``group_view_codes`` straight from the
+    dictionary indices of the ISO3, name and category columns, and built
+    back as dictionary arrays over the same dictionaries plus the group
+    names. Only the dictionaries themselves are read as strings.
+    """
+    logger.info("Adding country groups...")
+
+    value_cols = [c for c in table.column_names if c.startswith("value_")]
+    if table.num_rows == 0:
+        return table
+
+    iso3 = column_dictionary(table["exporter_iso3"])
+    table = encode_table(table, {"importer_iso3": iso3})
+    names = column_dictionary(table["exporter"])
+    table = encode_table(table, {"importer": names})
+    sections = column_dictionary(table["category"])
+
+    countries = pd.Index(iso3.to_pylist())
+    parties = pd.Index(sorted({*names.to_pylist(), *group_index(membership)} - {None}))
+    # Name codes to party codes; nulls (-1) index the trailing sentinel
+    name_to_party = np.append(parties.get_indexer(names.to_pylist()), -1)
+
+    year_type = table.schema.field("year").type
+    year_values, year_codes = np.unique(table["year"].to_numpy(), return_inverse=True)
+    views = group_view_codes(
+        year_codes,
+        dictionary_codes(table["category"]),
+        dictionary_codes(table["exporter_iso3"]),
+        dictionary_codes(table["importer_iso3"]),
+        name_to_party[dictionary_codes(table["exporter"])],
+        name_to_party[dictionary_codes(table["importer"])],
+        np.column_stack(
+            [table[col].to_numpy().astype("float64") for col in value_cols]
+        ),
+        [len(year_values), len(sections)],
+        countries,
+        parties,
+        membership,
+        group_to_iso,
+    )
+
+    party_dictionary = pa.array(parties, pa.string())
+
+    def view_table(year, category, exporter, exporter_iso3, importer, importer_iso3, sums):
+        n = len(year)
+        return pa.table(
+            {
+                "year": pa.array(year_values[year], year_type),
+                "category": dictionary_array(category, sections),
+                "exporter_iso3": dictionary_array(np.broadcast_to(exporter_iso3, n), iso3),
+                "exporter": dictionary_array(np.broadcast_to(exporter, n), party_dictionary),
+                "importer_iso3": dictionary_array(np.broadcast_to(importer_iso3, n), iso3),
+                "importer": dictionary_array(np.broadcast_to(importer, n), party_dictionary),
+                **{
+                    col: pa.array(sums[:, j].astype("float32"))
+                    for j, col in enumerate(value_cols)
+                },
+            }
+        )
+
+    return pa.concat_tables([view_table(*view) for view in views])
+
+
+def reshape_to_country_flow_table(table: pa.Table) -> pa.Table:
+    """Arrow counterpart of ``reshape_to_country_flow``.
+
+    The exports and imports orientations are column selections of the input,
+    concatenated without copying, so the only allocation is the sorted output.
+    """
+    logger.info("Reshaping trade data to country/partner/flow structure...")
+
+    value_cols = [c for c in table.column_names if c.startswith("value_")]
+    n = table.num_rows
+
+    parties = pa.array(
+        sorted(
+            set(column_dictionary(table["exporter"]).to_pylist())
+            | set(column_dictionary(table["importer"]).to_pylist())
+        ),
+        pa.string(),
+    )
+    table = encode_table(table, {"exporter": parties, "importer": parties})
+    flows = pa.array(FLOWS.categories, pa.string())
+
+    def orientation(country: str, partner: str, flow: int) -> pa.Table:
+        return pa.table(
+            {
+                "year": table["year"],
+                "country": table[country],
+                "partner": table[partner],
+                "flow": dictionary_array(np.full(n, flow), flows),
+                "category": table["category"],
+                **{col: table[col] for col in value_cols},
+            }
+        )
+
+    combined = pa.concat_tables(
+        [
+            orientation("exporter", "importer", 0),
+            orientation("importer", "exporter", 1),
+        ]
+    )
+    return sort_table(combined, ["country", "partner", "flow", "year", "category"])
+
+
+# Rows converted per step by ``value_units``, bounding its float scratch buffer
+UNIT_CHUNK_ROWS: int = 1_000_000
+INT32_MAX: int = 2_147_483_647
+
+
+def value_units(
+    values: np.ndarray,
+    dtype: np.dtype | str | None = None,
+    chunk_rows: int = UNIT_CHUNK_ROWS,
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """Convert values in millions to rounded integer units in one pass.
+
+    Chunks of ``values`` are scaled and rounded in a reused scratch buffer and
+    written straight into an int32 array, which is widened to int64 only if a
+    value needs it. NaN becomes 0 in the output and True in the mask.
+
+    Args:
+        values: Float values in millions.
+        dtype: Float type the arithmetic is done in (defaults to that of
+            ``values``).
+        chunk_rows: Rows per chunk.
+
+    Returns:
+        Integer units, missing value mask and the largest absolute value in
+        units (NaN if every value is missing).
+    """
+    dtype = np.dtype(dtype or values.dtype)
+    n = len(values)
+    units = np.empty(n, dtype="int32")
+    missing = np.empty(n, dtype=bool)
+    scratch = np.empty(min(n, chunk_rows), dtype=dtype)
+    max_abs_value = np.nan
+
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        chunk = scratch[: stop - start]
+        np.multiply(values[start:stop], 1e6, out=chunk, dtype=dtype)
+        np.rint(chunk, out=chunk)
+
+        chunk_max = max(np.fmax.reduce(chunk), -np.fmin.reduce(chunk))
+        if not np.isnan(chunk_max):
+            max_abs_value = np.fmax(max_abs_value, chunk_max)
+            if max_abs_value > INT32_MAX and units.dtype != np.int64:
+                units = units.astype("int64")
+
+        np.isnan(chunk, out=missing[start:stop])
+        chunk[missing[start:stop]] = 0
+        units[start:stop] = chunk
+
+    return units, missing, float(max_abs_value)
+
+
+def log_units_type(col: str, max_abs_value: float) -> None:
+    """Log the integer type chosen for a value column from its largest value."""
+    if np.isnan(max_abs_value):
+        logger.info(f"Column {col}: All NaN, using Int32")
+    elif max_abs_value > INT32_MAX:
+        logger.info(f"Column {col}: Max value {max_abs_value:,.0f} requires Int64")
+    else:
+        logger.info(f"Column {col}: Max value {max_abs_value:,.0f} fits in Int32")
+
+
+def convert_table_values_to_units(table: pa.Table) -> pa.Table:
+    """Arrow counterpart of ``convert_values_to_units``.
+
+    Each value column becomes an int32 (or int64 when needed) array in units,
+    with nulls carried in the validity bitmap. Values are converted by
+    ``value_units`` in the column's own float precision, as the pandas engine
+    does, so both engines write the same integers. Only one column is copied
+    out of Arrow at a time.
+    """
+    value_cols = [c for c in table.column_names if c.startswith("value_")]
+
+    for col in value_cols:
+        units, missing, max_abs_value = value_units(table[col].to_numpy())
+        log_units_type(col, max_abs_value)
+        table = table.set_column(
+            table.schema.get_field_index(col), col, pa.array(units, mask=missing)
+        )
+
+    return table
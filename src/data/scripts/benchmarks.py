@@ -0,0 +1,249 @@
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from src.data.config import PATHS, logger
+from src.data.scripts.helper_functions import (
+    convert_values_to_units,
+    write_partitioned_dataset,
+)
+from src.data.scripts.profiling import Profiler, record_output
+from src.data.scripts.synthetic import synthetic_factors, write_synthetic_baci
+from src.data.scripts.trade import (
+    add_country_names,
+    filter_and_aggregate_data,
+    load_mappings,
+    melt_with_totals,
+)
+from src.data.scripts.transformations import (
+    add_country_groups,
+    add_currencies_and_prices,
+    reshape_to_country_flow,
+)
+
+
+def git_commit() -> str:
+    """Return the short hash of the checked out commit ("unknown" outside git)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(
+    name: str,
+    func: Callable[[], object],
+    data,
+    repeats: int = 3,
+) -> tuple[object, dict]:
+    """Time ``func`` over ``repeats`` runs, then measure its peak memory.
+
+    The peak is taken from a separate run under tracemalloc, so tracing does
+    not slow down the timed runs.
+
+    Returns:
+        The output of ``func`` and the benchmark's result row.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    profiler = Profiler("tracemalloc")
+    with profiler.stage(name, data) as record:
+        output = func()
+        record_output(record, output)
+
+    best = min(timings)
+    rows = record.rows_in or 0
+    logger.info("%s: %.3fs best of %s, %s rows/s", name, best, repeats, f"{rows / best:,.0f}")
+    return output, {
+        "name": name,
+        "rows": rows,
+        "best_s": best,
+        "mean_s": sum(timings) / len(timings),
+        "rows_per_s": rows / best if best else None,
+        "traced_peak_mb": record.traced_peak_mb,
+        "bytes_in": record.bytes_in,
+        "bytes_out": record.bytes_out,
+    }
+
+
+def run_benchmarks(
+    rows_per_year: int = 200_000,
+    years: Sequence[int] = (2021, 2022),
+    repeats: int = 3,
+    seed: int = 0,
+) -> dict:
+    """Benchmark the pandas pipeline stages on synthetic BACI data.
+
+    Each stage's output is the next stage's input, as in
+    ``process_trade_data``, with ``synthetic_factors`` standing in for
+    pydeflate.
+
+    Args:
+        rows_per_year: Flows per synthetic BACI year.
+        years: Synthetic years to generate.
+        repeats: Timed runs per stage (the best is reported).
+        seed: Random seed of the synthetic data.
+
+    Returns:
+        The run's report: commit, scale, library versions and one result per
+        stage with throughput and traced peak memory.
+    """
+    (
+        product_code_to_section,
+        country_code_to_iso3,
+        _country_iso3_to_name,
+        group_to_iso3,
+        _iso3_to_groups,
+        membership_df,
+        codes,
+    ) = load_mappings()
+
+    paths = write_synthetic_baci(years, rows_per_year, seed=seed)
+    raw = pd.concat(
+        [pd.read_csv(path, dtype={"k": str}) for path in paths], ignore_index=True
+    )
+
+    results = []
+    aggregated, result = measure(
+        "filter_and_aggregate_data",
+        lambda: filter_and_aggregate_data(
+            raw, product_code_to_section, country_code_to_iso3
+        ),
+        raw,
+        repeats,
+    )
+    results.append(result)
+
+    aggregated_wide = (
+        aggregated.pivot(
+            index=["year", "exporter_iso3", "importer_iso3"],
+            columns="category",
+            values="value",
+        )
+        .reset_index()
+        .rename_axis(columns=None)
+    )
+    long = melt_with_totals(aggregated_wide, codes.sections)
+
+    converted, result = measure(
+        "add_currencies_and_prices",
+        lambda: add_currencies_and_prices(long, "exporter_iso3", synthetic_factors),
+        long,
+        repeats,
+    )
+    results.append(result)
+
+    named = add_country_names(converted)
+    grouped, result = measure(
+        "add_country_groups",
+        lambda: add_country_groups(named, membership_df, group_to_iso3),
+        named,
+        repeats,
+    )
+    results.append(result)
+
+    flows, result = measure(
+        "reshape_to_country_flow",
+        lambda: reshape_to_country_flow(grouped),
+        grouped,
+        repeats,
+    )
+    results.append(result)
+
+    units, result = measure(
+        "convert_values_to_units",
+        lambda: convert_values_to_units(flows),
+        flows,
+        repeats,
+    )
+    results.append(result)
+
+    # Write to a scratch directory instead of cdn_files
+    cdn_files = PATHS.CDN_FILES
+    with tempfile.TemporaryDirectory() as tmp:
+        PATHS.CDN_FILES = Path(tmp)
+        try:
+            _, result = measure(
+                "write_partitioned_dataset",
+                lambda: write_partitioned_dataset(units, "trade", ["country"]),
+                units,
+                repeats,
+            )
+        finally:
+            PATHS.CDN_FILES = cdn_files
+    results.append(result)
+
+    return {
+        "commit": git_commit(),
+        "rows_per_year": rows_per_year,
+        "years": list(years),
+        "seed": seed,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+        "results": results,
+    }
+
+
+def save_report(report: dict, directory: Path = PATHS.BENCHMARKS) -> Path:
+    """Save a benchmark report, named by commit and scale."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{report['commit']}_{report['rows_per_year']}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.info("Saved benchmark report to %s", path)
+    return path
+
+
+def compare_reports(baseline: dict, current: dict) -> pd.DataFrame:
+    """Compare two benchmark reports stage by stage.
+
+    Returns:
+        One row per stage with best time and traced peak memory in both runs
+        and their ratios (current / baseline).
+    """
+    columns = ["name", "best_s", "traced_peak_mb"]
+    before = pd.DataFrame(baseline["results"])[columns]
+    after = pd.DataFrame(current["results"])[columns]
+    comparison = before.merge(after, on="name", suffixes=("_baseline", "_current"))
+    comparison["time_ratio"] = comparison["best_s_current"] / comparison["best_s_baseline"]
+    comparison["memory_ratio"] = (
+        comparison["traced_peak_mb_current"] / comparison["traced_peak_mb_baseline"]
+    )
+    return comparison
+
+
+if __name__ == "__main__":
+    # Usage: benchmarks.py [ROWS_PER_YEAR] [--compare BASELINE_REPORT]
+    args = sys.argv[1:]
+    baseline_path = None
+    if "--compare" in args:
+        i = args.index("--compare")
+        baseline_path = Path(args[i + 1])
+        args = args[:i] + args[i + 2 :]
+
+    report = run_benchmarks(int(args[0])) if args else run_benchmarks()
+    save_report(report)
+    print(pd.DataFrame(report["results"]).to_string(index=False))
+
+    if baseline_path is not None:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(compare_reports(baseline, report).to_string(index=False))
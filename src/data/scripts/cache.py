@@ -0,0 +1,179 @@
+import hashlib
+import json
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data.config import PATHS, USE_STAGE_CACHE, logger
+from src.data.scripts.profiling import record_output, stage as profile_stage
+
+
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_signature(path: Path) -> dict[str, int]:
+    """Return a cheap change signature (size and mtime) for a large file."""
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def fingerprint(*parts) -> str:
+    """Return a short, stable hash of JSON-serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def prune_stale(directory: Path, pattern: str, keep: Path) -> None:
+    """Delete files matching ``pattern`` in ``directory`` other than ``keep``."""
+    for path in directory.glob(pattern):
+        if path != keep:
+            path.unlink()
+
+
+def directory_signature(directory: Path) -> list[tuple[str, int, int]]:
+    """Return name, size and mtime of every file below ``directory``."""
+    if not directory.exists():
+        return []
+    return sorted(
+        (str(path.relative_to(directory)), *file_signature(path).values())
+        for path in directory.rglob("*")
+        if path.is_file()
+    )
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A pipeline step whose output can be cached.
+
+    Attributes:
+        name: Stage name, used in cache file names and logs.
+        func: Function transforming the previous stage's output.
+        config: JSON-serialisable settings the output depends on. Changing any
+            of them invalidates this stage and every stage after it.
+    """
+
+    name: str
+    func: Callable[[pd.DataFrame | pa.Table], pd.DataFrame | pa.Table]
+    config: tuple = ()
+
+
+def stage_keys(stages: Sequence[Stage], source_key: str) -> list[str]:
+    """Chain stage fingerprints so each key covers all upstream inputs."""
+    keys: list[str] = []
+    previous = source_key
+    for stage in stages:
+        previous = fingerprint(previous, stage.name, stage.config)
+        keys.append(previous)
+    return keys
+
+
+def stage_cache_path(stage: Stage, key: str) -> Path:
+    """Return the parquet file caching ``stage`` for input fingerprint ``key``."""
+    return PATHS.STAGE_CACHE / f"{stage.name}_{key}.parquet"
+
+
+def _load_source(load_source: Callable[[], pd.DataFrame | pa.Table]):
+    with profile_stage("source") as record:
+        df = load_source()
+        record_output(record, df)
+    return df
+
+
+def _run_stage(stage: Stage, df: pd.DataFrame | pa.Table) -> pd.DataFrame | pa.Table:
+    """Run one stage, recorded in the run's profile under its name."""
+    with profile_stage(stage.name, df) as record:
+        df = stage.func(df)
+        record_output(record, df)
+    return df
+
+
+def latest_cached_stage(stages: Sequence[Stage], keys: Sequence[str]) -> int:
+    """Return the index of the last stage with a cached output (-1 if none)."""
+    for i in reversed(range(len(stages))):
+        if stage_cache_path(stages[i], keys[i]).exists():
+            return i
+    return -1
+
+
+def plan_cached_stages(
+    stages: Sequence[Stage],
+    source_key: str,
+    use_cache: bool = USE_STAGE_CACHE,
+) -> list[tuple[str, str]]:
+    """Report what ``run_cached_stages`` would do, without running anything.
+
+    Returns:
+        Each stage's name and status: "run", "cached" (output read from the
+        cache) or "skipped" (upstream of the cached stage).
+    """
+    latest = latest_cached_stage(stages, stage_keys(stages, source_key)) if use_cache else -1
+    return [
+        (stage.name, "skipped" if i < latest else "cached" if i == latest else "run")
+        for i, stage in enumerate(stages)
+    ]
+
+
+def run_cached_stages(
+    stages: Sequence[Stage],
+    source_key: str,
+    load_source: Callable[[], pd.DataFrame | pa.Table],
+    use_cache: bool = USE_STAGE_CACHE,
+    as_arrow: bool = False,
+) -> pd.DataFrame | pa.Table:
+    """Run ``stages`` in order, resuming from the latest cached output.
+
+    Args:
+        stages: Ordered pipeline stages.
+        source_key: Fingerprint of the data returned by ``load_source``.
+        load_source: Loads the input of the first stage. Only called when no
+            stage output can be served from the cache.
+        use_cache: Whether to read and write the stage cache at all.
+        as_arrow: Whether the stages work on ``pyarrow.Table``s, in which case
+            cached outputs are read back as tables.
+
+    Returns:
+        Output of the final stage.
+    """
+    if not use_cache:
+        df = _load_source(load_source)
+        for stage in stages:
+            df = _run_stage(stage, df)
+        return df
+
+    PATHS.STAGE_CACHE.mkdir(parents=True, exist_ok=True)
+    keys = stage_keys(stages, source_key)
+
+    latest = latest_cached_stage(stages, keys)
+    if latest >= 0:
+        path = stage_cache_path(stages[latest], keys[latest])
+        logger.info("Loading cached %s stage from %s", stages[latest].name, path)
+        with profile_stage(f"{stages[latest].name} (cached)") as record:
+            df = pq.read_table(path) if as_arrow else pd.read_parquet(path)
+            record_output(record, df)
+    else:
+        df = _load_source(load_source)
+    start = latest + 1
+
+    for stage, key in zip(stages[start:], keys[start:]):
+        df = _run_stage(stage, df)
+        path = stage_cache_path(stage, key)
+        logger.info("Caching %s stage to %s", stage.name, path)
+        tmp_path = path.with_suffix(".tmp")
+        if isinstance(df, pa.Table):
+            pq.write_table(df, tmp_path, compression="snappy")
+        else:
+            df.to_parquet(tmp_path, index=False, compression="snappy")
+        tmp_path.replace(path)
+        prune_stale(PATHS.STAGE_CACHE, f"{stage.name}_*.parquet", keep=path)
+
+    return df
@@ -0,0 +1,270 @@
+import re
+import shutil
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data.config import (
+    BUILD_WORKERS,
+    ENGINE,
+    OFFLINE_FACTORS,
+    PATHS,
+    WRITE_WORKERS,
+    logger,
+)
+from src.data.scripts.helper_functions import (
+    assemble_partition,
+    decode_dictionaries,
+    write_hive_dataset,
+)
+from src.data.scripts.layout import LayoutPlan, plan_layout
+from src.data.scripts.profiling import profiled
+from src.data.scripts.rollups import build_rollups, write_rollup_datasets
+from src.data.scripts.trade import (
+    build_state,
+    configured_years,
+    generate_input_values,
+    load_mappings,
+    process_trade_data,
+    read_input_values_source,
+    select_countries,
+    update_trade_cache,
+    write_build_state,
+    year_cache_paths,
+)
+
+# Peak bytes the pipeline stages hold per aggregated BACI row (year, exporter,
+# importer, section). About 460 with either engine on synthetic data, plus
+# headroom for the larger group views of real data.
+CHUNK_BYTES_PER_ROW: int = 600
+
+# Memory held whatever the chunk size: interpreter, libraries, mappings,
+# conversion factors and the partitions waiting for a writer thread.
+CHUNK_BASE_BYTES: int = 512_000_000
+
+MEMORY_UNITS: dict[str, int] = {
+    "": 1,
+    "B": 1,
+    "KB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "TB": 1000**4,
+    "KIB": 1024,
+    "MIB": 1024**2,
+    "GIB": 1024**3,
+    "TIB": 1024**4,
+}
+
+
+def parse_memory(text: str | int) -> int:
+    """Parse a memory size such as "4GB", "512MiB" or a number of bytes."""
+    if isinstance(text, int):
+        return text
+    match = re.fullmatch(r"\s*([\d.]+)\s*([A-Za-z]*)\s*", text)
+    if match is None or match.group(2).upper() not in MEMORY_UNITS:
+        raise ValueError(f"Invalid memory size {text!r}, expected e.g. \"4GB\"")
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2).upper()])
+
+
+def year_rows(years: Sequence[int] | None = None) -> dict[int, int]:
+    """Return the aggregated rows of each year already in the year cache."""
+    return {
+        year: pq.ParquetFile(path).metadata.num_rows
+        for year, path in year_cache_paths(years).items()
+        if path.exists()
+    }
+
+
+def plan_year_chunks(
+    rows: Mapping[int, int],
+    budget: int,
+    bytes_per_row: int = CHUNK_BYTES_PER_ROW,
+    base_bytes: int = CHUNK_BASE_BYTES,
+) -> list[list[int]]:
+    """Split consecutive years into the fewest chunks that fit ``budget``.
+
+    Args:
+        rows: Aggregated BACI rows of each year.
+        budget: Peak memory target in bytes.
+        bytes_per_row: Peak bytes per aggregated row of a chunk.
+        base_bytes: Memory held whatever the chunk size.
+
+    Returns:
+        The years of each chunk, in order. A year that does not fit on its
+        own gets a chunk to itself.
+    """
+    capacity = max(0, budget - base_bytes) // bytes_per_row
+    chunks: list[list[int]] = []
+    chunk_rows = 0
+    for year in sorted(rows):
+        if chunks and chunk_rows + rows[year] <= capacity:
+            chunks[-1].append(year)
+            chunk_rows += rows[year]
+            continue
+        if rows[year] > capacity:
+            logger.warning(
+                "%s (%s rows) does not fit a memory budget of %s bytes",
+                year,
+                f"{rows[year]:,}",
+                f"{budget:,}",
+            )
+        chunks.append([year])
+        chunk_rows = rows[year]
+    return chunks
+
+
+def year_chunks(
+    budget: str | int,
+    years: Sequence[int] | None = None,
+    workers: int = BUILD_WORKERS,
+) -> list[list[int]]:
+    """Aggregate the stale BACI years and split the years into chunks fitting ``budget``."""
+    product_code_to_section, country_code_to_iso3, *_ = load_mappings()
+    update_trade_cache(
+        product_code_to_section, country_code_to_iso3, workers=workers, years=years
+    )
+    chunks = plan_year_chunks(year_rows(years), parse_memory(budget))
+    logger.info(
+        "Memory budget %s: %s year chunks (%s)",
+        budget,
+        len(chunks),
+        ", ".join(f"{chunk[0]}-{chunk[-1]}" for chunk in chunks),
+    )
+    return chunks
+
+
+def spill_chunk(
+    data: pd.DataFrame | pa.Table,
+    directory: Path,
+    index: int,
+    partitions: dict[str, dict],
+) -> None:
+    """Write the rows of each country in a chunk to its own spill file.
+
+    Args:
+        data: Pipeline output for one chunk of years.
+        directory: Spill directory, with one subdirectory per country.
+        index: Chunk number, naming the files.
+        partitions: Spill directory, row count and chunk schemas of each
+            country, updated in place.
+    """
+    countries = data["country"].to_pandas() if isinstance(data, pa.Table) else data["country"]
+    for country, positions in countries.groupby(countries, observed=True).indices.items():
+        rows = data.take(positions) if isinstance(data, pa.Table) else data.iloc[positions]
+        table = decode_dictionaries(rows).drop_columns("country")
+        partition = partitions.setdefault(
+            country,
+            {"path": directory / str(len(partitions)), "rows": 0, "schemas": []},
+        )
+        partition["path"].mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, partition["path"] / f"chunk-{index}.parquet", compression="snappy")
+        partition["rows"] += table.num_rows
+        partition["schemas"].append(table.schema)
+
+
+def merged_partitions(
+    partitions: Mapping[str, dict],
+    layout: LayoutPlan,
+    rollups: dict[str, list[pd.DataFrame]],
+) -> Iterator[pa.Table]:
+    """Yield each country's spilled rows as one partition, sorted per ``layout``.
+
+    Value columns take the widest type of any chunk, as when every year is
+    converted at once. The rollups of each partition are appended to
+    ``rollups``.
+    """
+    if not partitions:
+        return
+    schema = pa.unify_schemas(
+        [schema for partition in partitions.values() for schema in partition["schemas"]],
+        promote_options="permissive",
+    )
+    value_types = {
+        field.name: field.type for field in schema if field.name.startswith("value_")
+    }
+    for country in sorted(partitions):
+        tables = [
+            pq.read_table(path)
+            for path in sorted(partitions[country]["path"].glob("chunk-*.parquet"))
+        ]
+        table = assemble_partition(tables, layout.sort_keys, value_types)
+        table = table.append_column("country", pa.array([country] * table.num_rows, pa.string()))
+        for name, rollup in build_rollups(table).items():
+            rollups.setdefault(name, []).append(rollup)
+        yield table
+
+
+@profiled
+def build_trade_dataset_chunked(
+    chunks: Sequence[Sequence[int]],
+    engine: str = ENGINE,
+    countries: Sequence[str] | None = None,
+    workers: int = BUILD_WORKERS,
+    write_workers: int = WRITE_WORKERS,
+    offline: bool = OFFLINE_FACTORS,
+    inputs: bool = True,
+) -> None:
+    """Build the trade dataset one chunk of years at a time.
+
+    Each chunk goes through every stage of ``process_trade_data`` and its
+    rows are spilled per country to ``PATHS.CHUNK_SPILL``, so only one chunk
+    is held in memory. The spilled rows are then merged into one partition
+    at a time and streamed into the dataset writer, and the rollups are
+    built from those partitions. Stages are not cached, since each cache
+    entry holds a whole stage output; the per-year BACI aggregates are.
+
+    Args:
+        chunks: Years of each chunk (see ``year_chunks``).
+        engine: "pandas" or "arrow".
+        countries: Only replace these ``country`` partitions, keeping the others.
+        workers: Processes aggregating BACI years.
+        write_workers: Threads writing partitions.
+        offline: Read conversion factors from the prebuilt factor table.
+        inputs: Also regenerate the input values file.
+    """
+    spill_dir = PATHS.CHUNK_SPILL
+    if spill_dir.exists():
+        shutil.rmtree(spill_dir)
+    partitions: dict[str, dict] = {}
+
+    try:
+        for index, years in enumerate(chunks):
+            logger.info("Processing years %s-%s", years[0], years[-1])
+            data = process_trade_data(
+                use_cache=False, offline=offline, engine=engine, years=years, workers=workers
+            )
+            if countries is not None:
+                data = select_countries(data, countries)
+            spill_chunk(data, spill_dir, index, partitions)
+            del data
+
+        layout = plan_layout([partition["rows"] for partition in partitions.values()])
+        rollups: dict[str, list[pd.DataFrame]] = {}
+        logger.info("Writing partitioned dataset...")
+        write_hive_dataset(
+            merged_partitions(partitions, layout, rollups),
+            "trade",
+            ["country"],
+            layout,
+            workers=write_workers,
+            partial=countries is not None,
+        )
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    logger.info("Writing rollups...")
+    write_rollup_datasets(
+        {name: pd.concat(parts, ignore_index=True) for name, parts in rollups.items()},
+        partial=countries is not None,
+    )
+    if countries is None:
+        all_years = configured_years([year for years in chunks for year in years])
+        write_build_state(build_state(all_years, offline, engine))
+    logger.info("Trade data completed")
+
+    if inputs:
+        logger.info("Writing input values...")
+        generate_input_values(read_input_values_source())
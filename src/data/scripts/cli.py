@@ -0,0 +1,289 @@
+import argparse
+import sys
+from collections.abc import Sequence
+
+from src.data.config import (
+    BUILD_WORKERS,
+    DUCKDB_MEMORY_LIMIT,
+    ENGINE,
+    ENGINES,
+    MEMORY_BUDGET,
+    OFFLINE_FACTORS,
+    PATHS,
+    USE_STAGE_CACHE,
+    WRITE_WORKERS,
+)
+from src.data.scripts.profiling import start_run
+
+# Commands that only run the stages of process_trade_data up to a given one.
+PARTIAL_COMMANDS: dict[str, str] = {
+    "convert": "currencies",
+    "groups": "groups",
+}
+
+COMMANDS: dict[str, str] = {
+    "build": "Build and write the trade dataset, rollups and input values",
+    "aggregate": "Aggregate the stale BACI years into the year cache",
+    "convert": "Run the pipeline up to the currency conversions",
+    "groups": "Run the pipeline up to the country group views",
+    "write": "Write the trade dataset and rollups, without the input values",
+    "inputs": "Regenerate inputValues.js from the written trade dataset",
+    "bench": "Benchmark the pipeline stages on synthetic BACI data",
+}
+
+
+def parse_years(text: str) -> list[int]:
+    """Parse "2015-2024" or "2019,2021,2023" into a list of years."""
+    years: set[int] = set()
+    for part in text.split(","):
+        start, _, stop = part.strip().partition("-")
+        years.update(range(int(start), int(stop or start) + 1))
+    return sorted(years)
+
+
+def parse_list(text: str) -> list[str]:
+    """Parse a comma separated list."""
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser of the ``trade-explorer`` command line."""
+    parser = argparse.ArgumentParser(
+        prog="trade-explorer",
+        description="Build the trade explorer datasets.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in COMMANDS.items():
+        command = commands.add_parser(name, help=help_text, description=help_text)
+        command.add_argument(
+            "--plan",
+            action="store_true",
+            help="report what would run or be served from cache, and exit",
+        )
+        if name == "bench":
+            command.add_argument(
+                "--rows", type=int, default=200_000, help="synthetic rows per year"
+            )
+            command.add_argument("--repeats", type=int, default=3)
+            continue
+        if name == "inputs":
+            continue
+        command.add_argument(
+            "--years",
+            type=parse_years,
+            help='BACI years, e.g. "2015-2024" or "2022,2023" (default TIME_RANGE)',
+        )
+        command.add_argument(
+            "--engine", choices=ENGINES, default=ENGINE, help="execution backend"
+        )
+        command.add_argument(
+            "--workers",
+            type=int,
+            default=BUILD_WORKERS,
+            help="processes aggregating BACI years",
+        )
+        command.add_argument(
+            "--no-cache",
+            dest="use_cache",
+            action="store_false",
+            default=USE_STAGE_CACHE,
+            help="neither read nor write the stage cache",
+        )
+        command.add_argument(
+            "--offline",
+            action=argparse.BooleanOptionalAction,
+            default=OFFLINE_FACTORS,
+            help="read conversion factors from the prebuilt factor table "
+            "(default OFFLINE_FACTORS)",
+        )
+        if name in ("build", "write"):
+            command.add_argument(
+                "--countries",
+                type=parse_list,
+                help="only replace these country partitions, keeping the others",
+            )
+            command.add_argument(
+                "--incremental",
+                action="store_true",
+                help="only recompute and rewrite what changed since the last build",
+            )
+            command.add_argument(
+                "--write-workers",
+                type=int,
+                default=WRITE_WORKERS,
+                help="threads writing partitions",
+            )
+            command.add_argument(
+                "--memory-budget",
+                help=(
+                    'memory budget, e.g. "6GB": the DuckDB memory limit (default '
+                    f"{DUCKDB_MEMORY_LIMIT}), else process years in chunks that fit it"
+                ),
+            )
+    return parser
+
+
+def _print_stages(plan: dict) -> None:
+    if plan["aggregate"]:
+        print(f"aggregate: {', '.join(map(str, plan['aggregate']))}")
+    for name, status in plan["stages"]:
+        print(f"{name}: {status}")
+
+
+def _print_update(args: argparse.Namespace) -> None:
+    from src.data.scripts.incremental import plan_update
+    from src.data.scripts.trade import build_state, read_build_state
+
+    current = build_state(args.years, args.offline, engine="pandas")
+    plan = plan_update(read_build_state(), current)
+    if plan is None:
+        print("update: full rebuild (no previous build, or settings changed)")
+    elif not any(plan.values()):
+        print("update: nothing to do")
+    else:
+        for key, values in plan.items():
+            if values:
+                print(f"update {key.replace('_', ' ')}: {', '.join(map(str, values))}")
+
+
+def _print_chunks(args: argparse.Namespace, budget: str) -> bool:
+    from src.data.scripts.chunked import parse_memory, plan_year_chunks, year_rows
+    from src.data.scripts.trade import configured_years
+
+    rows = year_rows(args.years)
+    if len(rows) < len(configured_years(args.years)):
+        print(f"memory budget {budget}: year chunks sized once every year is aggregated")
+        return False
+    chunks = plan_year_chunks(rows, parse_memory(budget))
+    if len(chunks) == 1:
+        return False
+    spans = ", ".join(f"{chunk[0]}-{chunk[-1]}" for chunk in chunks)
+    print(f"memory budget {budget}: {len(chunks)} year chunks ({spans})")
+    print("stages: run for each chunk, without the stage cache")
+    return True
+
+
+def print_plan(args: argparse.Namespace) -> None:
+    """Print the work a command would do."""
+    if args.command == "bench":
+        print(f"bench: {args.rows:,} synthetic rows per year, best of {args.repeats}")
+        return
+    if args.command == "inputs":
+        print(f"inputs: from {PATHS.CDN_FILES / 'trade'}")
+        return
+
+    from src.data.scripts.trade import configured_years, plan_trade_data, stale_years
+
+    years = configured_years(args.years)
+    print(f"years: {years[0]}-{years[-1]} ({len(years)})")
+    if args.command == "aggregate":
+        stale = stale_years(args.years)
+        print(f"aggregate: {', '.join(map(str, stale)) if stale else 'nothing (cached)'}")
+        return
+    if args.engine == "duckdb":
+        print(f"duckdb: full SQL build, memory limit {args.memory_budget or DUCKDB_MEMORY_LIMIT}")
+        print("write: trade, trade_totals, trade_top_partners (every partition)")
+        if args.command == "build":
+            print("inputs: from the built dataset")
+        return
+
+    budget = args.memory_budget or MEMORY_BUDGET
+    if getattr(args, "incremental", False):
+        _print_update(args)
+        if budget:
+            print(f"memory budget {budget}: changed years in year chunks, without the stage cache")
+        return
+
+    chunked = args.command in ("build", "write") and budget and _print_chunks(args, budget)
+    if not chunked:
+        _print_stages(
+            plan_trade_data(
+                use_cache=args.use_cache,
+                offline=args.offline,
+                engine=args.engine,
+                years=args.years,
+                until=PARTIAL_COMMANDS.get(args.command),
+            )
+        )
+    if args.command in ("build", "write"):
+        partitions = ", ".join(args.countries) if args.countries else "every partition"
+        print(f"write: trade, trade_totals, trade_top_partners ({partitions})")
+        if args.command == "build":
+            source = "written" if args.countries else "built"
+            print(f"inputs: from the {source} dataset")
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run a command."""
+    if args.command == "bench":
+        from src.data.scripts.benchmarks import run_benchmarks, save_report
+
+        save_report(run_benchmarks(args.rows, repeats=args.repeats))
+        return
+
+    from src.data.scripts import trade
+
+    if args.command == "inputs":
+        trade.generate_input_values(trade.read_input_values_source())
+    elif args.command == "aggregate":
+        product_code_to_section, country_code_to_iso3, *_ = trade.load_mappings()
+        trade.update_trade_cache(
+            product_code_to_section,
+            country_code_to_iso3,
+            workers=args.workers,
+            years=args.years,
+        )
+    elif args.command in PARTIAL_COMMANDS:
+        trade.process_trade_data(
+            use_cache=args.use_cache,
+            offline=args.offline,
+            engine=args.engine,
+            years=args.years,
+            workers=args.workers,
+            until=PARTIAL_COMMANDS[args.command],
+        )
+    elif args.incremental:
+        from src.data.scripts.incremental import update_trade_dataset
+
+        update_trade_dataset(
+            years=args.years,
+            offline=args.offline,
+            workers=args.workers,
+            write_workers=args.write_workers,
+            use_cache=args.use_cache,
+            memory_budget=args.memory_budget or MEMORY_BUDGET,
+        )
+    else:
+        trade.build_trade_dataset(
+            engine=args.engine,
+            years=args.years,
+            countries=args.countries,
+            workers=args.workers,
+            write_workers=args.write_workers,
+            memory_limit=args.memory_budget,
+            use_cache=args.use_cache,
+            offline=args.offline,
+            inputs=args.command == "build",
+        )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Entry point: ``python -m src.data.scripts.cli COMMAND [options]``."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "incremental", False):
+        if args.countries:
+            parser.error("--incremental picks the partitions to rewrite itself")
+        if args.engine != "pandas":
+            parser.error("--incremental runs on the pandas engine: use --engine pandas")
+    if args.plan:
+        print_plan(args)
+        return
+
+    profiler = start_run()
+    run(args)
+    profiler.write_report(name=f"trade_{args.command}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
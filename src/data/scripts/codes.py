@@ -0,0 +1,93 @@
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+TOTAL_CATEGORY: str = "All products"
+
+FLOWS = pd.CategoricalDtype(["exports", "imports"])
+
+
+def sorted_dtype(values: Iterable) -> pd.CategoricalDtype:
+    """Return a categorical dtype over the sorted, distinct non-null ``values``.
+
+    Categories are sorted so that ordering by codes matches ordering by value.
+    """
+    return pd.CategoricalDtype(sorted({v for v in values if pd.notna(v)}))
+
+
+def distinct_values(values: pd.Series) -> list:
+    """Return the possible values of ``values``: its categories, or its uniques."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    return list(values.dropna().unique())
+
+
+def country_dtype(country_code_to_iso3: Mapping) -> pd.CategoricalDtype:
+    """Return the ISO3 code table for the BACI country codes."""
+    return sorted_dtype(country_code_to_iso3.values())
+
+
+def section_dtype(product_code_to_section: Mapping) -> pd.CategoricalDtype:
+    """Return the HS section code table, including the all-products total."""
+    return sorted_dtype([*product_code_to_section.values(), TOTAL_CATEGORY])
+
+
+@dataclass(frozen=True)
+class CodeTables:
+    """Fixed dictionaries used to encode identifier columns as categoricals.
+
+    Attributes:
+        countries: ISO3 codes of every BACI country.
+        groups: Country group names.
+        sections: HS section names, including ``TOTAL_CATEGORY``.
+        flows: Trade flow directions.
+    """
+
+    countries: pd.CategoricalDtype
+    groups: pd.CategoricalDtype
+    sections: pd.CategoricalDtype
+    flows: pd.CategoricalDtype = FLOWS
+
+
+def encode_mapped(
+    keys: pd.Series,
+    mapping: Mapping,
+    dtype: pd.CategoricalDtype,
+) -> pd.Categorical:
+    """Map ``keys`` through ``mapping`` straight to codes of ``dtype``.
+
+    Keys missing from ``mapping``, or mapped outside ``dtype``, become NaN.
+    """
+    target = np.append(
+        dtype.categories.get_indexer(list(mapping.values())), -1
+    )
+    # Unknown keys (-1) index the trailing sentinel
+    codes = target[pd.Index(list(mapping)).get_indexer(keys)]
+    return pd.Categorical.from_codes(codes, dtype=dtype)
+
+
+def category_codes(values: pd.Series, categories: pd.Index) -> np.ndarray:
+    """Return the position of each value in ``categories`` (-1 if missing).
+
+    Categorical input is recoded through its categories, so no per-row string
+    comparisons are made.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        remap = np.append(categories.get_indexer(values.cat.categories), -1)
+        return remap[values.cat.codes.to_numpy()]
+    return categories.get_indexer(values)
+
+
+def encode_columns(
+    df: pd.DataFrame,
+    dtypes: Mapping[str, pd.CategoricalDtype],
+) -> pd.DataFrame:
+    """Cast the given columns of ``df`` to their code table dtypes in place."""
+    for col, dtype in dtypes.items():
+        if col in df.columns and df[col].dtype != dtype:
+            df[col] = pd.Categorical.from_codes(
+                category_codes(df[col], dtype.categories), dtype=dtype
+            )
+    return df
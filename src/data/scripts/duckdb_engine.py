@@ -0,0 +1,402 @@
+import json
+from collections.abc import Callable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.data.config import (
+    DUCKDB_MEMORY_LIMIT,
+    PATHS,
+    PRODUCT_LEVEL,
+    ROLLUP_TOP_PARTNERS,
+    TIME_RANGE,
+    logger,
+)
+from src.data.scripts.codes import TOTAL_CATEGORY
+from src.data.scripts.helper_functions import write_hive_dataset
+from src.data.scripts.layout import plan_layout
+from src.data.scripts.profiling import profiled
+from src.data.scripts.rollups import (
+    KEY_COLUMNS,
+    RANK_COLUMN,
+    downcast_units,
+    write_rollup_datasets,
+)
+from src.data.scripts.trade import (
+    baci_year_path,
+    load_mappings,
+    resolve_country_names,
+)
+from src.data.scripts.transformations import disjoint_group_mask, pydeflate_factors
+
+# Rows per Arrow record batch streamed from DuckDB into the dataset writer.
+BATCH_ROWS: int = 1_000_000
+
+
+def product_categories(level: str = PRODUCT_LEVEL) -> pd.DataFrame:
+    """Return the HS2 prefix → product category table for ``level``.
+
+    Args:
+        level: "section" for HS sections or "chapter" for HS2 chapters.
+    """
+    if level == "section":
+        with open(PATHS.HS_SECTIONS, "r") as f:
+            hs_dict = json.load(f)
+        rows = [(code, section) for section, codes in hs_dict.items() for code in codes]
+    elif level == "chapter":
+        with open(PATHS.HS_CATEGORIES, "r", encoding="utf-8") as f:
+            rows = [(code, chapter) for chapter, code in json.load(f).items()]
+    else:
+        raise ValueError(f"Unknown product level {level!r}, expected 'section' or 'chapter'")
+    return pd.DataFrame(rows, columns=["prefix", "category"])
+
+
+def _connect(memory_limit: str, threads: int | None):
+    """Open an in-memory DuckDB connection that spills to ``PATHS.DUCKDB_TEMP``."""
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError(
+            "The duckdb engine needs the optional 'duckdb' dependency "
+            "(uv sync --extra duckdb)"
+        ) from e
+
+    PATHS.DUCKDB_TEMP.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect()
+    con.execute(f"SET memory_limit = '{memory_limit}'")
+    con.execute(f"SET temp_directory = '{PATHS.DUCKDB_TEMP}'")
+    con.execute("SET preserve_insertion_order = false")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    return con
+
+
+def _baci_source(years: Sequence[int]) -> str:
+    """Return a ``read_csv`` call over the raw BACI files of ``years``.
+
+    Values are read as FLOAT, as ``BACI_COLUMNS`` reads them for the other
+    engines, so the sums match theirs.
+    """
+    paths = [baci_year_path(year) for year in years]
+    missing = [str(path) for path in paths if not path.exists()]
+    if missing:
+        raise FileNotFoundError(f"Raw BACI files not found: {', '.join(missing)}")
+    files = ", ".join(f"'{path}'" for path in paths)
+    return (
+        f"read_csv([{files}], header = true, columns = {{"
+        "'t': 'SMALLINT', 'i': 'INTEGER', 'j': 'INTEGER', "
+        "'k': 'VARCHAR', 'v': 'FLOAT', 'q': 'VARCHAR'})"
+    )
+
+
+def _any_zero(value_cols: Sequence[str]) -> str:
+    """SQL predicate true when any value column is exactly zero."""
+    return "coalesce(" + " OR ".join(f"{c} = 0" for c in value_cols) + ", false)"
+
+
+def _rollups(
+    con,
+    value_cols: Sequence[str],
+    groups: Sequence[str],
+    n: int,
+) -> dict[str, pd.DataFrame]:
+    """SQL counterpart of ``rollups.build_rollups`` over the ``trade_units`` view."""
+    keys = ", ".join(KEY_COLUMNS)
+    values = ", ".join(value_cols)
+    group_list = ", ".join("'" + group.replace("'", "''") + "'" for group in groups)
+    con.execute(
+        f"""
+        CREATE TEMP VIEW trade_individual AS
+        SELECT * FROM trade_units WHERE partner NOT IN ({group_list})
+        """
+    )
+    totals = con.execute(
+        f"""
+        SELECT {keys},
+               {", ".join(f"coalesce(sum({c}), 0) AS {c}" for c in value_cols)}
+        FROM trade_individual
+        GROUP BY ALL
+        ORDER BY {keys}
+        """
+    ).df()
+    top = con.execute(
+        f"""
+        SELECT {keys},
+               CAST(row_number() OVER (
+                   PARTITION BY {keys}
+                   ORDER BY {RANK_COLUMN} DESC NULLS LAST, partner
+               ) AS SMALLINT) AS rank,
+               partner, {values}
+        FROM trade_individual
+        QUALIFY rank <= {int(n)}
+        ORDER BY {keys}, rank
+        """
+    ).df()
+    return {"trade_totals": downcast_units(totals), "trade_top_partners": top}
+
+
+def _sums(value_cols: Sequence[str], prefix: str = "t.") -> str:
+    """SQL select list summing each value column back to FLOAT."""
+    return ", ".join(
+        f"CAST(coalesce(sum({prefix}{c}), 0) AS FLOAT) AS {c}" for c in value_cols
+    )
+
+
+@profiled
+def build_trade_dataset_duckdb(
+    years: Sequence[int] = range(TIME_RANGE[0], TIME_RANGE[1] + 1),
+    level: str = PRODUCT_LEVEL,
+    factor_source: Callable[[pd.DataFrame, str], pd.DataFrame] = pydeflate_factors,
+    memory_limit: str = DUCKDB_MEMORY_LIMIT,
+    threads: int | None = None,
+    base_dir: str = "trade",
+    top_n: int = ROLLUP_TOP_PARTNERS,
+) -> pd.DataFrame:
+    """Build the partitioned trade dataset with SQL over the raw BACI files.
+
+    Runs the BACI aggregation, currency conversion, name resolution, group
+    views, flow reshape and unit conversion of ``process_trade_data`` inside an
+    embedded DuckDB that spills to disk beyond ``memory_limit``. The result is
+    streamed as record batches into ``PATHS.CDN_FILES / base_dir``, so the
+    build is not bounded by RAM even at HS2 chapter granularity. The rollup
+    datasets (see ``rollups.ROLLUPS``) are aggregated in SQL as well.
+
+    Args:
+        years: BACI years to include.
+        level: Product granularity ("section" or "chapter").
+        factor_source: Callable returning conversion factors for the unique
+            ``(exporter_iso3, year)`` pairs (see ``pydeflate_factors``).
+        memory_limit: DuckDB memory limit, e.g. "4GB".
+        threads: DuckDB worker threads (defaults to all cores).
+        base_dir: Output directory name under ``PATHS.CDN_FILES``.
+        top_n: Partners kept per key in the top partners rollup.
+
+    Returns:
+        The distinct year/country/category combinations written, for
+        ``generate_input_values``.
+    """
+    logger.info("Building trade dataset with DuckDB (%s level)", level)
+    (
+        _product_code_to_section,
+        country_code_to_iso3,
+        _country_iso3_to_name,
+        group_to_iso3,
+        _iso3_to_groups,
+        membership_df,
+        _codes,
+    ) = load_mappings()
+
+    con = _connect(memory_limit, threads)
+    con.register(
+        "country_codes",
+        pd.DataFrame(
+            {
+                "code": list(country_code_to_iso3),
+                "iso3": list(country_code_to_iso3.values()),
+            }
+        ),
+    )
+    con.register("product_categories", product_categories(level))
+    con.register("membership", membership_df.rename(columns={"group": "grp"}))
+
+    groups = pd.Index(sorted(membership_df["group"].unique()))
+    disjoint = disjoint_group_mask(groups, group_to_iso3)
+    exp_idx, imp_idx = np.nonzero(disjoint)
+    con.register(
+        "disjoint_pairs",
+        pd.DataFrame(
+            {"exporter_group": groups[exp_idx], "importer_group": groups[imp_idx]}
+        ),
+    )
+
+    # --- BACI ingest, product mapping and "All products" totals
+    logger.info("Aggregating BACI data for %s years", len(years))
+    con.execute(
+        f"""
+        CREATE TEMP TABLE trade_long AS
+        WITH by_category AS (
+            SELECT
+                raw.t AS year,
+                e.iso3 AS exporter_iso3,
+                m.iso3 AS importer_iso3,
+                p.category,
+                sum(raw.v) / 1000 AS value
+            FROM {_baci_source(years)} AS raw
+            JOIN country_codes AS e ON raw.i = e.code
+            JOIN country_codes AS m ON raw.j = m.code
+            JOIN product_categories AS p ON substr(raw.k, 1, 2) = p.prefix
+            WHERE raw.v IS NOT NULL
+            GROUP BY ALL
+        )
+        SELECT * FROM by_category
+        UNION ALL
+        SELECT year, exporter_iso3, importer_iso3, '{TOTAL_CATEGORY}', sum(value)
+        FROM by_category
+        GROUP BY ALL
+        """
+    )
+
+    # --- Currency and price factors for the unique exporter/year pairs
+    keys = con.execute(
+        "SELECT DISTINCT exporter_iso3, year FROM trade_long ORDER BY ALL"
+    ).df()
+    factors = factor_source(keys, "exporter_iso3")
+    value_cols = sorted(c for c in factors.columns if c.startswith("value_"))
+    con.register(
+        "factors",
+        factors[["exporter_iso3", "year", *value_cols]].astype({"year": "int16"}),
+    )
+
+    iso3 = pd.Index(
+        sorted(
+            set(keys["exporter_iso3"])
+            | set(
+                con.execute("SELECT DISTINCT importer_iso3 FROM trade_long")
+                .df()["importer_iso3"]
+            )
+        )
+    )
+    names_dtype, name_codes = resolve_country_names(iso3)
+    names = np.asarray(names_dtype.categories, dtype=object)
+    con.register(
+        "country_names",
+        pd.DataFrame(
+            {
+                "iso3": iso3,
+                "name": np.where(name_codes >= 0, names[name_codes], None),
+            }
+        ),
+    )
+
+    converted = ", ".join(
+        f"CAST(l.value AS FLOAT) * CAST(f.{c} AS FLOAT) AS {c}" for c in value_cols
+    )
+    con.execute(
+        f"""
+        CREATE TEMP TABLE trade_values AS
+        SELECT * FROM (
+            SELECT
+                l.year,
+                l.category,
+                l.exporter_iso3,
+                ne.name AS exporter,
+                l.importer_iso3,
+                ni.name AS importer,
+                {converted}
+            FROM trade_long AS l
+            LEFT JOIN factors AS f USING (exporter_iso3, year)
+            LEFT JOIN country_names AS ne ON l.exporter_iso3 = ne.iso3
+            LEFT JOIN country_names AS ni ON l.importer_iso3 = ni.iso3
+        )
+        WHERE NOT {_any_zero(value_cols)}
+        """
+    )
+    con.execute("DROP TABLE trade_long")
+
+    # --- Group views (see add_country_groups). Missing values sum as zero.
+    logger.info("Adding country groups...")
+    plain = ", ".join(value_cols)
+    con.execute(
+        f"""
+        CREATE TEMP TABLE trade_groups AS
+        -- country → country
+        SELECT
+            year, category, exporter_iso3, exporter, importer_iso3, importer,
+            {", ".join(f"coalesce({c}, 0) AS {c}" for c in value_cols)}
+        FROM trade_values
+        WHERE exporter IS NOT NULL AND importer IS NOT NULL
+        UNION ALL
+        -- country → group (exclude country ∈ group)
+        SELECT
+            t.year, t.category, t.exporter_iso3, t.exporter,
+            NULL AS importer_iso3, mi.grp AS importer, {_sums(value_cols)}
+        FROM trade_values AS t
+        JOIN membership AS mi ON t.importer_iso3 = mi.iso3
+        ANTI JOIN membership AS x ON x.iso3 = t.exporter_iso3 AND x.grp = mi.grp
+        WHERE t.exporter IS NOT NULL
+        GROUP BY ALL
+        UNION ALL
+        -- group → country (exclude country ∈ group)
+        SELECT
+            t.year, t.category, NULL AS exporter_iso3, me.grp AS exporter,
+            t.importer_iso3, t.importer, {_sums(value_cols)}
+        FROM trade_values AS t
+        JOIN membership AS me ON t.exporter_iso3 = me.iso3
+        ANTI JOIN membership AS x ON x.iso3 = t.importer_iso3 AND x.grp = me.grp
+        WHERE t.importer IS NOT NULL
+        GROUP BY ALL
+        UNION ALL
+        -- group → group (only between disjoint groups)
+        SELECT
+            t.year, t.category, NULL AS exporter_iso3, me.grp AS exporter,
+            NULL AS importer_iso3, mi.grp AS importer, {_sums(value_cols)}
+        FROM trade_values AS t
+        JOIN membership AS me ON t.exporter_iso3 = me.iso3
+        JOIN membership AS mi ON t.importer_iso3 = mi.iso3
+        SEMI JOIN disjoint_pairs AS d
+            ON d.exporter_group = me.grp AND d.importer_group = mi.grp
+        GROUP BY ALL
+        """
+    )
+    con.execute("DROP TABLE trade_values")
+
+    # --- Units: int32 unless a column needs int64 (see convert_values_to_units).
+    # Scaled in FLOAT and rounded half to even, as value_units does.
+    scaled = {c: f"round_even({c} * CAST(1e6 AS FLOAT), 0)" for c in value_cols}
+    max_abs = con.execute(
+        "SELECT "
+        + ", ".join(f"max(abs({scaled[c]}))" for c in value_cols)
+        + " FROM trade_groups"
+    ).fetchone()
+    units = []
+    for col, max_abs_value in zip(value_cols, max_abs):
+        sql_type = (
+            "BIGINT"
+            if max_abs_value is not None and max_abs_value > 2_147_483_647
+            else "INTEGER"
+        )
+        logger.info("Column %s: using %s", col, sql_type)
+        units.append(f"CAST({scaled[col]} AS {sql_type}) AS {col}")
+
+    # --- Flow reshape, sorted per partition by the layout's sort keys
+    logger.info("Writing partitioned dataset...")
+    con.execute(
+        f"""
+        CREATE TEMP VIEW trade_flow AS
+        SELECT year, exporter AS country, importer AS partner,
+               'exports' AS flow, category, {plain}
+        FROM trade_groups
+        UNION ALL
+        SELECT year, importer AS country, exporter AS partner,
+               'imports' AS flow, category, {plain}
+        FROM trade_groups
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TEMP VIEW trade_units AS
+        SELECT year, country, partner, flow, category, {", ".join(units)}
+        FROM trade_flow
+        """
+    )
+    sizes = con.execute(
+        "SELECT count(*) AS n FROM trade_flow GROUP BY country"
+    ).df()["n"]
+    layout = plan_layout(sizes.to_numpy())
+    reader = con.execute(
+        f"""
+        SELECT * FROM trade_units
+        ORDER BY country, {", ".join(layout.sort_keys)}
+        """
+    ).fetch_record_batch(BATCH_ROWS)
+    write_hive_dataset(reader, base_dir, partition_cols=["country"], layout=layout)
+
+    logger.info("Writing rollups...")
+    write_rollup_datasets(_rollups(con, value_cols, group_to_iso3, top_n))
+
+    summary = con.execute(
+        "SELECT DISTINCT year, country, category FROM trade_flow"
+    ).df()
+    con.close()
+    logger.info("Trade data completed")
+    return summary
@@ -0,0 +1,379 @@
+import itertools
+import json
+import sys
+import tempfile
+import time
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.data.config import PATHS, TUNING_BANDWIDTH, TUNING_SAMPLE_PARTITIONS, logger
+
+# Parquet encodings tried for value columns. "DICTIONARY" is the dictionary
+# encoding pyarrow applies by default; the others are set per column.
+VALUE_ENCODINGS: list[str] = [
+    "DICTIONARY",
+    "PLAIN",
+    "BYTE_STREAM_SPLIT",
+    "DELTA_BINARY_PACKED",
+]
+
+# Codecs and levels tried by the benchmark, all readable by DuckDB-WASM.
+CODECS: dict[str, list[int | None]] = {
+    "zstd": [3, 9, 15, 19, 22],
+    "brotli": [5, 9, 11],
+    "gzip": [9],
+    "snappy": [None],
+    "lz4": [None],
+}
+
+
+def value_columns(schema: pa.Schema) -> list[str]:
+    """Return the names of the value columns of ``schema``."""
+    return [name for name in schema.names if name.startswith("value_")]
+
+
+@dataclass(frozen=True)
+class EncodingConfig:
+    """Compression and encoding settings for the partitioned datasets.
+
+    Attributes:
+        compression: Parquet codec.
+        compression_level: Codec level (None for codecs without levels).
+        value_encoding: Encoding of each value column; unlisted value columns
+            use ``default_value_encoding``. Other columns are always
+            dictionary encoded.
+        default_value_encoding: Encoding of value columns not listed above.
+        narrow_integers: Store int64 value columns as int32 when the values
+            of the whole dataset fit (see ``value_types``).
+    """
+
+    compression: str = "zstd"
+    compression_level: int | None = 15
+    value_encoding: dict[str, str] = field(default_factory=dict)
+    default_value_encoding: str = "DICTIONARY"
+    narrow_integers: bool = False
+
+    def encoding_of(self, column: str) -> str:
+        return self.value_encoding.get(column, self.default_value_encoding)
+
+    def value_types(
+        self, tables: Iterable[pa.Table | pd.DataFrame]
+    ) -> dict[str, pa.DataType]:
+        """Return the type each value column is stored as in every partition.
+
+        With ``narrow_integers``, an int64 value column is stored as int32 when
+        its values fit in all of ``tables`` (the whole dataset), so every
+        partition of a dataset has the same schema.
+        """
+        if not self.narrow_integers:
+            return {}
+        max_abs_values: dict[str, int] = {}
+        for table in tables:
+            if isinstance(table, pd.DataFrame):
+                columns = [
+                    col
+                    for col in table.columns
+                    if col.startswith("value_") and str(table[col].dtype) in ("Int64", "int64")
+                ]
+                maxima = {col: table[col].abs().max() for col in columns}
+            else:
+                columns = [
+                    col
+                    for col in value_columns(table.schema)
+                    if table.schema.field(col).type == pa.int64()
+                ]
+                maxima = {col: pc.max(pc.abs(table[col])).as_py() for col in columns}
+            for col, max_abs_value in maxima.items():
+                max_abs_value = 0 if pd.isna(max_abs_value) else int(max_abs_value)
+                max_abs_values[col] = max(max_abs_values.get(col, 0), max_abs_value)
+        return {
+            col: pa.int32()
+            for col, max_abs_value in max_abs_values.items()
+            if max_abs_value <= 2_147_483_647
+        }
+
+    def prepare(self, table: pa.Table, value_types: Mapping[str, pa.DataType]) -> pa.Table:
+        """Cast the value columns of a partition table to ``value_types``."""
+        for col, type_ in value_types.items():
+            if col in table.column_names and table.schema.field(col).type != type_:
+                i = table.schema.get_field_index(col)
+                table = table.set_column(i, col, pc.cast(table[col], type_))
+        return table
+
+    def write_options(self, schema: pa.Schema) -> dict:
+        """Return ``pq.write_table`` options for a table with ``schema``."""
+        values = value_columns(schema)
+        column_encoding = {
+            col: self.encoding_of(col)
+            for col in values
+            if self.encoding_of(col) != "DICTIONARY"
+        }
+        options = {
+            "compression": self.compression,
+            "use_dictionary": [c for c in schema.names if c not in column_encoding],
+            "write_statistics": True,
+        }
+        if self.compression_level is not None:
+            options["compression_level"] = self.compression_level
+        if column_encoding:
+            options["column_encoding"] = column_encoding
+        return options
+
+
+# Settings used before the tuner: zstd level 15, everything dictionary encoded.
+DEFAULT_ENCODING = EncodingConfig()
+
+
+def _saved_encodings(path: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_encoding(
+    config: EncodingConfig,
+    dataset: str,
+    path: Path = PATHS.PARQUET_ENCODING,
+) -> None:
+    """Save tuned settings for ``dataset``, to be picked up by ``load_encoding``."""
+    saved = _saved_encodings(path)
+    saved[dataset] = asdict(config)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(saved, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_encoding(dataset: str, path: Path = PATHS.PARQUET_ENCODING) -> EncodingConfig:
+    """Return the saved settings of ``dataset``, or ``DEFAULT_ENCODING`` if none."""
+    saved = _saved_encodings(path).get(dataset)
+    return DEFAULT_ENCODING if saved is None else EncodingConfig(**saved)
+
+
+def candidate_configs() -> list[EncodingConfig]:
+    """Return every combination of codec, level, value encoding and width."""
+    return [
+        EncodingConfig(
+            compression=codec,
+            compression_level=level,
+            default_value_encoding=encoding,
+            narrow_integers=narrow,
+        )
+        for (codec, levels), encoding, narrow in itertools.product(
+            CODECS.items(), VALUE_ENCODINGS, [False, True]
+        )
+        for level in levels
+    ]
+
+
+def _decode_seconds(path: Path, repeats: int = 3) -> float:
+    """Best-of-``repeats`` time to decode a parquet file on one thread.
+
+    Uses DuckDB when installed, as the closest stand-in for DuckDB-WASM,
+    and pyarrow otherwise.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        duckdb = None
+
+    if duckdb is not None:
+        con = duckdb.connect()
+        con.execute("SET threads = 1")
+
+        def decode():
+            con.execute(f"SELECT * FROM read_parquet('{path}')").fetchall()
+    else:
+
+        def decode():
+            pq.read_table(path, use_threads=False)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decode()
+        timings.append(time.perf_counter() - start)
+    if duckdb is not None:
+        con.close()
+    return min(timings)
+
+
+def benchmark(
+    tables: Sequence[pa.Table],
+    configs: Iterable[EncodingConfig] | None = None,
+    rows_per_group: int = 100_000,
+) -> pd.DataFrame:
+    """Measure size, write time and decode time of ``tables`` per config.
+
+    Args:
+        tables: Sample partitions, as written (without partition columns).
+        configs: Settings to try (defaults to ``candidate_configs()``).
+        rows_per_group: Row group size used for every file.
+
+    Returns:
+        One row per config with total bytes, write and decode seconds, whether
+        the reader could decode the files, and the compressed bytes of each
+        value column ("bytes:<column>").
+    """
+    configs = candidate_configs() if configs is None else list(configs)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "sample.parquet"
+        for config in configs:
+            row = {
+                "compression": config.compression,
+                "compression_level": config.compression_level,
+                "value_encoding": config.default_value_encoding,
+                "narrow_integers": config.narrow_integers,
+                "bytes": 0,
+                "write_s": 0.0,
+                "decode_s": 0.0,
+                "readable": True,
+            }
+            value_types = config.value_types(tables)
+            for table in tables:
+                table = config.prepare(table, value_types)
+                start = time.perf_counter()
+                pq.write_table(
+                    table,
+                    path,
+                    row_group_size=rows_per_group,
+                    **config.write_options(table.schema),
+                )
+                row["write_s"] += time.perf_counter() - start
+                row["bytes"] += path.stat().st_size
+                try:
+                    row["decode_s"] += _decode_seconds(path)
+                except Exception as e:
+                    # e.g. DuckDB only reads BYTE_STREAM_SPLIT for floats
+                    logger.info("Skipping unreadable %s: %s", config, e)
+                    row["readable"] = False
+                    break
+
+                metadata = pq.ParquetFile(path).metadata
+                for i in range(metadata.num_row_groups):
+                    row_group = metadata.row_group(i)
+                    for j in range(row_group.num_columns):
+                        column = row_group.column(j)
+                        if column.path_in_schema.startswith("value_"):
+                            key = f"bytes:{column.path_in_schema}"
+                            row[key] = row.get(key, 0) + column.total_compressed_size
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def pick_encoding(
+    results: pd.DataFrame,
+    bandwidth: float = TUNING_BANDWIDTH,
+) -> EncodingConfig:
+    """Choose the settings that load fastest from ``benchmark`` results.
+
+    The codec, level and integer width minimise download time at
+    ``bandwidth`` plus decode time. Each value column then gets the encoding
+    that makes it smallest under that codec. Settings the reader failed to
+    decode are never chosen.
+    """
+    results = results[results["readable"]]
+    load_s = results["bytes"] / bandwidth + results["decode_s"]
+    best = results.loc[load_s.idxmin()]
+
+    same_codec = results[
+        (results["compression"] == best["compression"])
+        & (
+            results["compression_level"].isna()
+            if pd.isna(best["compression_level"])
+            else results["compression_level"] == best["compression_level"]
+        )
+        & (results["narrow_integers"] == best["narrow_integers"])
+    ]
+    value_encoding = {
+        key.removeprefix("bytes:"): same_codec.loc[same_codec[key].idxmin(), "value_encoding"]
+        for key in results.columns
+        if key.startswith("bytes:")
+    }
+    return EncodingConfig(
+        compression=best["compression"],
+        compression_level=(
+            None if pd.isna(best["compression_level"]) else int(best["compression_level"])
+        ),
+        value_encoding=value_encoding,
+        default_value_encoding=best["value_encoding"],
+        narrow_integers=bool(best["narrow_integers"]),
+    )
+
+
+def tune_encoding(
+    tables: Sequence[pa.Table],
+    dataset: str,
+    bandwidth: float = TUNING_BANDWIDTH,
+    rows_per_group: int = 100_000,
+    path: Path = PATHS.PARQUET_ENCODING,
+) -> EncodingConfig:
+    """Benchmark sample partitions of ``dataset`` and save the fastest settings.
+
+    Args:
+        tables: Sample partitions, as written (without partition columns).
+        dataset: Dataset name the settings are saved under.
+        bandwidth: Connection speed the load time is estimated at, in bytes/s.
+        rows_per_group: Row group size used for every file.
+        path: Settings file.
+
+    Returns:
+        The chosen settings.
+    """
+    logger.info(
+        "Benchmarking parquet encodings for %s on %s partitions", dataset, len(tables)
+    )
+    results = benchmark(tables, rows_per_group=rows_per_group)
+    config = pick_encoding(results, bandwidth)
+
+    baseline = benchmark(tables, [DEFAULT_ENCODING], rows_per_group)
+    tuned = benchmark(tables, [config], rows_per_group)
+    logger.info(
+        "Tuned encoding %s level %s: %s → %s bytes on the sample",
+        config.compression,
+        config.compression_level,
+        f"{baseline['bytes'].iat[0]:,}",
+        f"{tuned['bytes'].iat[0]:,}",
+    )
+    save_encoding(config, dataset, path)
+    return config
+
+
+def sample_tables(dataset_dir: Path, n: int) -> list[pa.Table]:
+    """Read up to ``n`` evenly spaced partitions of a written dataset."""
+    partitions = sorted(path for path in dataset_dir.iterdir() if path.is_dir())
+    step = max(1, len(partitions) // max(1, n))
+    return [
+        pq.read_table(sorted(path.glob("*.parquet")))
+        for path in partitions[::step][:n]
+    ]
+
+
+def benchmark_dataset(
+    dataset_dir: Path = PATHS.CDN_FILES / "trade",
+    n: int = TUNING_SAMPLE_PARTITIONS,
+) -> pd.DataFrame:
+    """Benchmark every candidate config on partitions of a written dataset."""
+    return benchmark(sample_tables(dataset_dir, n))
+
+
+if __name__ == "__main__":
+    # Usage: encoding.py [DATASET] [--apply]
+    # Benchmarks the written dataset (default "trade") and, with --apply,
+    # saves the fastest-loading settings for the next build.
+    args = [arg for arg in sys.argv[1:] if arg != "--apply"]
+    dataset = args[0] if args else "trade"
+    results = benchmark_dataset(PATHS.CDN_FILES / dataset, TUNING_SAMPLE_PARTITIONS)
+    results["load_s"] = results["bytes"] / TUNING_BANDWIDTH + results["decode_s"]
+    print(results.sort_values("load_s").to_string(index=False))
+    if "--apply" in sys.argv:
+        config = pick_encoding(results)
+        save_encoding(config, dataset)
+        logger.info("Saved %s to %s", config, PATHS.PARQUET_ENCODING)
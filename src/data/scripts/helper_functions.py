@@ -1,18 +1,47 @@
+import ctypes
 import os
 import sys
 import shutil
+from collections import deque
+from collections.abc import Collection, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 import pyarrow.dataset as ds
 
-
-from oda_data import set_data_path
-from pydeflate import set_pydeflate_path
-
-from src.data.config import PATHS, logger
+from src.data.config import (
+    AUTO_TUNE_ENCODING,
+    PATHS,
+    TUNING_SAMPLE_PARTITIONS,
+    WRITE_WORKERS,
+    logger,
+)
+from src.data.scripts.arrow_stages import (
+    dictionary_codes,
+    log_units_type,
+    sort_table,
+    value_units,
+)
+from src.data.scripts.cache import file_digest
+from src.data.scripts.encoding import EncodingConfig, load_encoding, tune_encoding
+from src.data.scripts.layout import LayoutPlan, plan_file_rows, plan_layout
+from src.data.scripts.manifest import (
+    build_manifest,
+    diff_manifests,
+    file_entry,
+    log_diff,
+    partition_entry,
+    partition_key,
+    read_manifest,
+    write_manifest,
+)
+from src.data.scripts.profiling import profiled
 
 
 def set_cache_dir(path=PATHS.DATA, oda_data: bool = False, pydeflate: bool = False):
@@ -21,8 +50,12 @@ def set_cache_dir(path=PATHS.DATA, oda_data: bool = False, pydeflate: bool = Fal
         os.makedirs(path)
 
     if oda_data:
+        from oda_data import set_data_path
+
         set_data_path(path)
     if pydeflate:
+        from pydeflate import set_pydeflate_path
+
         set_pydeflate_path(path)
 
 
@@ -91,7 +124,9 @@ def convert_values_to_units(df: pd.DataFrame) -> pd.DataFrame:
     Convert value columns from millions to units for better compression.
 
     Multiplies value_* columns by 1e6, rounds to integers, and converts to Int32/Int64.
-    Percentage columns (pct_*) are left as Float32.
+    Percentage columns (pct_*) are left as Float32. Each column is converted in
+    chunks straight into its integer buffer (see ``value_units``), so the frame
+    is never copied.
 
     Args:
         df: DataFrame with value_* columns in millions
@@ -102,30 +137,21 @@ def convert_values_to_units(df: pd.DataFrame) -> pd.DataFrame:
     Note:
         Frontend queries must divide value_* columns by 1e6 to convert back to millions.
     """
-    df = df.copy()
+    # Shallow copy: columns are replaced, never modified in place
+    df = df.copy(deep=False)
 
     # Get value columns (exclude percentage columns)
     value_cols = [c for c in df.columns if c.startswith("value_")]
 
     for col in value_cols:
-        # Convert to units (multiply by 1 million)
-        units = (df[col] * 1e6).round()
-
-        # Check if values fit in Int32 range (±2.1 billion)
-        max_abs_value = units.abs().max()
-
-        if pd.isna(max_abs_value):
-            # All values are NaN, use Int32 as default
-            df[col] = units.astype("Int32")
-            logger.info(f"Column {col}: All NaN, using Int32")
-        elif max_abs_value > 2_147_483_647:
-            # Need Int64
-            df[col] = units.astype("Int64")
-            logger.info(f"Column {col}: Max value {max_abs_value:,.0f} requires Int64")
-        else:
-            # Can use Int32 (more efficient)
-            df[col] = units.astype("Int32")
-            logger.info(f"Column {col}: Max value {max_abs_value:,.0f} fits in Int32")
+        # Convert to units (multiply by 1 million) chunk by chunk, in the
+        # column's float precision, straight into Int32 (Int64 if needed)
+        values = df[col].to_numpy()
+        if values.dtype.kind != "f":
+            values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        units, missing, max_abs_value = value_units(values)
+        log_units_type(col, max_abs_value)
+        df[col] = pd.arrays.IntegerArray(units, missing)
 
     return df
 
@@ -135,10 +161,12 @@ def convert_values_to_units(df: pd.DataFrame) -> pd.DataFrame:
 # ============================================================================
 
 
+@profiled
 def optimize_dataframe_types(
     df: pd.DataFrame,
     additional_int32_cols: list[str] = None,
     additional_categorical_cols: list[str] = None,
+    sort_keys: list[str] = None,
 ) -> pd.DataFrame:
     """
     Optimize DataFrame column types for efficient parquet storage.
@@ -147,11 +175,13 @@ def optimize_dataframe_types(
         df: DataFrame to optimize
         additional_int32_cols: Extra columns to convert to Int32 (e.g., ['sub_sector_code'])
         additional_categorical_cols: Extra columns to convert to category (e.g., ['sector_name'])
+        sort_keys: Columns to sort by (defaults to the standard keys present)
 
     Returns:
         Optimized DataFrame with efficient dtypes
     """
-    df = df.copy()
+    # Shallow copy: columns are replaced, never modified in place
+    df = df.copy(deep=False)
 
     # Value columns → Float32 (unless already Int32/Int64 from convert_values_to_units)
     value_cols = [
@@ -184,16 +214,17 @@ def optimize_dataframe_types(
             df[col] = df[col].astype("category")
 
     # Sort by standard keys for better compression and groupby performance
-    sort_keys = [
-        c
-        for c in [
-            "category",
-            "exporter",
-            "importer",
-            "year",
+    if sort_keys is None:
+        sort_keys = [
+            c
+            for c in [
+                "category",
+                "exporter",
+                "importer",
+                "year",
+            ]
+            if c in df.columns
         ]
-        if c in df.columns
-    ]
     if sort_keys:
         df = df.sort_values(sort_keys, kind="stable")
 
@@ -250,63 +281,525 @@ def dataframe_to_arrow_table(
     return pa.Table.from_pandas(df, preserve_index=False), value_cols
 
 
+@profiled
+def optimize_table_types(table: pa.Table, sort_keys: list[str] = None) -> pa.Table:
+    """
+    Arrow counterpart of ``optimize_dataframe_types`` for pipeline output tables.
+
+    Float value columns become float32, ``year`` becomes int16 and rows are
+    sorted by the same standard keys, without leaving Arrow.
+
+    Args:
+        table: Table to optimize
+        sort_keys: Columns to sort by (defaults to the standard keys present)
+
+    Returns:
+        Optimized table
+    """
+    for i, field in enumerate(table.schema):
+        if field.name == "year":
+            table = table.set_column(i, field.name, pc.cast(table[i], pa.int16()))
+        elif field.name.startswith(("value_", "pct")) and pa.types.is_floating(
+            field.type
+        ):
+            table = table.set_column(i, field.name, pc.cast(table[i], pa.float32()))
+
+    if sort_keys is None:
+        sort_keys = [
+            c
+            for c in ["category", "exporter", "importer", "year"]
+            if c in table.column_names
+        ]
+    return sort_table(table, sort_keys)
+
+
+@profiled
 def write_partitioned_dataset(
-    df: pd.DataFrame,
+    df: pd.DataFrame | pa.Table,
     base_dir: str,
     partition_cols: list[str] = None,
+    layout: LayoutPlan = None,
+    workers: int = WRITE_WORKERS,
+    partial: bool = False,
+    removed: Collection[str] = (),
 ) -> None:
     """
     Write DataFrame as a partitioned parquet dataset (for large datasets like sectors).
 
+    Rows are grouped by partition and sorted within each partition by the
+    layout's sort keys, so row group statistics prune the frontend's queries.
+
     Args:
-        df: DataFrame to write
+        df: DataFrame (or Arrow table from the Arrow engine) to write
         base_dir: Base directory name (will be created under PATHS.CDN_FILES)
         partition_cols: Columns to partition by (defaults to ['donor_code', 'recipient_code'])
+        layout: Sort order and row group sizing (planned from the partition
+            sizes by default)
+        workers: Threads writing partitions in parallel
+        partial: Only replace the partitions present in ``df``, keeping the
+            others (see ``write_hive_dataset``)
+        removed: Manifest keys of existing partitions to drop when ``partial``
     """
     if partition_cols is None:
         partition_cols = ["category"]
 
-    # Optimize types with additional columns for sectors
-    # Include sub_sector_code as Int32 and sector_name/sub_sector_name as categorical
-    optimized = optimize_dataframe_types(
-        df,
-        additional_int32_cols=[],
-        additional_categorical_cols=[],
+    columns = df.column_names if isinstance(df, pa.Table) else df.columns
+    if layout is None:
+        if isinstance(df, pa.Table):
+            sizes = (
+                df.group_by(partition_cols)
+                .aggregate([(partition_cols[0], "count")])
+                .column(f"{partition_cols[0]}_count")
+                .to_numpy()
+            )
+        else:
+            sizes = df.groupby(partition_cols, observed=True).size().to_numpy()
+        layout = plan_layout(sizes)
+    sort_keys = [*partition_cols, *(c for c in layout.sort_keys if c in columns)]
+
+    if isinstance(df, pa.Table):
+        # Already columnar: optimize in Arrow, no pandas round trip
+        data = optimize_table_types(df, sort_keys=sort_keys)
+    else:
+        # Optimize types with additional columns for sectors
+        # Include sub_sector_code as Int32 and sector_name/sub_sector_name as categorical
+        # Partitions are converted to Arrow one at a time by the writer
+        data = optimize_dataframe_types(
+            df,
+            additional_int32_cols=[],
+            additional_categorical_cols=[],
+            sort_keys=sort_keys,
+        )
+
+    write_hive_dataset(
+        data,
+        base_dir,
+        partition_cols,
+        layout,
+        workers=workers,
+        partial=partial,
+        removed=removed,
     )
 
-    # Convert to Arrow table
-    table = pa.Table.from_pandas(optimized, preserve_index=False)
 
-    # Setup output directory
-    output_dir = PATHS.CDN_FILES / base_dir
+# Columns stored as dictionaries in the trade dataset (see optimize_dataframe_types).
+DICTIONARY_COLUMNS: list[str] = ["partner", "flow", "category"]
+
+
+def decode_dictionaries(data: pd.DataFrame | pa.Table) -> pa.Table:
+    """Return ``data`` as a table with dictionary columns decoded."""
+    table = (
+        pa.Table.from_pandas(data, preserve_index=False)
+        if isinstance(data, pd.DataFrame)
+        else data
+    )
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table[i].cast(field.type.value_type))
+    return table.replace_schema_metadata(None)
+
+
+def assemble_partition(
+    tables: list[pa.Table],
+    sort_keys: list[str],
+    value_types: dict[str, pa.DataType] = None,
+) -> pa.Table:
+    """
+    Combine pieces of one trade partition into the table written for it.
+
+    Pieces are tables decoded by ``decode_dictionaries`` whose integer value
+    columns may differ in width. The result has the column types
+    ``optimize_dataframe_types`` gives a whole dataset: ``year`` as int16 and
+    ``DICTIONARY_COLUMNS`` as dictionaries, sorted by ``sort_keys``.
+
+    Args:
+        tables: Pieces of the partition
+        sort_keys: Columns to sort by (those missing are skipped)
+        value_types: Type of each value column (defaults to the widest piece)
+
+    Returns:
+        The partition as one table
+    """
+    table = pa.concat_tables(tables, promote_options="permissive")
+    types = {"year": pa.int16(), **(value_types or {})}
+    for col, type_ in types.items():
+        if col in table.column_names:
+            table = table.set_column(
+                table.schema.get_field_index(col), col, table[col].cast(type_)
+            )
+    table = sort_table(table, [c for c in sort_keys if c in table.column_names])
+    for col in DICTIONARY_COLUMNS:
+        if col in table.column_names:
+            table = table.set_column(
+                table.schema.get_field_index(col), col, table[col].dictionary_encode()
+            )
+    return table
+
+
+def _run_starts(keys: list[np.ndarray]) -> np.ndarray:
+    """Return the row positions where the combination of ``keys`` changes."""
+    n = len(keys[0]) if keys else 0
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def _table_key_codes(column: pa.ChunkedArray) -> np.ndarray:
+    """Return integer codes identifying the values of an Arrow column."""
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    return dictionary_codes(column.dictionary_encode())
+
+
+def _frame_partitions(
+    df: pd.DataFrame, partition_cols: list[str]
+) -> Iterator[tuple[tuple, pd.DataFrame]]:
+    """Yield the key and rows of each partition of a DataFrame sorted by them."""
+    starts = _run_starts([pd.factorize(df[col])[0] for col in partition_cols])
+    bounds = [*starts, len(df)]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        key = tuple(df[col].iat[start] for col in partition_cols)
+        yield key, df.iloc[start:stop]
+
+
+def _stream_partitions(
+    tables: Iterable[pa.Table], partition_cols: list[str]
+) -> Iterator[tuple[tuple, pa.Table]]:
+    """Yield the key and rows of each partition of a stream sorted by them.
+
+    A partition may span several batches; it is yielded once the key changes,
+    so only one partition is held in memory at a time.
+    """
+    pending: list[pa.Table] = []
+    pending_key = None
+    for table in tables:
+        starts = _run_starts([_table_key_codes(table[col]) for col in partition_cols])
+        bounds = [*starts, table.num_rows]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            key = tuple(table[col][start].as_py() for col in partition_cols)
+            if pending and key != pending_key:
+                yield pending_key, pa.concat_tables(pending)
+                pending = []
+            pending_key = key
+            pending.append(table.slice(start, stop - start))
+    if pending:
+        yield pending_key, pa.concat_tables(pending)
+
+
+def _partition_dir(
+    root: Path, partitioning: ds.Partitioning, partition_cols: list[str], key: tuple
+) -> Path:
+    """Return the Hive directory of a partition, encoded as ``ds.write_dataset`` does."""
+    expression = None
+    for col, value in zip(partition_cols, key):
+        term = pc.field(col).is_null() if pd.isna(value) else pc.field(col) == value
+        expression = term if expression is None else expression & term
+    directory, _ = partitioning.format(expression)
+    return root / directory
+
+
+def _compact_dictionaries(table: pa.Table) -> pa.Table:
+    """Re-encode dictionary columns over the values present in ``table``."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            values = table[i].cast(field.type.value_type)
+            table = table.set_column(i, field.name, values.dictionary_encode())
+    return table
+
+
+def _partition_table(data: pd.DataFrame | pa.Table, partition_cols: list[str]) -> pa.Table:
+    """Return a partition as the Arrow table written to its files.
+
+    Dictionaries only hold the partition's own values, so a partition's bytes
+    do not change when other partitions do.
+    """
+    if isinstance(data, pa.Table):
+        table = _compact_dictionaries(data.replace_schema_metadata(None))
+    else:
+        cat_cols = [
+            c for c in data.columns if isinstance(data[c].dtype, pd.CategoricalDtype)
+        ]
+        data = data.assign(
+            **{c: data[c].cat.remove_unused_categories() for c in cat_cols}
+        )
+        table = pa.Table.from_pandas(data, preserve_index=False)
+    return table.drop_columns(partition_cols)
+
+
+def _write_partition(
+    data: pd.DataFrame | pa.Table,
+    directory: Path,
+    partition_cols: list[str],
+    layout: LayoutPlan,
+    encoding: EncodingConfig,
+    value_types: dict[str, pa.DataType],
+) -> list[dict]:
+    """Write one partition as evenly sized, content-named parquet files.
+
+    The output is byte-identical for identical input, so files are named
+    ``part-{i}-{hash}.parquet`` after the SHA-256 of their content.
+
+    Returns:
+        The manifest entry of each file written (see ``manifest.file_entry``).
+    """
+    table = encoding.prepare(_partition_table(data, partition_cols), value_types)
+    rows_per_file = plan_file_rows(table.num_rows, layout.rows_per_group)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    entries = []
+    for i, start in enumerate(range(0, table.num_rows, rows_per_file)):
+        path = directory / f"part-{i}.parquet.tmp"
+        pq.write_table(
+            table.slice(start, rows_per_file),
+            path,
+            row_group_size=layout.rows_per_group,
+            **encoding.write_options(table.schema),
+            **layout.file_options(),
+        )
+        # Name files by content, so unchanged data keeps its name across builds
+        digest = file_digest(path)
+        final_path = path.rename(directory / f"part-{i}-{digest[:16]}.parquet")
+        entries.append(file_entry(final_path, digest))
+    return entries
+
+
+def _carry_partitions(
+    previous: dict | None, keep: set[str], output_dir: Path, staging_dir: Path
+) -> list[dict]:
+    """Link the files of existing partitions into a staging directory.
+
+    Args:
+        previous: Manifest of the existing dataset (see ``read_manifest``).
+        keep: Manifest keys of the partitions to carry over.
+
+    Returns:
+        The manifest entries of the partitions carried over.
+    """
+    if not previous:
+        return []
+    entries = []
+    for key, entry in previous["partitions"].items():
+        if key not in keep:
+            continue
+        target = staging_dir / entry["path"]
+        target.mkdir(parents=True, exist_ok=True)
+        for file in entry["files"]:
+            source = output_dir / entry["path"] / file["name"]
+            try:
+                os.link(source, target / file["name"])
+            except OSError:
+                shutil.copy2(source, target / file["name"])
+        entries.append(entry)
+    return entries
+
+
+# renameat2 flag swapping two existing paths in one step (Linux).
+RENAME_EXCHANGE: int = 2
+AT_FDCWD: int = -100
+
+
+def _exchange_directories(first: Path, second: Path) -> bool:
+    """Atomically swap two directories, where the platform supports it.
+
+    Returns:
+        Whether the directories were swapped (False without ``renameat2``,
+        e.g. outside Linux or on file systems that do not support it).
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    renameat2 = getattr(ctypes.CDLL(None, use_errno=True), "renameat2", None)
+    if renameat2 is None:
+        return False
+    renameat2.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_uint,
+    ]
+    result = renameat2(
+        AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE
+    )
+    return result == 0
+
+
+def _previous_dir(output_dir: Path) -> Path:
+    """Return where ``_replace_directory`` moves the live directory aside."""
+    return output_dir.with_name(f".{output_dir.name}.previous")
+
+
+def _restore_directory(output_dir: Path) -> None:
+    """Put back a live directory left aside by an interrupted replacement."""
+    previous_dir = _previous_dir(output_dir)
+    if previous_dir.exists() and not output_dir.exists():
+        logger.warning("Restoring %s from an interrupted write", output_dir)
+        previous_dir.rename(output_dir)
+
+
+def _replace_directory(staging_dir: Path, output_dir: Path) -> None:
+    """Swap a fully written staging directory in place of ``output_dir``.
+
+    The live directory is only replaced once the new one is complete, so a
+    failed write never leaves a partial dataset behind. Where supported the
+    two directories are exchanged in one step, so ``output_dir`` always
+    exists. Otherwise the live directory is moved aside first and only
+    deleted once the new one is in place; ``_restore_directory`` puts it
+    back if the process stops in between.
+    """
+    if output_dir.exists() and _exchange_directories(staging_dir, output_dir):
+        # The staging directory now holds the previous dataset
+        shutil.rmtree(staging_dir)
+        return
+
+    previous_dir = _previous_dir(output_dir)
+    if previous_dir.exists():
+        shutil.rmtree(previous_dir)
     if output_dir.exists():
-        logger.info("Clearing existing partitioned dataset at %s", output_dir)
-        shutil.rmtree(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # Define partition schema (all partition cols must be int32 for Hive partitioning)
-    partition_fields = [pa.field(col, pa.string()) for col in partition_cols]
-    partition_schema = pa.schema(partition_fields)
-
-    # Configure parquet format with write options
-    parquet_format = ds.ParquetFileFormat()
-    file_options = parquet_format.make_write_options(
-        compression="zstd",
-        compression_level=15,
-        use_dictionary=True,
-        write_statistics=True,
+        output_dir.rename(previous_dir)
+    staging_dir.rename(output_dir)
+    if previous_dir.exists():
+        shutil.rmtree(previous_dir)
+
+
+@profiled
+def write_hive_dataset(
+    data: pd.DataFrame | pa.Table | pa.RecordBatchReader,
+    base_dir: str,
+    partition_cols: list[str],
+    layout: LayoutPlan = LayoutPlan(),
+    workers: int = WRITE_WORKERS,
+    encoding: EncodingConfig = None,
+    partial: bool = False,
+    removed: Collection[str] = (),
+    value_types: dict[str, pa.DataType] = None,
+) -> None:
+    """
+    Write data as a Hive-partitioned parquet dataset, replacing any existing one.
+
+    Partitions are streamed out of ``data`` one at a time and compressed in
+    parallel threads into a staging directory, which replaces the existing
+    dataset only once every partition and the manifest (``_manifest.json``:
+    files, sizes, row counts, statistics and hashes) are written.
+
+    Args:
+        data: DataFrame, table, or stream of record batches or tables,
+            sorted by ``partition_cols`` and then per layout
+        base_dir: Base directory name (will be created under PATHS.CDN_FILES)
+        partition_cols: Columns to partition by
+        layout: Row group size and page index/bloom filter options
+        workers: Threads writing partitions in parallel
+        encoding: Codec and column encodings (by default tuned on the first
+            partitions when AUTO_TUNE_ENCODING is set, else the saved settings
+            of ``base_dir``)
+        partial: Only replace the partitions present in ``data``; the other
+            partitions of the existing dataset are kept as they are (an
+            existing dataset without a manifest raises ValueError)
+        removed: Manifest keys of existing partitions to drop when ``partial``
+        value_types: Type of each value column in every partition (by default
+            ``encoding.value_types`` of a DataFrame or table; a stream keeps
+            its own types)
+    """
+    output_dir = PATHS.CDN_FILES / base_dir
+    _restore_directory(output_dir)
+    if partial and output_dir.exists() and read_manifest(output_dir) is None:
+        raise ValueError(
+            f"{output_dir} has no manifest, so its other partitions cannot be "
+            "carried over; write the whole dataset first"
+        )
+    staging_dir = output_dir.with_name(f".{output_dir.name}.staging")
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    staging_dir.mkdir(parents=True)
+
+    if isinstance(data, pd.DataFrame):
+        partitions = _frame_partitions(data, partition_cols)
+    elif isinstance(data, pa.Table):
+        partitions = _stream_partitions([data], partition_cols)
+    else:
+        partitions = _stream_partitions(
+            (
+                batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch])
+                for batch in data
+            ),
+            partition_cols,
+        )
+
+    if encoding is None and AUTO_TUNE_ENCODING:
+        sample = list(islice(partitions, TUNING_SAMPLE_PARTITIONS))
+        encoding = tune_encoding(
+            [_partition_table(partition, partition_cols) for _, partition in sample],
+            base_dir,
+            rows_per_group=layout.rows_per_group,
+        )
+        partitions = chain(sample, partitions)
+    elif encoding is None:
+        encoding = load_encoding(base_dir)
+    if value_types is None:
+        # One width per column for the whole dataset, so partition schemas agree
+        value_types = encoding.value_types(
+            [data] if isinstance(data, (pd.DataFrame, pa.Table)) else []
+        )
+
+    # Partition directories are named as by ds.write_dataset (Hive, URI-encoded)
+    partitioning = ds.partitioning(
+        pa.schema([pa.field(col, pa.string()) for col in partition_cols]),
+        flavor="hive",
     )
 
-    # Write partitioned dataset
-    ds.write_dataset(
-        data=table,
-        base_dir=str(output_dir),
-        format="parquet",
-        partitioning=ds.partitioning(partition_schema, flavor="hive"),
-        basename_template="part-{i}.parquet",
-        file_options=file_options,
-        existing_data_behavior="delete_matching",
-        max_rows_per_file=1_000_000,
-        max_rows_per_group=100_000,
-        min_rows_per_group=100_000,
+    entries: list[dict] = []
+
+    def collect(values: dict, path: Path, future: Future) -> None:
+        entries.append(
+            partition_entry(values, path.relative_to(staging_dir).as_posix(), future.result())
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            # Bound the partitions held in memory while waiting for a thread
+            in_flight: deque[tuple[dict, Path, Future]] = deque()
+            for key, partition in partitions:
+                if len(in_flight) >= 2 * max(1, workers):
+                    collect(*in_flight.popleft())
+                path = _partition_dir(staging_dir, partitioning, partition_cols, key)
+                future = executor.submit(
+                    _write_partition,
+                    partition,
+                    path,
+                    partition_cols,
+                    layout,
+                    encoding,
+                    value_types,
+                )
+                in_flight.append((dict(zip(partition_cols, key)), path, future))
+            while in_flight:
+                collect(*in_flight.popleft())
+        previous = read_manifest(output_dir)
+        if partial:
+            written = {partition_key(entry["values"]) for entry in entries}
+            entries.extend(
+                _carry_partitions(
+                    previous,
+                    set(previous["partitions"]) - written - set(removed)
+                    if previous
+                    else set(),
+                    output_dir,
+                    staging_dir,
+                )
+            )
+        manifest = build_manifest(entries, partition_cols, layout.sort_keys)
+        write_manifest(staging_dir, manifest)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    log_diff(diff_manifests(previous, manifest))
+    _replace_directory(staging_dir, output_dir)
+    logger.info(
+        "Wrote %s partitions (%s rows) to %s",
+        f"{len(entries):,}",
+        f"{sum(entry['rows'] for entry in entries):,}",
+        output_dir,
     )
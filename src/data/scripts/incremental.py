@@ -0,0 +1,300 @@
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.data.config import (
+    BUILD_WORKERS,
+    MEMORY_BUDGET,
+    OFFLINE_FACTORS,
+    PATHS,
+    USE_STAGE_CACHE,
+    WRITE_WORKERS,
+    logger,
+)
+from src.data.scripts.helper_functions import (
+    assemble_partition,
+    convert_values_to_units,
+    decode_dictionaries,
+    write_hive_dataset,
+)
+from src.data.scripts.layout import LayoutPlan, plan_layout
+from src.data.scripts.manifest import read_manifest
+from src.data.scripts.mappings import mappings
+from src.data.scripts.profiling import profiled
+from src.data.scripts.rollups import build_rollups, write_rollup_datasets
+from src.data.scripts.trade import (
+    build_state,
+    build_trade_dataset,
+    configured_years,
+    generate_input_values,
+    process_trade_data,
+    read_build_state,
+    read_input_values_source,
+    write_build_state,
+)
+from src.data.scripts.transformations import (
+    add_country_groups,
+    reshape_to_country_flow,
+)
+
+
+def plan_update(previous: dict | None, current: dict) -> dict[str, list] | None:
+    """Compare the state of the last build with the current inputs.
+
+    Returns:
+        The changed (or added) and removed years and groups, or None when
+        the whole dataset has to be rebuilt: there is no previous build, a
+        setting other than the groups changed, or every year changed.
+    """
+    if (
+        previous is None
+        or previous.get("version") != current["version"]
+        or previous["settings"] != current["settings"]
+        or read_manifest(PATHS.CDN_FILES / "trade") is None
+    ):
+        return None
+
+    years = sorted(
+        int(year)
+        for year, name in current["years"].items()
+        if previous["years"].get(year) != name
+    )
+    if years and len(years) == len(current["years"]):
+        return None
+
+    return {
+        "years": years,
+        "removed_years": sorted(
+            int(year) for year in previous["years"].keys() - current["years"].keys()
+        ),
+        "groups": sorted(
+            group
+            for group, members in current["groups"].items()
+            if previous["groups"].get(group) != members
+        ),
+        "removed_groups": sorted(previous["groups"].keys() - current["groups"].keys()),
+    }
+
+
+def _changed_views(base: pd.DataFrame, plan: Mapping[str, list]) -> list[pd.DataFrame]:
+    """Compute the rows ``plan`` changes from trade data with country names."""
+    registry = mappings()
+    in_changed_years = base["year"].isin(plan["years"]).to_numpy()
+
+    slices = []
+    if plan["years"] and in_changed_years.any():
+        slices.append(
+            add_country_groups(
+                base[in_changed_years], registry.membership_df, registry.group_to_iso3
+            )
+        )
+    if plan["groups"]:
+        slices.append(
+            add_country_groups(
+                base[~in_changed_years],
+                registry.membership_df,
+                registry.group_to_iso3,
+                only_groups=plan["groups"],
+            )
+        )
+    return [
+        convert_values_to_units(reshape_to_country_flow(rows))
+        for rows in slices
+        if not rows.empty
+    ]
+
+
+def changed_rows(
+    plan: Mapping[str, list],
+    years: Sequence[int] | None = None,
+    offline: bool = OFFLINE_FACTORS,
+    workers: int = BUILD_WORKERS,
+    use_cache: bool = USE_STAGE_CACHE,
+    memory_budget: str | int | None = MEMORY_BUDGET,
+) -> list[pd.DataFrame]:
+    """Recompute the trade rows affected by ``plan``, in units.
+
+    Stages up to the country names do not depend on the groups, so they are
+    served from the stage cache when only groups changed. Changed years then
+    go through every remaining stage, while for the other years only the
+    views involving changed groups are computed.
+
+    With ``memory_budget``, only the years ``plan`` needs (every year if a
+    group changed) are processed, in chunks of years that fit the budget and
+    without the stage cache, as in a chunked build (see ``chunked.py``).
+    Only the changed rows of each chunk are kept.
+
+    Returns:
+        Trade rows (one frame per slice) as written to the dataset.
+    """
+    chunks: list[Sequence[int] | None] = [years]
+    if memory_budget:
+        from src.data.scripts.chunked import year_chunks
+
+        needed = configured_years(years) if plan["groups"] else plan["years"]
+        chunks = year_chunks(memory_budget, needed, workers) if needed else []
+        use_cache = False
+
+    frames = []
+    for chunk in chunks:
+        base = process_trade_data(
+            use_cache=use_cache,
+            offline=offline,
+            engine="pandas",
+            years=chunk,
+            workers=workers,
+            until="names",
+        )
+        frames.extend(_changed_views(base, plan))
+        del base
+    return frames
+
+
+def _may_hold_stale_rows(entry: Mapping, plan: Mapping[str, list]) -> bool:
+    """Whether a partition's statistics allow rows that ``plan`` replaces."""
+    stats = entry["stats"]
+    years = [*plan["years"], *plan["removed_years"]]
+    groups = [*plan["groups"], *plan["removed_groups"]]
+    if years and (
+        "year" not in stats
+        or any(stats["year"][0] <= year <= stats["year"][1] for year in years)
+    ):
+        return True
+    return bool(groups) and (
+        "partner" not in stats
+        or any(stats["partner"][0] <= group <= stats["partner"][1] for group in groups)
+    )
+
+
+def _stale_mask(table: pa.Table, plan: Mapping[str, list]) -> pa.ChunkedArray:
+    """Return which rows of a partition ``plan`` replaces or removes."""
+    years = pa.array([*plan["years"], *plan["removed_years"]], table["year"].type)
+    groups = pa.array([*plan["groups"], *plan["removed_groups"]], pa.string())
+    return pc.or_(
+        pc.is_in(table["year"], value_set=years),
+        pc.fill_null(pc.is_in(table["partner"], value_set=groups), False),
+    )
+
+
+def updated_partitions(
+    frames: Sequence[pd.DataFrame],
+    plan: Mapping[str, list],
+    manifest: Mapping,
+    dataset_dir: Path,
+    layout: LayoutPlan,
+    rollups: dict[str, list[pd.DataFrame]],
+) -> Iterator[pa.Table]:
+    """Yield every partition that ``plan`` changes, with its new rows.
+
+    Rows that ``plan`` replaces are dropped from the existing files and the
+    recomputed rows of the partition added, and the result is sorted per
+    ``layout``. Partitions whose statistics rule out stale rows and that get
+    no new rows are not read. The rollups of each partition yielded are
+    appended to ``rollups``.
+    """
+    new_rows: dict[str, list[pd.DataFrame]] = {}
+    for frame in frames:
+        for country, positions in frame.groupby("country", observed=True).indices.items():
+            new_rows.setdefault(country, []).append(frame.iloc[positions])
+
+    replaced = {*plan["groups"], *plan["removed_groups"]}
+    for key in sorted(manifest["partitions"].keys() | new_rows.keys()):
+        if key in plan["removed_groups"]:
+            continue
+        entry = manifest["partitions"].get(key)
+        tables = [decode_dictionaries(rows) for rows in new_rows.get(key, [])]
+        if entry is not None and key not in replaced:
+            if not tables and not _may_hold_stale_rows(entry, plan):
+                continue
+            existing = pa.concat_tables(
+                [
+                    pq.ParquetFile(dataset_dir / entry["path"] / file["name"]).read()
+                    for file in entry["files"]
+                ]
+            )
+            existing = decode_dictionaries(existing)
+            stale = _stale_mask(existing, plan)
+            if not tables and not pc.any(stale).as_py():
+                continue
+            existing = existing.filter(pc.invert(stale))
+            country = pa.array([key] * existing.num_rows, pa.string())
+            tables.insert(0, existing.append_column("country", country))
+        if not tables:
+            continue
+
+        table = assemble_partition(tables, layout.sort_keys)
+        for name, rollup in build_rollups(table).items():
+            rollups.setdefault(name, []).append(rollup)
+        yield table
+
+
+@profiled
+def update_trade_dataset(
+    years: Sequence[int] | None = None,
+    offline: bool = OFFLINE_FACTORS,
+    workers: int = BUILD_WORKERS,
+    write_workers: int = WRITE_WORKERS,
+    use_cache: bool = USE_STAGE_CACHE,
+    memory_budget: str | int | None = MEMORY_BUDGET,
+) -> None:
+    """Bring the trade dataset up to date, rewriting only what changed.
+
+    Compares the inputs with the state of the last build (see
+    ``build_state``). Changed BACI years and changed country groups are
+    recomputed on their own and spliced into the partitions holding their
+    rows; the other partitions, and the rows of the rewritten ones that did
+    not change, are kept. Falls back to a full build when the changes are
+    not limited to years and groups, or the last build used another engine
+    or product level. Updates always run on the pandas engine; with
+    ``memory_budget`` the recomputed years are processed in chunks that fit
+    it (see ``changed_rows``), and a fallback full build is chunked as well.
+    """
+    current = build_state(years, offline, engine="pandas")
+    plan = plan_update(read_build_state(), current)
+    if plan is None:
+        logger.info("No previous build to update, rebuilding the trade dataset")
+        build_trade_dataset(
+            engine="pandas",
+            years=years,
+            workers=workers,
+            write_workers=write_workers,
+            memory_limit=memory_budget,
+            use_cache=use_cache,
+            offline=offline,
+        )
+        return
+    if not any(plan.values()):
+        logger.info("Trade dataset is up to date")
+        return
+
+    logger.info(
+        "Updating years %s and groups %s; removing years %s and groups %s",
+        *(plan[key] or "-" for key in ("years", "groups", "removed_years", "removed_groups")),
+    )
+    frames = changed_rows(plan, years, offline, workers, use_cache, memory_budget)
+
+    dataset_dir = PATHS.CDN_FILES / "trade"
+    manifest = read_manifest(dataset_dir)
+    layout = plan_layout([entry["rows"] for entry in manifest["partitions"].values()])
+    rollups: dict[str, list[pd.DataFrame]] = {}
+    write_hive_dataset(
+        updated_partitions(frames, plan, manifest, dataset_dir, layout, rollups),
+        "trade",
+        ["country"],
+        layout,
+        workers=write_workers,
+        partial=True,
+        removed=plan["removed_groups"],
+    )
+    write_rollup_datasets(
+        {name: pd.concat(parts, ignore_index=True) for name, parts in rollups.items()},
+        partial=True,
+        removed=plan["removed_groups"],
+    )
+
+    generate_input_values(read_input_values_source())
+    write_build_state(current)
@@ -0,0 +1,242 @@
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.data.config import PATHS, logger
+
+# Sort order within each partition, following the predicates the frontend
+# filters on (see src/js/dataQueries.js): partner first, so min/max statistics
+# of a row group cover as few partners as possible.
+LAYOUT_SORT_KEYS: list[str] = ["partner", "flow", "category", "year"]
+
+# Row group sizing: aim for this many row groups in a median partition, within
+# the bounds below (small groups add footer and request overhead).
+TARGET_ROW_GROUPS_PER_PARTITION: int = 8
+MIN_ROWS_PER_GROUP: int = 5_000
+MAX_ROWS_PER_GROUP: int = 100_000
+
+# Partitions above this many rows are split into evenly sized files.
+MAX_ROWS_PER_FILE: int = 1_000_000
+
+
+@dataclass(frozen=True)
+class LayoutPlan:
+    """How the partitioned dataset is laid out on disk.
+
+    Attributes:
+        sort_keys: Columns each partition is sorted by.
+        rows_per_group: Rows per parquet row group.
+        page_index: Whether to write column and offset page indexes.
+        bloom_filter_columns: Columns to write bloom filters for (requires a
+            pyarrow version whose dataset writer supports them).
+    """
+
+    sort_keys: list[str] = field(default_factory=lambda: list(LAYOUT_SORT_KEYS))
+    rows_per_group: int = MAX_ROWS_PER_GROUP
+    page_index: bool = True
+    bloom_filter_columns: list[str] = field(default_factory=list)
+
+    def file_options(self) -> dict:
+        """Return the layout-specific parquet write options."""
+        options: dict = {"write_page_index": self.page_index}
+        if self.bloom_filter_columns:
+            options["bloom_filter_options"] = {
+                col: {} for col in self.bloom_filter_columns
+            }
+        return options
+
+
+# Layout used before the planner: one 100k-row group per partition file,
+# sorted by category and year only, no page index.
+LEGACY_LAYOUT = LayoutPlan(
+    sort_keys=["category", "year"],
+    rows_per_group=MAX_ROWS_PER_GROUP,
+    page_index=False,
+)
+
+
+def plan_rows_per_group(partition_sizes: Sequence[int]) -> int:
+    """Choose a row group size from the number of rows in each partition."""
+    if not len(partition_sizes):
+        return MAX_ROWS_PER_GROUP
+    median = float(np.median(partition_sizes))
+    rows = int(median // TARGET_ROW_GROUPS_PER_PARTITION)
+    return int(np.clip(rows, MIN_ROWS_PER_GROUP, MAX_ROWS_PER_GROUP))
+
+
+def plan_file_rows(n_rows: int, rows_per_group: int) -> int:
+    """Rows per file for a partition of ``n_rows``.
+
+    Files are evenly sized, up to ``MAX_ROWS_PER_FILE``, and hold whole row
+    groups, so no file ends with a small remainder file or row group.
+    """
+    n_files = max(1, -(-n_rows // MAX_ROWS_PER_FILE))
+    rows = -(-n_rows // n_files)
+    return max(rows_per_group, -(-rows // rows_per_group) * rows_per_group)
+
+
+def plan_layout(
+    partition_sizes: Sequence[int],
+    sort_keys: Sequence[str] = LAYOUT_SORT_KEYS,
+    page_index: bool = True,
+    bloom_filter_columns: Sequence[str] = (),
+) -> LayoutPlan:
+    """Plan the dataset layout for partitions of the given sizes."""
+    plan = LayoutPlan(
+        sort_keys=list(sort_keys),
+        rows_per_group=plan_rows_per_group(partition_sizes),
+        page_index=page_index,
+        bloom_filter_columns=list(bloom_filter_columns),
+    )
+    logger.info(
+        "Layout: sort by %s, %s rows per row group",
+        ", ".join(plan.sort_keys),
+        f"{plan.rows_per_group:,}",
+    )
+    return plan
+
+
+# ============================================================================
+# Scan report
+# ============================================================================
+
+
+# Typical frontend queries within one country partition, as predicates on
+# row group statistics. "{partner}" is replaced by sampled partners.
+TYPICAL_QUERIES: dict[str, dict] = {
+    "country": {},
+    "country_partner": {"partner": "{partner}"},
+    "country_partner_years": {"partner": "{partner}", "year": (2015, 2024)},
+    "country_flow_category": {"flow": "exports", "category": "Mineral products"},
+    "country_years": {"year": (2015, 2024)},
+}
+
+
+def _overlaps(stats, predicate) -> bool:
+    """Whether a row group with ``stats`` may hold rows matching ``predicate``."""
+    if stats is None or not stats.has_min_max:
+        return True
+    low, high = predicate if isinstance(predicate, tuple) else (predicate, predicate)
+    return not (stats.max < low or stats.min > high)
+
+
+def scanned_bytes(files: Sequence[Path], predicates: Mapping) -> tuple[int, int]:
+    """Estimate the bytes and row groups a reader fetches for ``predicates``.
+
+    Counts each file's footer plus every column chunk of the row groups that
+    min/max statistics cannot rule out, as DuckDB does when reading parquet
+    over HTTP.
+
+    Returns:
+        Bytes scanned and the number of row groups read.
+    """
+    total_bytes = 0
+    total_groups = 0
+    for path in files:
+        metadata = pq.ParquetFile(path).metadata
+        total_bytes += metadata.serialized_size
+        names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            columns = {names[j]: row_group.column(j) for j in range(row_group.num_columns)}
+            if all(
+                _overlaps(columns[col].statistics, predicate)
+                for col, predicate in predicates.items()
+                if col in columns
+            ):
+                total_groups += 1
+                total_bytes += sum(
+                    column.total_compressed_size for column in columns.values()
+                )
+    return total_bytes, total_groups
+
+
+def _partition_files(dataset_dir: Path) -> dict[str, list[Path]]:
+    """Return the parquet files of each Hive partition directory."""
+    return {
+        path.name.split("=", 1)[-1]: sorted(path.glob("*.parquet"))
+        for path in sorted(dataset_dir.iterdir())
+        if path.is_dir()
+    }
+
+
+def _sample_partners(files: Sequence[Path], n: int) -> list[str]:
+    """Return up to ``n`` evenly spaced partners of one partition."""
+    partners = sorted(
+        set().union(
+            *(pq.read_table(path, columns=["partner"])["partner"].to_pylist() for path in files)
+        )
+        - {None}
+    )
+    if not partners:
+        return []
+    idx = np.linspace(0, len(partners) - 1, min(n, len(partners))).astype(int)
+    return [partners[i] for i in idx]
+
+
+def scan_report(
+    dataset_dir: Path,
+    countries: Sequence[str] | None = None,
+    queries: Mapping[str, Mapping] = TYPICAL_QUERIES,
+    partners_per_country: int = 3,
+) -> pd.DataFrame:
+    """Estimate mean bytes scanned per typical query for a partitioned dataset.
+
+    Args:
+        dataset_dir: Hive-partitioned dataset directory (country=...).
+        countries: Partitions to sample (defaults to all).
+        queries: Query name → predicates (see ``TYPICAL_QUERIES``).
+        partners_per_country: Partners sampled for partner queries.
+
+    Returns:
+        One row per query with mean bytes and row groups read per country.
+    """
+    partitions = _partition_files(dataset_dir)
+    if countries is not None:
+        partitions = {c: partitions[c] for c in countries if c in partitions}
+
+    rows = []
+    for country, files in partitions.items():
+        partners = _sample_partners(files, partners_per_country)
+        for name, predicates in queries.items():
+            needs_partner = "{partner}" in predicates.values()
+            for partner in partners if needs_partner else [None]:
+                resolved = {
+                    col: partner if value == "{partner}" else value
+                    for col, value in predicates.items()
+                }
+                n_bytes, n_groups = scanned_bytes(files, resolved)
+                rows.append((name, country, n_bytes, n_groups))
+
+    report = pd.DataFrame(rows, columns=["query", "country", "bytes", "row_groups"])
+    return report.groupby("query", as_index=False)[["bytes", "row_groups"]].mean()
+
+
+def compare_layouts(
+    before_dir: Path,
+    after_dir: Path = PATHS.CDN_FILES / "trade",
+    countries: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    """Compare mean bytes scanned per typical query between two layouts.
+
+    Returns:
+        One row per query with bytes and row groups before and after, and the
+        ratio of bytes after to before.
+    """
+    before = scan_report(before_dir, countries)
+    after = scan_report(after_dir, countries)
+    report = before.merge(after, on="query", suffixes=("_before", "_after"))
+    report["ratio"] = report["bytes_after"] / report["bytes_before"]
+    for row in report.itertuples():
+        logger.info(
+            "%s: %s → %s bytes (%.0f%%)",
+            row.query,
+            f"{row.bytes_before:,.0f}",
+            f"{row.bytes_after:,.0f}",
+            100 * row.ratio,
+        )
+    return report
@@ -0,0 +1,203 @@
+import json
+import sys
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from src.data.config import logger
+from src.data.scripts.cache import file_digest
+
+# Written at the root of each partitioned dataset (the leading underscore keeps
+# dataset readers from treating it as data), listing every partition file
+# so the frontend can resolve and prune files without listing the bucket.
+MANIFEST_NAME: str = "_manifest.json"
+MANIFEST_VERSION: int = 1
+
+# Columns whose min/max statistics are recorded per file and partition.
+STATISTICS_COLUMNS: list[str] = ["year", "partner", "flow", "category"]
+
+
+def _merge_range(ranges: Sequence[list | None]) -> list | None:
+    """Return the [min, max] range covering every non-missing range."""
+    ranges = [r for r in ranges if r is not None]
+    if not ranges:
+        return None
+    return [min(r[0] for r in ranges), max(r[1] for r in ranges)]
+
+
+def file_statistics(
+    metadata: pq.FileMetaData,
+    columns: Sequence[str] = STATISTICS_COLUMNS,
+) -> dict[str, list]:
+    """Return the [min, max] of ``columns`` over a file's row group statistics.
+
+    Columns without min/max statistics in some row group are left out, since
+    their range is unknown.
+    """
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    stats: dict[str, list] = {}
+    for col in columns:
+        if col not in names:
+            continue
+        j = names.index(col)
+        ranges = []
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            if not row_group.num_rows:
+                continue
+            column_stats = row_group.column(j).statistics
+            if column_stats is None or not column_stats.has_min_max:
+                ranges = None
+                break
+            ranges.append([column_stats.min, column_stats.max])
+        if ranges:
+            stats[col] = _merge_range(ranges)
+    return stats
+
+
+def file_entry(path: Path, digest: str | None = None) -> dict:
+    """Describe one parquet file: name, size, rows, content hash and statistics."""
+    metadata = pq.ParquetFile(path).metadata
+    return {
+        "name": path.name,
+        "bytes": path.stat().st_size,
+        "rows": metadata.num_rows,
+        "sha256": digest or file_digest(path),
+        "stats": file_statistics(metadata),
+    }
+
+
+def partition_entry(values: Mapping[str, object], path: str, files: Sequence[dict]) -> dict:
+    """Describe one partition from its files' entries."""
+    columns = sorted({col for entry in files for col in entry["stats"]})
+    return {
+        "values": dict(values),
+        "path": path,
+        "rows": sum(entry["rows"] for entry in files),
+        "bytes": sum(entry["bytes"] for entry in files),
+        "stats": {
+            col: _merge_range([entry["stats"].get(col) for entry in files])
+            for col in columns
+            if all(col in entry["stats"] for entry in files)
+        },
+        "files": sorted(files, key=lambda entry: entry["name"]),
+    }
+
+
+def partition_key(values: Mapping[str, object]) -> str:
+    """Return the manifest key of a partition: its values joined by "/"."""
+    return "/".join(str(value) for value in values.values())
+
+
+def build_manifest(
+    partitions: Sequence[dict],
+    partition_cols: Sequence[str],
+    sort_keys: Sequence[str],
+) -> dict:
+    """Build the manifest of a partitioned dataset.
+
+    Args:
+        partitions: Entries built by ``partition_entry``.
+        partition_cols: Columns the dataset is partitioned by.
+        sort_keys: Columns each partition is sorted by.
+    """
+    return {
+        "version": MANIFEST_VERSION,
+        "partition_cols": list(partition_cols),
+        "sort_keys": list(sort_keys),
+        "rows": sum(entry["rows"] for entry in partitions),
+        "bytes": sum(entry["bytes"] for entry in partitions),
+        "partitions": {
+            partition_key(entry["values"]): entry
+            for entry in sorted(partitions, key=lambda entry: entry["path"])
+        },
+    }
+
+
+def write_manifest(directory: Path, manifest: dict) -> Path:
+    """Write ``manifest`` to ``directory`` and return its path."""
+    path = directory / MANIFEST_NAME
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"), default=str)
+    return path
+
+
+def read_manifest(directory: Path) -> dict | None:
+    """Return the manifest of a dataset directory, or None if it has none."""
+    path = directory / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _file_paths(manifest: dict | None) -> set[str]:
+    """Return the path of every file in a manifest, relative to the dataset."""
+    if not manifest:
+        return set()
+    return {
+        f"{entry['path']}/{file['name']}"
+        for entry in manifest["partitions"].values()
+        for file in entry["files"]
+    }
+
+
+def diff_manifests(previous: dict | None, current: dict) -> dict[str, list[str]]:
+    """Compare a dataset's manifest with the one of the previous build.
+
+    File names carry a hash of their content, so a file present in both
+    manifests is unchanged and never needs uploading again.
+
+    Returns:
+        Partition keys that were "added", "changed", "removed" or left
+        "unchanged", plus the file paths to "upload" and to "delete".
+    """
+    before = previous["partitions"] if previous else {}
+    after = current["partitions"]
+
+    def names(entry: dict) -> list[str]:
+        return [file["name"] for file in entry["files"]]
+
+    old_files = _file_paths(previous)
+    new_files = _file_paths(current)
+    return {
+        "added": sorted(after.keys() - before.keys()),
+        "changed": sorted(
+            key
+            for key in after.keys() & before.keys()
+            if names(after[key]) != names(before[key])
+        ),
+        "removed": sorted(before.keys() - after.keys()),
+        "unchanged": sorted(
+            key
+            for key in after.keys() & before.keys()
+            if names(after[key]) == names(before[key])
+        ),
+        "upload": sorted(new_files - old_files),
+        "delete": sorted(old_files - new_files),
+    }
+
+
+def log_diff(diff: Mapping[str, list[str]]) -> None:
+    """Log a summary of ``diff_manifests`` output."""
+    logger.info(
+        "Partitions: %s added, %s changed, %s removed, %s unchanged; "
+        "%s files to upload, %s to delete",
+        *(f"{len(diff[key]):,}" for key in ("added", "changed", "removed", "unchanged")),
+        f"{len(diff['upload']):,}",
+        f"{len(diff['delete']):,}",
+    )
+
+
+if __name__ == "__main__":
+    # Usage: manifest.py PREVIOUS_MANIFEST DATASET_DIR
+    # Prints the diff against the previous build's manifest as JSON.
+    previous_path, dataset_dir = Path(sys.argv[1]), Path(sys.argv[2])
+    previous = None
+    if previous_path.exists() and previous_path.stat().st_size:
+        with open(previous_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    diff = diff_manifests(previous, read_manifest(dataset_dir))
+    log_diff(diff)
+    json.dump(diff, sys.stdout, indent=2)
@@ -0,0 +1,167 @@
+import json
+import pickle
+from functools import cache, cached_property
+from pathlib import Path
+
+import pandas as pd
+
+from src.data.config import PATHS, logger
+from src.data.scripts.cache import file_digest, fingerprint
+from src.data.scripts.codes import (
+    CodeTables,
+    country_dtype,
+    section_dtype,
+    sorted_dtype,
+)
+
+# Bump when the structures stored in the snapshot change.
+SNAPSHOT_FORMAT: int = 1
+
+# Files the mappings are parsed from; the snapshot is keyed by their hashes.
+MAPPING_SOURCES: tuple[Path, ...] = (
+    PATHS.HS_SECTIONS,
+    PATHS.COUNTRY_CODES,
+    PATHS.COUNTRY_GROUPS,
+)
+
+
+def mappings_key() -> str:
+    """Return the key of the mapping snapshot (hashes of the source files)."""
+    return fingerprint(SNAPSHOT_FORMAT, *(file_digest(path) for path in MAPPING_SOURCES))
+
+
+def parse_mapping_sources() -> dict:
+    """Parse the HS sections, BACI country codes and country groups files."""
+    import ftfy
+
+    logger.info("Loading mappings")
+    with open(PATHS.HS_SECTIONS, "r") as f:
+        hs_dict = json.load(f)
+    product_code_to_section = {
+        code: category for category, codes in hs_dict.items() for code in codes
+    }
+
+    country_codes = pd.read_csv(PATHS.COUNTRY_CODES)
+    country_names = [ftfy.fix_text(name) for name in country_codes["country_name"]]
+
+    with open(PATHS.COUNTRY_GROUPS, "r", encoding="utf-8") as f:
+        group_to_iso3_raw = json.load(f)
+
+    return {
+        "product_code_to_section": product_code_to_section,
+        "country_code_to_iso3": dict(
+            zip(country_codes["country_code"], country_codes["country_iso3"])
+        ),
+        "country_iso3_to_name": dict(zip(country_codes["country_iso3"], country_names)),
+        "group_to_iso3": {
+            group: sorted({code.upper() for code in members})
+            for group, members in group_to_iso3_raw.items()
+        },
+    }
+
+
+class MappingRegistry:
+    """Product, country and group mappings used throughout the pipeline.
+
+    Each mapping is built on first use and kept for the registry's lifetime.
+    The parsed source files are stored in a snapshot, reused for as long as
+    the hashes of the sources match, so later runs skip parsing (and ftfy).
+
+    Args:
+        snapshot: Snapshot file (None to always parse the sources).
+    """
+
+    def __init__(self, snapshot: Path | None = PATHS.MAPPINGS_SNAPSHOT):
+        self.snapshot = snapshot
+
+    @cached_property
+    def _sources(self) -> dict:
+        """The parsed source files, from the snapshot if it is current."""
+        if self.snapshot is None:
+            return parse_mapping_sources()
+
+        key = mappings_key()
+        if self.snapshot.exists():
+            with open(self.snapshot, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("key") == key:
+                return cached["sources"]
+
+        sources = parse_mapping_sources()
+        self.snapshot.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.snapshot, "wb") as f:
+            pickle.dump({"key": key, "sources": sources}, f)
+        return sources
+
+    @cached_property
+    def product_code_to_section(self) -> dict[str, str]:
+        """HS product code → HS section name."""
+        return self._sources["product_code_to_section"]
+
+    @cached_property
+    def country_code_to_iso3(self) -> dict[int, str]:
+        """BACI country code → ISO3 code."""
+        return self._sources["country_code_to_iso3"]
+
+    @cached_property
+    def country_iso3_to_name(self) -> dict[str, str]:
+        """ISO3 code → BACI country name."""
+        return self._sources["country_iso3_to_name"]
+
+    @cached_property
+    def group_to_iso3(self) -> dict[str, list[str]]:
+        """Country group → sorted member ISO3 codes."""
+        return self._sources["group_to_iso3"]
+
+    @cached_property
+    def group_names(self) -> list[str]:
+        """Sorted country group names."""
+        return sorted(self.group_to_iso3)
+
+    @cached_property
+    def iso3_to_groups(self) -> dict[str, list[str]]:
+        """ISO3 code → sorted names of the groups it belongs to."""
+        iso3_to_groups: dict[str, list[str]] = {}
+        for group, members in self.group_to_iso3.items():
+            for iso in members:
+                iso3_to_groups.setdefault(iso, []).append(group)
+        return {iso: sorted(groups) for iso, groups in iso3_to_groups.items()}
+
+    @cached_property
+    def membership_df(self) -> pd.DataFrame:
+        """One (iso3, group) row per group membership."""
+        return pd.DataFrame(
+            [
+                (iso, group)
+                for group, members in self.group_to_iso3.items()
+                for iso in members
+            ],
+            columns=["iso3", "group"],
+        )
+
+    @cached_property
+    def codes(self) -> CodeTables:
+        """Code tables used to dictionary-encode identifier columns."""
+        return CodeTables(
+            countries=country_dtype(self.country_code_to_iso3),
+            groups=sorted_dtype(self.group_to_iso3),
+            sections=section_dtype(self.product_code_to_section),
+        )
+
+    def as_tuple(self) -> tuple:
+        """Return the mappings in the order ``load_mappings`` returns them."""
+        return (
+            self.product_code_to_section,
+            self.country_code_to_iso3,
+            self.country_iso3_to_name,
+            self.group_to_iso3,
+            self.iso3_to_groups,
+            self.membership_df,
+            self.codes,
+        )
+
+
+@cache
+def mappings() -> MappingRegistry:
+    """Return the process-wide mapping registry."""
+    return MappingRegistry(PATHS.MAPPINGS_SNAPSHOT)
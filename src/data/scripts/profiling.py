@@ -0,0 +1,215 @@
+import cProfile
+import functools
+import io
+import json
+import platform
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from src.data.config import BACI_VERSION, ENGINE, PATHS, PROFILE_MODE, logger
+
+PROFILE_MODES: tuple[str | None, ...] = (None, "cprofile", "tracemalloc")
+
+# Functions listed per stage in "cprofile" mode.
+PROFILE_TOP_FUNCTIONS: int = 25
+
+MB = 1024 * 1024
+
+
+def frame_size(data) -> tuple[int | None, int | None]:
+    """Return the rows and in-memory bytes of a DataFrame or Arrow table."""
+    if isinstance(data, pd.DataFrame):
+        return len(data), int(data.memory_usage(index=False).sum())
+    if isinstance(data, (pa.Table, pa.RecordBatch)):
+        return data.num_rows, data.nbytes
+    return None, None
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class StageRecord:
+    """Measurements of one run of a pipeline stage.
+
+    Attributes:
+        name: Stage name.
+        parent: Name of the enclosing stage, if any.
+        wall_s: Elapsed time.
+        cpu_s: CPU time of all threads of this process.
+        peak_rss_mb: Process peak RSS at the end of the stage.
+        rows_in, rows_out: Rows of the input and output frames.
+        bytes_in, bytes_out: In-memory size of the input and output frames.
+        traced_peak_mb: Peak traced allocations ("tracemalloc" mode).
+        top_functions: Most expensive functions ("cprofile" mode).
+    """
+
+    name: str
+    parent: str | None = None
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: float = 0.0
+    rows_in: int | None = None
+    rows_out: int | None = None
+    bytes_in: int | None = None
+    bytes_out: int | None = None
+    traced_peak_mb: float | None = None
+    top_functions: list[str] = field(default_factory=list)
+
+
+class Profiler:
+    """Records a ``StageRecord`` for every stage run in a build."""
+
+    def __init__(self, mode: str | None = PROFILE_MODE):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        self.mode = mode
+        self.records: list[StageRecord] = []
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._stack: list[StageRecord] = []
+        # Highest traced peak seen by each open stage before a child reset it
+        self._traced_peaks: list[int] = []
+        self._cprofile_active = False
+
+    @contextmanager
+    def stage(self, name: str, data=None):
+        """Measure the enclosed block as stage ``name``.
+
+        Yields the stage's record; set ``record.rows_out``/``bytes_out`` (or
+        call ``record_output``) to report the output frame.
+        """
+        record = StageRecord(
+            name=name, parent=self._stack[-1].name if self._stack else None
+        )
+        record.rows_in, record.bytes_in = frame_size(data)
+
+        profile = None
+        if self.mode == "cprofile" and not self._cprofile_active:
+            # Only one profiler can be active: nested stages are covered by
+            # the top-level stage's profile
+            profile = cProfile.Profile()
+            self._cprofile_active = True
+        if self.mode == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if self._traced_peaks:
+                self._traced_peaks[-1] = max(
+                    self._traced_peaks[-1], tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+            self._traced_peaks.append(0)
+
+        self._stack.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._cprofile_active = False
+                record.top_functions = _top_functions(profile)
+            record.wall_s = time.perf_counter() - wall
+            record.cpu_s = time.process_time() - cpu
+            record.peak_rss_mb = peak_rss_mb()
+            if self.mode == "tracemalloc":
+                peak = max(self._traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record.traced_peak_mb = peak / MB
+                if self._traced_peaks:
+                    self._traced_peaks[-1] = max(self._traced_peaks[-1], peak)
+            self._stack.pop()
+            self.records.append(record)
+
+    def report(self) -> dict:
+        """Return the run's report as JSON-serialisable data."""
+        return {
+            "started": self.started.isoformat(),
+            "wall_s": time.perf_counter() - self._start,
+            "peak_rss_mb": peak_rss_mb(),
+            "mode": self.mode,
+            "engine": ENGINE,
+            "baci_version": BACI_VERSION,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "pyarrow": pa.__version__,
+            "stages": [asdict(record) for record in self.records],
+        }
+
+    def write_report(self, directory: Path = PATHS.PROFILES, name: str = "trade") -> Path:
+        """Write the run's report to ``directory`` as timestamped JSON."""
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}_{self.started:%Y%m%dT%H%M%S}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info("Wrote profile report to %s", path)
+        return path
+
+
+def _top_functions(profile: cProfile.Profile) -> list[str]:
+    """Return the most expensive functions of a profile by cumulative time."""
+    out = io.StringIO()
+    stats = pstats.Stats(profile, stream=out)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return [line for line in out.getvalue().splitlines() if line.strip()]
+
+
+# Profiler of the current run, replaced by ``start_run``
+_profiler = Profiler(None)
+
+
+def start_run(mode: str | None = PROFILE_MODE) -> Profiler:
+    """Start recording a new run and return its profiler."""
+    global _profiler
+    _profiler = Profiler(mode)
+    return _profiler
+
+
+def current_run() -> Profiler:
+    """Return the profiler of the current run."""
+    return _profiler
+
+
+def stage(name: str, data=None):
+    """Measure the enclosed block as a stage of the current run."""
+    return _profiler.stage(name, data)
+
+
+def record_output(record: StageRecord, data) -> None:
+    """Set a stage record's output rows and bytes from ``data``."""
+    record.rows_out, record.bytes_out = frame_size(data)
+
+
+def profiled(func: Callable | None = None, *, name: str | None = None) -> Callable:
+    """Decorator measuring each call of ``func`` as a stage of the current run.
+
+    The first positional argument is taken as the input frame and the return
+    value as the output frame, when they are DataFrames or Arrow tables.
+    """
+    if func is None:
+        return functools.partial(profiled, name=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(name or func.__name__, args[0] if args else None) as record:
+            result = func(*args, **kwargs)
+            record_output(record, result)
+        return result
+
+    return wrapper
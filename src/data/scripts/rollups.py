@@ -0,0 +1,141 @@
+from collections.abc import Collection, Mapping, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.data.config import PATHS, ROLLUP_TOP_PARTNERS, logger
+from src.data.scripts.helper_functions import write_partitioned_dataset
+from src.data.scripts.layout import plan_layout
+from src.data.scripts.mappings import mappings
+from src.data.scripts.profiling import profiled
+
+# Rollup datasets written next to cdn_files/trade, partitioned by country, with
+# the keys each partition is sorted by.
+ROLLUPS: dict[str, list[str]] = {
+    # country × flow × category × year totals across individual partners
+    "trade_totals": ["flow", "category", "year"],
+    # largest individual partners per country, flow, category and year
+    "trade_top_partners": ["flow", "category", "year", "rank"],
+}
+
+# Column partners are ranked by in the top partners rollup.
+RANK_COLUMN: str = "value_usd_current"
+
+KEY_COLUMNS: list[str] = ["country", "flow", "category", "year"]
+
+
+def group_names() -> list[str]:
+    """Return the names of the country groups, which rollups exclude as partners."""
+    return mappings().group_names
+
+
+def downcast_units(df: pd.DataFrame) -> pd.DataFrame:
+    """Store summed value columns as Int32 where they fit, Int64 otherwise."""
+    for col in [c for c in df.columns if c.startswith("value_")]:
+        max_abs_value = df[col].abs().max()
+        fits = pd.isna(max_abs_value) or max_abs_value <= 2_147_483_647
+        df[col] = df[col].astype("Int32" if fits else "Int64")
+    return df
+
+
+def _individual_partners(
+    data: pd.DataFrame | pa.Table,
+    groups: Sequence[str],
+) -> pd.DataFrame:
+    """Return the rows of the trade dataset whose partner is not a group.
+
+    The frontend leaves group partners out of its totals and rankings, so
+    the rollups do too.
+    """
+    if isinstance(data, pa.Table):
+        partner = data["partner"]
+        if pa.types.is_dictionary(partner.type):
+            partner = partner.cast(partner.type.value_type)
+        is_group = pc.is_in(partner, value_set=pa.array(list(groups), pa.string()))
+        return data.filter(pc.invert(is_group)).to_pandas()
+    return data.loc[~data["partner"].isin(groups)]
+
+
+def partner_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Sum value columns per country, flow, category and year.
+
+    Args:
+        df: Trade rows with value columns in units (see ``convert_values_to_units``).
+    """
+    value_cols = [c for c in df.columns if c.startswith("value_")]
+    totals = (
+        df.astype({col: "Int64" for col in value_cols})
+        .groupby(KEY_COLUMNS, observed=True, sort=True)[value_cols]
+        .sum()
+        .reset_index()
+    )
+    return downcast_units(totals[[*KEY_COLUMNS, *value_cols]])
+
+
+def top_partners(df: pd.DataFrame, n: int = ROLLUP_TOP_PARTNERS) -> pd.DataFrame:
+    """Keep the ``n`` largest partners per country, flow, category and year.
+
+    Partners are ranked by ``RANK_COLUMN`` (ties by partner name), starting at
+    1 for the largest.
+    """
+    ranked = df.sort_values(
+        [*KEY_COLUMNS, RANK_COLUMN, "partner"],
+        ascending=[True] * len(KEY_COLUMNS) + [False, True],
+        na_position="last",
+        kind="stable",
+    )
+    rank = ranked.groupby(KEY_COLUMNS, observed=True, sort=False).cumcount().to_numpy() + 1
+    keep = rank <= n
+    value_cols = [c for c in df.columns if c.startswith("value_")]
+    top = ranked.loc[keep, [*KEY_COLUMNS, "partner", *value_cols]]
+    top.insert(len(KEY_COLUMNS), "rank", rank[keep].astype("int16"))
+    return top.reset_index(drop=True)
+
+
+@profiled
+def build_rollups(
+    data: pd.DataFrame | pa.Table,
+    groups: Sequence[str] | None = None,
+    n: int = ROLLUP_TOP_PARTNERS,
+) -> dict[str, pd.DataFrame]:
+    """Compute the rollup datasets from the final trade dataset."""
+    df = _individual_partners(data, group_names() if groups is None else groups)
+    return {
+        "trade_totals": partner_totals(df),
+        "trade_top_partners": top_partners(df, n),
+    }
+
+
+def write_rollup_datasets(
+    rollups: Mapping[str, pd.DataFrame],
+    partial: bool = False,
+    removed: Collection[str] = (),
+) -> None:
+    """Write each rollup as a dataset under ``PATHS.CDN_FILES``, partitioned by country.
+
+    With ``partial`` set, only the countries present in each rollup are
+    replaced and the ``removed`` ones dropped (see ``write_hive_dataset``).
+    """
+    for name, rollup in rollups.items():
+        logger.info("Writing %s rollup (%s rows)", name, f"{len(rollup):,}")
+        sizes = rollup.groupby("country", observed=True).size().to_numpy()
+        layout = plan_layout(sizes, sort_keys=ROLLUPS[name])
+        write_partitioned_dataset(
+            rollup,
+            name,
+            partition_cols=["country"],
+            layout=layout,
+            partial=partial,
+            removed=removed,
+        )
+
+
+def write_rollups(
+    data: pd.DataFrame | pa.Table,
+    groups: Sequence[str] | None = None,
+    n: int = ROLLUP_TOP_PARTNERS,
+    partial: bool = False,
+) -> None:
+    """Compute and write the rollup datasets for the final trade dataset."""
+    write_rollup_datasets(build_rollups(data, groups, n), partial=partial)
@@ -0,0 +1,118 @@
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.config import BACI_VERSION, BASE_YEAR, CURRENCIES, PATHS, logger
+
+
+def _zipf_weights(n: int, exponent: float, rng: np.random.Generator) -> np.ndarray:
+    """Return shuffled Zipf-like weights, so a few codes carry most of the trade."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def synthetic_baci_year(
+    year: int,
+    n_rows: int,
+    seed: int = 0,
+    country_codes: Sequence[int] | None = None,
+    product_codes: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    """Generate a BACI-shaped year of trade flows from the real code lists.
+
+    Exporters, importers and products are drawn with skewed weights and values
+    (thousands of USD) from a log-normal, as in the real data. Rows are unique
+    per exporter/importer/product, so slightly fewer than ``n_rows`` may be
+    returned.
+
+    Args:
+        year: Year of the flows (column ``t``).
+        n_rows: Number of flows to draw.
+        seed: Random seed; the same seed and year give the same data.
+        country_codes: BACI country codes (defaults to ``PATHS.COUNTRY_CODES``).
+        product_codes: HS 6-digit codes (defaults to ``PATHS.PRODUCT_CODES``).
+
+    Returns:
+        Columns t, i, j, k, v, q as in the BACI CSVs.
+    """
+    if country_codes is None:
+        country_codes = pd.read_csv(PATHS.COUNTRY_CODES)["country_code"].to_numpy()
+    if product_codes is None:
+        product_codes = pd.read_csv(PATHS.PRODUCT_CODES, dtype={"code": str})[
+            "code"
+        ].to_numpy()
+    country_codes = np.asarray(country_codes)
+    product_codes = np.asarray(product_codes)
+
+    rng = np.random.default_rng([seed, year])
+    countries = _zipf_weights(len(country_codes), 1.1, rng)
+    products = _zipf_weights(len(product_codes), 0.8, rng)
+
+    exporters = rng.choice(len(country_codes), n_rows, p=countries)
+    importers = rng.choice(len(country_codes), n_rows, p=countries)
+    items = rng.choice(len(product_codes), n_rows, p=products)
+
+    flows = pd.DataFrame({"i": exporters, "j": importers, "k": items})
+    flows = flows[flows["i"] != flows["j"]].drop_duplicates()
+
+    n = len(flows)
+    return pd.DataFrame(
+        {
+            "t": np.full(n, year, dtype="int16"),
+            "i": country_codes[flows["i"].to_numpy()],
+            "j": country_codes[flows["j"].to_numpy()],
+            "k": product_codes[flows["k"].to_numpy()],
+            "v": rng.lognormal(3.0, 2.5, n).round(3),
+            "q": rng.lognormal(2.0, 2.0, n).round(3),
+        }
+    )
+
+
+def write_synthetic_baci(
+    years: Sequence[int],
+    rows_per_year: int,
+    directory: Path = PATHS.SYNTHETIC_BACI,
+    seed: int = 0,
+) -> list[Path]:
+    """Write synthetic BACI year files named like the real ones.
+
+    Files go to a subdirectory per scale and seed. Files that already exist
+    are kept, so repeated benchmark runs at the same scale reuse them.
+
+    Returns:
+        The path of each year's file.
+    """
+    directory = directory / f"{rows_per_year}_{seed}"
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for year in years:
+        path = directory / f"BACI_HS02_Y{year}_V{BACI_VERSION}.csv"
+        if not path.exists():
+            logger.info("Generating synthetic BACI %s (%s rows)", year, f"{rows_per_year:,}")
+            synthetic_baci_year(year, rows_per_year, seed).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def synthetic_factors(keys: pd.DataFrame, id_column: str) -> pd.DataFrame:
+    """Factor source with fixed, made-up conversion factors.
+
+    Drop-in for ``pydeflate_factors`` that needs no IMF data: factors only
+    depend on the id and year, so results are reproducible.
+    """
+    factors = keys.reset_index(drop=True)
+    ids = pd.util.hash_array(factors[id_column].astype(str).to_numpy()) % 1000
+    years = factors["year"].to_numpy(dtype="int64")
+    drift = 1 + (BASE_YEAR - years) * 0.02
+
+    factors["value_usd_current"] = 1.0
+    for n, currency in enumerate(CURRENCIES):
+        lower = currency.lower()
+        rate = 0.5 + n * 0.3 + ids / 10_000
+        factors[f"value_{lower}_constant"] = rate * drift
+        if currency != "USD":
+            factors[f"value_{lower}_current"] = rate
+    return factors
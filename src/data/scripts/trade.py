@@ -1,24 +1,95 @@
 import json
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache, partial
+from importlib.metadata import version
 from pathlib import Path
 
-import ftfy
-
+import numpy as np
 import pandas as pd
-
-from bblocks.places import resolve_places
-
-from src.data.config import BACI_VERSION, PATHS, TIME_RANGE, logger
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.data.config import (
+    BACI_CHUNK_SIZE,
+    BACI_VERSION,
+    BASE_YEAR,
+    BUILD_WORKERS,
+    CURRENCIES,
+    ENGINE,
+    ENGINES,
+    MEMORY_BUDGET,
+    OFFLINE_FACTORS,
+    PATHS,
+    PRODUCT_LEVEL,
+    ROLLUP_TOP_PARTNERS,
+    TIME_RANGE,
+    USE_STAGE_CACHE,
+    WRITE_WORKERS,
+    logger,
+)
+from src.data.scripts.arrow_stages import (
+    add_country_groups_table,
+    add_currencies_and_prices_table,
+    column_dictionary,
+    convert_table_values_to_units,
+    encode_table,
+    long_with_totals_table,
+    remap_dictionary_column,
+    reshape_to_country_flow_table,
+)
+from src.data.scripts.codes import (
+    TOTAL_CATEGORY,
+    CodeTables,
+    category_codes,
+    country_dtype,
+    distinct_values,
+    encode_columns,
+    encode_mapped,
+    section_dtype,
+    sorted_dtype,
+)
+from src.data.scripts.cache import (
+    Stage,
+    directory_signature,
+    file_digest,
+    file_signature,
+    fingerprint,
+    plan_cached_stages,
+    prune_stale,
+    run_cached_stages,
+)
 from src.data.scripts.helper_functions import (
     convert_values_to_units,
     write_partitioned_dataset,
 )
+from src.data.scripts.mappings import mappings
+from src.data.scripts.rollups import write_rollups
+from src.data.scripts.profiling import profiled, start_run
 from src.data.scripts.transformations import (
     add_country_groups,
+    build_factor_table,
     add_currencies_and_prices,
+    offline_factors,
+    pydeflate_factors,
     reshape_to_country_flow,
 )
 
+# Columns read from the raw BACI files when streaming, with compact dtypes.
+# The quantity column ``q`` is never needed and product codes are parsed as
+# categoricals so the HS chapter is derived once per distinct code.
+BACI_COLUMNS: dict[str, str] = {
+    "t": "int16",
+    "i": "int16",
+    "j": "int16",
+    "k": "category",
+    "v": "float32",
+}
+
 
+@profiled
 def load_mappings() -> tuple[
     dict[str, str],
     dict[str, str],
@@ -26,54 +97,16 @@ def load_mappings() -> tuple[
     dict[str, list[str]],
     dict[str, list[str]],
     pd.DataFrame,
+    CodeTables,
 ]:
-    """Load product and country mappings required by the trade data pipeline."""
-    logger.info("Loading mappings")
-    with open(PATHS.HS_SECTIONS, "r") as f:
-        hs_dict = json.load(f)
-    product_code_to_section = {
-        code: category for category, codes in hs_dict.items() for code in codes
-    }
-
-    country_codes = pd.read_csv(PATHS.COUNTRY_CODES)
-    country_codes["country_name"] = country_codes["country_name"].apply(ftfy.fix_text)
-    country_code_to_iso3 = dict(
-        zip(country_codes["country_code"], country_codes["country_iso3"])
-    )
-    country_iso3_to_name = dict(
-        zip(country_codes["country_iso3"], country_codes["country_name"])
-    )
-
-    with open(PATHS.COUNTRY_GROUPS, "r", encoding="utf-8") as f:
-        group_to_iso3_raw = json.load(f)
-
-    group_to_iso3 = {
-        group: sorted({code.upper() for code in members})
-        for group, members in group_to_iso3_raw.items()
-    }
+    """Load product and country mappings required by the trade data pipeline.
 
-    iso3_to_groups: dict[str, list[str]] = {}
-    for group, members in group_to_iso3.items():
-        for iso in members:
-            iso3_to_groups.setdefault(iso, []).append(group)
-
-    iso3_to_groups = {iso: sorted(groups) for iso, groups in iso3_to_groups.items()}
-
-    membership_rows = [
-        (iso, group)
-        for group, members in group_to_iso3.items()
-        for iso in members
-    ]
-    membership_df = pd.DataFrame(membership_rows, columns=["iso3", "group"])
-
-    return (
-        product_code_to_section,
-        country_code_to_iso3,
-        country_iso3_to_name,
-        group_to_iso3,
-        iso3_to_groups,
-        membership_df,
-    )
+    Also returns the code tables used to dictionary-encode countries, groups,
+    HS sections and flows throughout the pipeline. Mappings come from the
+    process-wide registry (see ``src.data.scripts.mappings``), so they are
+    parsed at most once per run.
+    """
+    return mappings().as_tuple()
 
 
 def filter_and_aggregate_data(
@@ -81,7 +114,12 @@ def filter_and_aggregate_data(
     product_code_to_section: dict[str, str],
     country_code_to_iso3: dict[str, str]
 ) -> pd.DataFrame:
-    """Apply reshaping, filtering, and aggregation to a raw BACI dataframe."""
+    """Apply reshaping, filtering, and aggregation to a raw BACI dataframe.
+
+    ``k`` may hold either the 6-digit product code as a string or, for frames
+    pre-reduced by ``read_baci_year``, the integer HS chapter. Countries and
+    sections are returned as categoricals over the fixed code tables.
+    """
     df = raw_df.rename(
         columns={
             "t": "year",
@@ -92,13 +130,28 @@ def filter_and_aggregate_data(
         }
     )
 
-    df["category"] = df["product"].str[:2].map(product_code_to_section)
-    df["exporter_iso3"] = df["exporter"].map(country_code_to_iso3)
-    df["importer_iso3"] = df["importer"].map(country_code_to_iso3)
+    sections = section_dtype(product_code_to_section)
+    countries = country_dtype(country_code_to_iso3)
+
+    if pd.api.types.is_integer_dtype(df["product"]):
+        chapter_to_section = {
+            int(code): section for code, section in product_code_to_section.items()
+        }
+        df["category"] = encode_mapped(df["product"], chapter_to_section, sections)
+    else:
+        df["category"] = encode_mapped(
+            df["product"].str[:2], product_code_to_section, sections
+        )
+    df["exporter_iso3"] = encode_mapped(df["exporter"], country_code_to_iso3, countries)
+    df["importer_iso3"] = encode_mapped(df["importer"], country_code_to_iso3, countries)
 
     df = (
         df.dropna(subset=["value"])
-        .groupby(["year", "exporter_iso3", "importer_iso3", "category"], as_index=False)
+        .groupby(
+            ["year", "exporter_iso3", "importer_iso3", "category"],
+            as_index=False,
+            observed=True,
+        )
         .agg({"value": "sum"})
     )
 
@@ -107,31 +160,281 @@ def filter_and_aggregate_data(
     return df
 
 
-def load_build_aggregated_trade(
+# Bump when the layout of the per-year cache files changes.
+YEAR_CACHE_FORMAT: int = 2
+
+
+def configured_years(years: Sequence[int] | None = None) -> list[int]:
+    """Return ``years``, or every year of ``TIME_RANGE`` when not given."""
+    if years is not None:
+        return sorted(years)
+    return list(range(TIME_RANGE[0], TIME_RANGE[1] + 1))
+
+
+def baci_year_path(year: int) -> Path:
+    """Return the path of the raw BACI file for ``year``."""
+    return PATHS.BACI / f"BACI_HS02_Y{year}_V{BACI_VERSION}.csv"
+
+
+def _product_chapters(products: pd.Series) -> np.ndarray:
+    """Return the integer HS chapter of categorical product codes (-1 if unknown)."""
+    prefixes = products.cat.categories.astype(str).str[:2]
+    lookup = np.array(
+        [int(p) if p.isdigit() else -1 for p in prefixes] + [-1], dtype="int8"
+    )
+    # Missing codes (-1) index the trailing sentinel
+    return lookup[products.cat.codes.to_numpy()]
+
+
+def _combine_partials(partials: list[pd.DataFrame]) -> pd.DataFrame:
+    """Collapse partial chapter-level aggregates into a single frame."""
+    return (
+        pd.concat(partials, ignore_index=True)
+        .groupby(["t", "i", "j", "k"], as_index=False, sort=False)["v"]
+        .sum()
+    )
+
+
+def read_baci_year(
+    year: int,
     product_code_to_section: dict[str, str],
-    country_code_to_iso3: dict[str, str]
+    country_code_to_iso3: dict[str, str],
+    chunk_size: int | None = BACI_CHUNK_SIZE,
 ) -> pd.DataFrame:
-    """Load aggregated trade data from disk or build it from raw BACI files."""
-    output_path: Path = PATHS.DATA / f"trade_{TIME_RANGE[0]}_{TIME_RANGE[1]}.parquet"
+    """Read a single BACI year file and aggregate it by HS section.
 
-    if output_path.exists():
-        logger.info("Loading aggregated BACI data from %s", output_path)
-        return pd.read_parquet(output_path)
+    When ``chunk_size`` is set the file is streamed: only ``t, i, j, k, v`` are
+    parsed, using compact dtypes, and each chunk is reduced to HS chapter level
+    before being folded into a running total. Peak memory is then bounded by
+    the chunk size and the size of the aggregate, not by the raw file.
+    """
+    raw_path = baci_year_path(year)
 
-    logger.info("Aggregating BACI data")
-    frames: list[pd.DataFrame] = []
-    for year in range(TIME_RANGE[0], TIME_RANGE[1] + 1):
-        raw_path = PATHS.BACI / f"BACI_HS02_Y{year}_V{BACI_VERSION}.csv"
+    if chunk_size is None:
         raw_df = pd.read_csv(raw_path, dtype={"k": str})
-        frames.append(
-            filter_and_aggregate_data(
-                raw_df,
-                product_code_to_section,
-                country_code_to_iso3
-            )
+        return filter_and_aggregate_data(
+            raw_df,
+            product_code_to_section,
+            country_code_to_iso3
+        )
+
+    partials: list[pd.DataFrame] = []
+    pending_rows = 0
+    with pd.read_csv(
+        raw_path,
+        usecols=list(BACI_COLUMNS),
+        dtype=BACI_COLUMNS,
+        chunksize=chunk_size,
+    ) as reader:
+        for chunk in reader:
+            chunk = chunk.dropna(subset=["v"])
+            chunk["k"] = _product_chapters(chunk["k"])
+            chunk["v"] = chunk["v"].astype("float64")
+            partial = chunk.groupby(
+                ["t", "i", "j", "k"], as_index=False, sort=False
+            )["v"].sum()
+            partials.append(partial)
+            pending_rows += len(partial)
+
+            # Fold partial aggregates once they outgrow a chunk
+            if len(partials) > 1 and pending_rows > chunk_size:
+                partials = [_combine_partials(partials)]
+                pending_rows = len(partials[0])
+
+    if partials:
+        chapters = _combine_partials(partials)
+    else:
+        chapters = pd.DataFrame(
+            {
+                "t": pd.Series(dtype="int16"),
+                "i": pd.Series(dtype="int16"),
+                "j": pd.Series(dtype="int16"),
+                "k": pd.Series(dtype="int8"),
+                "v": pd.Series(dtype="float64"),
+            }
+        )
+
+    return filter_and_aggregate_data(
+        chapters,
+        product_code_to_section,
+        country_code_to_iso3
+    )
+
+
+def _aggregate_year_to_arrow(
+    year: int,
+    product_code_to_section: dict[str, str],
+    country_code_to_iso3: dict[str, str],
+    chunk_size: int | None,
+) -> pa.Table:
+    """Aggregate one BACI year and return it as a dictionary-encoded Arrow table.
+
+    Used as the process pool task: Arrow tables cross the process boundary as
+    contiguous buffers, which is far cheaper than pickling object columns. The
+    categorical identifier columns become dictionary arrays over the fixed
+    code tables.
+    """
+    df = read_baci_year(
+        year,
+        product_code_to_section,
+        country_code_to_iso3,
+        chunk_size=chunk_size,
+    )
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def aggregate_year_tables(
+    years: list[int],
+    product_code_to_section: dict[str, str],
+    country_code_to_iso3: dict[str, str],
+    chunk_size: int | None = BACI_CHUNK_SIZE,
+    workers: int = BUILD_WORKERS,
+) -> list[pa.Table]:
+    """Aggregate several BACI years, optionally across a process pool.
+
+    Tables are always returned in the order of ``years``, regardless of which
+    worker finishes first, so the output is deterministic.
+    """
+    task = partial(
+        _aggregate_year_to_arrow,
+        product_code_to_section=product_code_to_section,
+        country_code_to_iso3=country_code_to_iso3,
+        chunk_size=chunk_size,
+    )
+
+    if workers > 1 and len(years) > 1:
+        n_workers = min(workers, len(years))
+        logger.info(
+            "Aggregating %s BACI years across %s workers", len(years), n_workers
+        )
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            tables = list(executor.map(task, years))
+    else:
+        tables = [task(year) for year in years]
+
+    return tables
+
+
+def year_cache_key(year: int) -> str:
+    """Fingerprint everything that determines the aggregate of one BACI year."""
+    return fingerprint(
+        YEAR_CACHE_FORMAT,
+        year,
+        BACI_VERSION,
+        file_digest(PATHS.HS_SECTIONS),
+        file_digest(PATHS.COUNTRY_CODES),
+        file_signature(baci_year_path(year)),
+    )
+
+
+def _year_cache_path(year: int) -> Path:
+    """Return the cache file for ``year``, reusing a stale one if raw data is gone.
+
+    Without the raw BACI file the year cannot be rebuilt, so the most recent
+    cached aggregate for that year (if any) is served instead.
+    """
+    if baci_year_path(year).exists():
+        return PATHS.TRADE_CACHE / f"trade_{year}_{year_cache_key(year)}.parquet"
+
+    cached = sorted(
+        PATHS.TRADE_CACHE.glob(f"trade_{year}_*.parquet"),
+        key=lambda path: path.stat().st_mtime,
+    )
+    if not cached:
+        raise FileNotFoundError(
+            f"No raw BACI file or cached aggregate for {year}: {baci_year_path(year)}"
+        )
+    logger.warning("Raw BACI file for %s missing, using cached %s", year, cached[-1])
+    return cached[-1]
+
+
+def year_cache_paths(years: Sequence[int] | None = None) -> dict[int, Path]:
+    """Return the aggregate cache file of each year (see ``_year_cache_path``)."""
+    return {year: _year_cache_path(year) for year in configured_years(years)}
+
+
+@profiled
+def update_trade_cache(
+    product_code_to_section: dict[str, str],
+    country_code_to_iso3: dict[str, str],
+    chunk_size: int | None = BACI_CHUNK_SIZE,
+    workers: int = BUILD_WORKERS,
+    years: Sequence[int] | None = None,
+) -> list[Path]:
+    """Rebuild the stale per-year aggregates and return every year's cache file.
+
+    Each year is cached separately under ``PATHS.TRADE_CACHE``, keyed by the
+    year, ``BACI_VERSION``, the HS section and country code mappings and the
+    raw file's size/mtime. Changing ``TIME_RANGE`` (or ``years``, which
+    defaults to it) or replacing one raw file therefore only recomputes the
+    affected years.
+    """
+    PATHS.TRADE_CACHE.mkdir(parents=True, exist_ok=True)
+    cache_paths = year_cache_paths(years)
+
+    missing = [year for year, path in cache_paths.items() if not path.exists()]
+    if missing:
+        logger.info("Aggregating BACI data for %s", ", ".join(map(str, missing)))
+        tables = aggregate_year_tables(
+            missing,
+            product_code_to_section,
+            country_code_to_iso3,
+            chunk_size=chunk_size,
+            workers=workers,
         )
+        for year, table in zip(missing, tables):
+            path = cache_paths[year]
+            logger.info("Saving aggregated BACI data to %s", path)
+            # Write then rename, so an interrupted write never leaves a
+            # truncated file that later runs would take as cached
+            tmp_path = path.with_suffix(".tmp")
+            pq.write_table(table, tmp_path, compression="snappy")
+            tmp_path.replace(path)
+            prune_stale(PATHS.TRADE_CACHE, f"trade_{year}_*.parquet", keep=path)
+
+    return list(cache_paths.values())
+
+
+def stale_years(years: Sequence[int] | None = None) -> list[int]:
+    """Return the years ``update_trade_cache`` would aggregate from raw BACI."""
+    return [
+        year
+        for year in configured_years(years)
+        if baci_year_path(year).exists() and not _year_cache_path(year).exists()
+    ]
+
+
+def load_build_aggregated_trade(
+    product_code_to_section: dict[str, str],
+    country_code_to_iso3: dict[str, str],
+    chunk_size: int | None = BACI_CHUNK_SIZE,
+    workers: int = BUILD_WORKERS,
+    years: Sequence[int] | None = None,
+) -> pd.DataFrame:
+    """Load aggregated trade data in wide format (one column per HS section).
+
+    Only the years whose cache is stale are rebuilt (see ``update_trade_cache``).
+    """
+    paths = update_trade_cache(
+        product_code_to_section,
+        country_code_to_iso3,
+        chunk_size=chunk_size,
+        workers=workers,
+        years=years,
+    )
+
+    logger.info("Loading aggregated BACI data from %s", PATHS.TRADE_CACHE)
+    dataset = ds.dataset([str(path) for path in paths], format="parquet")
+    countries = country_dtype(country_code_to_iso3)
+    aggregated = encode_columns(
+        dataset.to_table().to_pandas(),
+        {
+            "exporter_iso3": countries,
+            "importer_iso3": countries,
+            "category": section_dtype(product_code_to_section),
+        },
+    )
 
-    aggregated = pd.concat(frames, ignore_index=True)
     aggregated_wide = (
         aggregated.pivot(
             index=["year", "exporter_iso3", "importer_iso3"],
@@ -141,28 +444,55 @@ def load_build_aggregated_trade(
         .reset_index()
         .rename_axis(columns=None)
     )
-    logger.info("Saving aggregated BACI data to %s", output_path)
-    aggregated_wide.to_parquet(output_path, index=False, compression="snappy")
     return aggregated_wide
 
 
-def process_trade_data() -> pd.DataFrame:
-    """Create the full trade dataset ready for Observable consumption."""
-    logger.info("Processing trade data")
-    (
+def load_aggregated_trade_table(
+    product_code_to_section: dict[str, str],
+    country_code_to_iso3: dict[str, str],
+    chunk_size: int | None = BACI_CHUNK_SIZE,
+    workers: int = BUILD_WORKERS,
+    years: Sequence[int] | None = None,
+) -> pa.Table:
+    """Load aggregated trade data as a long Arrow table over the code tables."""
+    paths = update_trade_cache(
         product_code_to_section,
         country_code_to_iso3,
-        country_iso3_to_name,
-        group_to_iso3,
-        _iso3_to_groups,
-        membership_df,
-    ) = load_mappings()
+        chunk_size=chunk_size,
+        workers=workers,
+        years=years,
+    )
 
-    aggregated_wide = load_build_aggregated_trade(
-        product_code_to_section,
-        country_code_to_iso3
+    logger.info("Loading aggregated BACI data from %s", PATHS.TRADE_CACHE)
+    dataset = ds.dataset([str(path) for path in paths], format="parquet")
+    countries = pa.array(country_dtype(country_code_to_iso3).categories, pa.string())
+    return encode_table(
+        dataset.to_table(),
+        {
+            "exporter_iso3": countries,
+            "importer_iso3": countries,
+            "category": pa.array(
+                section_dtype(product_code_to_section).categories, pa.string()
+            ),
+        },
     )
 
+
+def aggregated_trade_key(years: Sequence[int] | None = None) -> str:
+    """Fingerprint the aggregated BACI data for ``years`` (default ``TIME_RANGE``)."""
+    return fingerprint([path.name for path in year_cache_paths(years).values()])
+
+
+def melt_with_totals(
+    aggregated_wide: pd.DataFrame,
+    sections: pd.CategoricalDtype,
+) -> pd.DataFrame:
+    """Reshape aggregated trade to long format and add "All products" totals.
+
+    Args:
+        aggregated_wide: Aggregated trade with one column per HS section.
+        sections: HS section code table used to encode ``category``.
+    """
     base_cols = ["year", "exporter_iso3", "importer_iso3"]
 
     aggregated = aggregated_wide.melt(
@@ -171,50 +501,465 @@ def process_trade_data() -> pd.DataFrame:
         value_name="value",
         ignore_index=True,
     ).dropna(subset=["value"])
+    aggregated = encode_columns(aggregated, {"category": sections})
 
-    totals = (
-        aggregated.groupby(base_cols, as_index=False)["value"]
-        .sum()
-        .assign(category="All products")
+    totals = aggregated.groupby(base_cols, as_index=False, observed=True)[
+        "value"
+    ].sum()
+    totals["category"] = pd.Categorical(
+        np.full(len(totals), TOTAL_CATEGORY), dtype=sections
     )
 
-    aggregated = pd.concat([aggregated, totals], ignore_index=True)
+    return pd.concat([aggregated, totals], ignore_index=True)
 
-    trade_df = add_currencies_and_prices(aggregated, id_column="exporter_iso3")
 
-    missing_map = {
-        "SCG": "Serbia and Montenegro",
-        "ANT": "Netherlands Antilles",
-        "S19": "Asia, not else specified"
-    }
+MISSING_PLACE_NAMES: dict[str, str] = {
+    "SCG": "Serbia and Montenegro",
+    "ANT": "Netherlands Antilles",
+    "S19": "Asia, not else specified"
+}
+
+
+def _resolve_place_names(iso3: list[str]) -> dict[str, str | None]:
+    """Resolve ISO3 codes to short names with bblocks-places.
 
-    trade_df["exporter"] = resolve_places(
-        trade_df["exporter_iso3"], from_type="iso3_code", to_type="name_short", not_found="ignore"
-    ).fillna(trade_df["exporter_iso3"].map(missing_map))
-    trade_df["importer"] = resolve_places(
-        trade_df["importer_iso3"], from_type="iso3_code", to_type="name_short", not_found="ignore"
-    ).fillna(trade_df["importer_iso3"].map(missing_map))
+    Codes bblocks does not know fall back to ``MISSING_PLACE_NAMES``, then
+    to None.
+    """
+    from bblocks.places import resolve_places
 
-    trade_df = add_country_groups(trade_df, membership_df, group_to_iso3)
+    iso3_series = pd.Series(iso3, index=iso3, dtype=object)
+    names = resolve_places(
+        iso3_series, from_type="iso3_code", to_type="name_short", not_found="ignore"
+    ).fillna(iso3_series.map(MISSING_PLACE_NAMES))
+    return {code: name if pd.notna(name) else None for code, name in names.items()}
 
-    trade_df = reshape_to_country_flow(trade_df)
 
-    trade_df = convert_values_to_units(trade_df)
+def place_names_key() -> str:
+    """Return the key of the cached place name table.
 
+    The table depends on the bblocks-places version, the BACI country codes
+    and the fallback names.
+    """
+    return fingerprint(
+        version("bblocks-places"),
+        file_digest(PATHS.COUNTRY_CODES),
+        MISSING_PLACE_NAMES,
+    )
+
+
+@cache
+def load_place_names() -> dict[str, str | None]:
+    """Return the short name of every BACI country ISO3 code.
+
+    Names are resolved once and cached in ``PATHS.PLACE_NAMES``, which is
+    rebuilt when ``place_names_key`` changes.
+    """
+    key = place_names_key()
+    if PATHS.PLACE_NAMES.exists():
+        with open(PATHS.PLACE_NAMES, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["names"]
+
+    logger.info("Resolving place names")
+    iso3 = sorted(set(pd.read_csv(PATHS.COUNTRY_CODES)["country_iso3"].dropna()))
+    names = _resolve_place_names(iso3)
+    with open(PATHS.PLACE_NAMES, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "names": names}, f, indent=2, ensure_ascii=False)
+    return names
+
+
+def resolve_country_names(iso3: pd.Index) -> tuple[pd.CategoricalDtype, np.ndarray]:
+    """Resolve ISO3 codes to short names.
+
+    Names come from the cached table of ``load_place_names``; only codes
+    missing from it are resolved with bblocks-places.
+
+    Returns:
+        A sorted code table of the names and, for each ISO3 code, the code of
+        its name (-1 if it could not be resolved).
+    """
+    table = load_place_names()
+    unknown = [code for code in iso3 if code not in table]
+    if unknown:
+        table = {**table, **_resolve_place_names(unknown)}
+    names = [table[code] for code in iso3]
+
+    names_dtype = sorted_dtype(names)
+    return names_dtype, names_dtype.categories.get_indexer(names)
+
+
+def add_country_names(trade_df: pd.DataFrame) -> pd.DataFrame:
+    """Add exporter/importer names resolved from their ISO3 codes.
+
+    Names are resolved once per distinct ISO3 code and stored as categoricals
+    sharing a single sorted code table.
+    """
+    iso3 = pd.Index(
+        sorted(
+            {
+                *distinct_values(trade_df["exporter_iso3"]),
+                *distinct_values(trade_df["importer_iso3"]),
+            }
+        )
+    )
+    names_dtype, name_codes = resolve_country_names(iso3)
+    # Trailing sentinel for ISO3 codes outside ``iso3``
+    name_codes = np.append(name_codes, -1)
+
+    for role in ["exporter", "importer"]:
+        trade_df[role] = pd.Categorical.from_codes(
+            name_codes[category_codes(trade_df[f"{role}_iso3"], iso3)],
+            dtype=names_dtype,
+        )
     return trade_df
 
 
-def generate_input_values(trade_df: pd.DataFrame) -> None:
+def add_country_names_table(table: pa.Table) -> pa.Table:
+    """Arrow counterpart of ``add_country_names``, remapping ISO3 dictionaries."""
+    iso3 = column_dictionary(table["exporter_iso3"])
+    if not iso3.equals(column_dictionary(table["importer_iso3"])):
+        table = encode_table(table, {"importer_iso3": iso3})
+
+    names_dtype, name_codes = resolve_country_names(pd.Index(iso3.to_pylist()))
+    names = pa.array(names_dtype.categories, pa.string())
+    for role in ["exporter", "importer"]:
+        table = table.append_column(
+            role, remap_dictionary_column(table[f"{role}_iso3"], name_codes, names)
+        )
+    return table
+
+
+# Stages of ``process_trade_data``, in order; ``until`` stops after one of them.
+STAGE_NAMES: list[str] = ["long", "currencies", "names", "groups", "flow", "units"]
+
+
+def trade_stages(
+    engine: str = ENGINE,
+    offline: bool = OFFLINE_FACTORS,
+    until: str | None = None,
+) -> list[Stage]:
+    """Return the cached stages of ``process_trade_data`` for ``engine``.
+
+    Args:
+        engine: "pandas" or "arrow".
+        offline: Read conversion factors from the prebuilt factor table.
+        until: Last stage to include (see ``STAGE_NAMES``; default all).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine == "duckdb":
+        raise ValueError(
+            "The duckdb engine writes the dataset directly; "
+            "use duckdb_engine.build_trade_dataset_duckdb"
+        )
+    if until is not None and until not in STAGE_NAMES:
+        raise ValueError(f"Unknown stage {until!r}, expected one of {STAGE_NAMES}")
+    arrow = engine == "arrow"
+    prefix = "arrow_" if arrow else ""
+
+    (
+        _product_code_to_section,
+        _country_code_to_iso3,
+        _country_iso3_to_name,
+        group_to_iso3,
+        _iso3_to_groups,
+        membership_df,
+        codes,
+    ) = load_mappings()
+
+    stages = [
+        Stage(
+            f"{prefix}long",
+            partial(
+                long_with_totals_table if arrow else melt_with_totals,
+                sections=codes.sections,
+            ),
+            config=(list(codes.sections.categories),),
+        ),
+        Stage(
+            f"{prefix}currencies",
+            partial(
+                add_currencies_and_prices_table if arrow else add_currencies_and_prices,
+                id_column="exporter_iso3",
+                factor_source=offline_factors if offline else pydeflate_factors,
+            ),
+            config=(
+                CURRENCIES,
+                BASE_YEAR,
+                version("pydeflate"),
+                file_signature(PATHS.FACTOR_TABLE)
+                if offline
+                else directory_signature(PATHS.PYDEFLATE),
+            ),
+        ),
+        Stage(
+            f"{prefix}names",
+            add_country_names_table if arrow else add_country_names,
+            config=(place_names_key(),),
+        ),
+        Stage(
+            f"{prefix}groups",
+            partial(
+                add_country_groups_table if arrow else add_country_groups,
+                membership=membership_df,
+                group_to_iso=group_to_iso3,
+            ),
+            config=(file_digest(PATHS.COUNTRY_GROUPS),),
+        ),
+        Stage(
+            f"{prefix}flow",
+            reshape_to_country_flow_table if arrow else reshape_to_country_flow,
+        ),
+        Stage(
+            f"{prefix}units",
+            convert_table_values_to_units if arrow else convert_values_to_units,
+        ),
+    ]
+    if until is not None:
+        stages = stages[: STAGE_NAMES.index(until) + 1]
+    return stages
+
+
+@profiled
+def process_trade_data(
+    use_cache: bool = USE_STAGE_CACHE,
+    offline: bool = OFFLINE_FACTORS,
+    engine: str = ENGINE,
+    years: Sequence[int] | None = None,
+    workers: int = BUILD_WORKERS,
+    until: str | None = None,
+) -> pd.DataFrame | pa.Table:
+    """Create the full trade dataset ready for Observable consumption.
+
+    Each stage is cached by a fingerprint of its inputs and settings (see
+    ``run_cached_stages``), so a re-run only recomputes the stages downstream
+    of whatever changed. With ``offline`` set, currency conversions read the
+    prebuilt factor table instead of pydeflate. With ``engine="arrow"`` every
+    stage works on ``pyarrow.Table``s and a table is returned.
+
+    ``years`` (default ``TIME_RANGE``) selects the BACI years, aggregated
+    with ``workers`` processes, and ``until`` stops after the given stage.
+    """
+    stages = trade_stages(engine, offline, until)
+    arrow = engine == "arrow"
+
+    logger.info("Processing trade data (%s engine)", engine)
+    product_code_to_section, country_code_to_iso3, *_ = load_mappings()
+
+    load_source = load_aggregated_trade_table if arrow else load_build_aggregated_trade
+    return run_cached_stages(
+        stages,
+        source_key=aggregated_trade_key(years),
+        load_source=lambda: load_source(
+            product_code_to_section,
+            country_code_to_iso3,
+            workers=workers,
+            years=years,
+        ),
+        use_cache=use_cache,
+        as_arrow=arrow,
+    )
+
+
+def plan_trade_data(
+    use_cache: bool = USE_STAGE_CACHE,
+    offline: bool = OFFLINE_FACTORS,
+    engine: str = ENGINE,
+    years: Sequence[int] | None = None,
+    until: str | None = None,
+) -> dict:
+    """Report what ``process_trade_data`` would do, without running anything.
+
+    Returns:
+        The BACI years that would be aggregated from raw files and the status
+        of each stage (see ``plan_cached_stages``).
+    """
+    stages = trade_stages(engine, offline, until)
+    plan = plan_cached_stages(stages, aggregated_trade_key(years), use_cache)
+    loads_source = all(status == "run" for _, status in plan)
+    return {
+        "aggregate": stale_years(years) if loads_source else [],
+        "stages": plan,
+    }
+
+
+# Bump when the layout of the build state file changes.
+BUILD_STATE_VERSION: int = 2
+
+
+def build_state(
+    years: Sequence[int] | None = None,
+    offline: bool = OFFLINE_FACTORS,
+    engine: str = ENGINE,
+) -> dict:
+    """Describe the inputs a build of the trade dataset depends on.
+
+    Args:
+        years: BACI years of the build (default ``TIME_RANGE``).
+        offline: Whether conversion factors come from the factor table.
+        engine: Engine that wrote the dataset. Engines differ in value
+            precision, and only the duckdb engine honours ``PRODUCT_LEVEL``
+            (the others always use HS sections), so both are part of the
+            settings.
+
+    Returns:
+        The state version, a key of every setting except the country groups
+        (engine, product level, stage configs and rollup size), the
+        aggregate cache file of each year and the members of each group.
+    """
+    stages = trade_stages("pandas", offline)
+    return {
+        "version": BUILD_STATE_VERSION,
+        "settings": fingerprint(
+            engine,
+            PRODUCT_LEVEL if engine == "duckdb" else "section",
+            [stage.config for stage in stages if stage.name != "groups"],
+            ROLLUP_TOP_PARTNERS,
+        ),
+        "years": {str(year): path.name for year, path in year_cache_paths(years).items()},
+        "groups": mappings().group_to_iso3,
+    }
+
+
+def read_build_state() -> dict | None:
+    """Return the state of the last full or incremental build, if any."""
+    if not PATHS.BUILD_STATE.exists():
+        return None
+    with open(PATHS.BUILD_STATE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_build_state(state: dict) -> None:
+    """Record the state of a completed build (see ``build_state``)."""
+    PATHS.BUILD_STATE.parent.mkdir(parents=True, exist_ok=True)
+    with open(PATHS.BUILD_STATE, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+
+@profiled
+def build_trade_dataset(
+    engine: str = ENGINE,
+    years: Sequence[int] | None = None,
+    countries: Sequence[str] | None = None,
+    workers: int = BUILD_WORKERS,
+    write_workers: int = WRITE_WORKERS,
+    memory_limit: str | None = None,
+    use_cache: bool = USE_STAGE_CACHE,
+    offline: bool = OFFLINE_FACTORS,
+    inputs: bool = True,
+) -> None:
+    """Build and write the trade dataset, its rollups and the input values.
+
+    Args:
+        engine: Execution backend (see ``ENGINES``).
+        years: BACI years to include (default ``TIME_RANGE``).
+        countries: Only replace these ``country`` partitions of the trade and
+            rollup datasets, keeping the others (pandas and arrow engines).
+        workers: Processes aggregating BACI years.
+        write_workers: Threads writing partitions.
+        memory_limit: Memory budget, e.g. "6GB". DuckDB's memory limit with
+            the duckdb engine (default ``DUCKDB_MEMORY_LIMIT``); otherwise
+            years are processed in chunks that fit it (default
+            ``MEMORY_BUDGET``, see ``chunked.py``).
+        use_cache: Read and write the stage cache.
+        offline: Read conversion factors from the prebuilt factor table.
+        inputs: Also regenerate the input values file.
+    """
+    if engine == "duckdb":
+        from src.data.scripts.duckdb_engine import build_trade_dataset_duckdb
+
+        if countries is not None:
+            raise ValueError("The duckdb engine always writes every partition")
+        options = {"memory_limit": memory_limit} if memory_limit else {}
+        df = build_trade_dataset_duckdb(
+            years=configured_years(years),
+            factor_source=offline_factors if offline else pydeflate_factors,
+            **options,
+        )
+        write_build_state(build_state(years, offline, engine))
+        if inputs:
+            logger.info("Writing input values...")
+            generate_input_values(df)
+        return
+
+    budget = memory_limit or MEMORY_BUDGET
+    if budget:
+        from src.data.scripts.chunked import build_trade_dataset_chunked, year_chunks
+
+        chunks = year_chunks(budget, years, workers)
+        if len(chunks) > 1:
+            build_trade_dataset_chunked(
+                chunks,
+                engine=engine,
+                countries=countries,
+                workers=workers,
+                write_workers=write_workers,
+                offline=offline,
+                inputs=inputs,
+            )
+            return
+
+    df = process_trade_data(
+        use_cache=use_cache, offline=offline, engine=engine, years=years, workers=workers
+    )
+    partial_write = countries is not None
+    if partial_write:
+        df = select_countries(df, countries)
+
+    logger.info("Writing partitioned dataset...")
+    write_partitioned_dataset(
+        df, "trade", partition_cols=["country"], workers=write_workers, partial=partial_write
+    )
+
+    logger.info("Writing rollups...")
+    write_rollups(df, partial=partial_write)
+    if not partial_write:
+        write_build_state(build_state(years, offline, engine))
+    logger.info("Trade data completed")
+
+    if inputs:
+        logger.info("Writing input values...")
+        generate_input_values(read_input_values_source() if partial_write else df)
+
+
+def select_countries(
+    data: pd.DataFrame | pa.Table, countries: Sequence[str]
+) -> pd.DataFrame | pa.Table:
+    """Keep the rows of the given ``country`` partitions."""
+    if isinstance(data, pa.Table):
+        country = data["country"]
+        if pa.types.is_dictionary(country.type):
+            country = country.cast(country.type.value_type)
+        return data.filter(pc.is_in(country, value_set=pa.array(list(countries), pa.string())))
+    return data[data["country"].isin(countries)]
+
+
+def read_input_values_source(base_dir: str = "trade") -> pa.Table:
+    """Read the columns ``generate_input_values`` needs from a written dataset."""
+    dataset = ds.dataset(PATHS.CDN_FILES / base_dir, format="parquet", partitioning="hive")
+    return dataset.to_table(columns=["year", "country", "category"])
+
+
+def build_offline_factors() -> pd.DataFrame:
+    """Build the conversion factor table for every BACI country and year."""
+    _, country_code_to_iso3, *_ = load_mappings()
+    return build_factor_table(sorted(set(country_code_to_iso3.values())))
+
+
+@profiled
+def generate_input_values(trade_df: pd.DataFrame | pa.Table) -> None:
     """Materialise JS-ready data describing countries, groups, and HS categories."""
 
     logger.info("Generating input values file")
 
-    with open(PATHS.COUNTRY_GROUPS, "r") as f:
-        groups_to_iso3 = json.load(f)
+    if isinstance(trade_df, pa.Table):
+        trade_df = trade_df.select(["year", "country", "category"]).to_pandas()
 
     time_range = [min(trade_df["year"]), max(trade_df["year"])]
     unique_countries = sorted(trade_df["country"].unique())
-    country_groups = sorted(groups_to_iso3.keys())
+    country_groups = mappings().group_names
     unique_categories = sorted(trade_df["category"].unique())
 
     sections = [
@@ -245,11 +990,7 @@ def _list_to_js(elements: list, var_name: str) -> str:
 
 
 if __name__ == "__main__":
-    df = process_trade_data()
-
-    logger.info("Writing partitioned dataset...")
-    write_partitioned_dataset(df, "trade", partition_cols=["country"])
-    logger.info("Trade data completed")
-
-    logger.info("Writing input values...")
-    generate_input_values(df)
+    # Full build with the settings in config.py (see cli.py for options)
+    profiler = start_run()
+    build_trade_dataset()
+    profiler.write_report()
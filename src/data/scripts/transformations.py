@@ -1,14 +1,16 @@
-from collections.abc import Sequence
+from collections.abc import Callable, Collection, Sequence
+from importlib.metadata import version
+from pathlib import Path
 from typing import Mapping
 
 import numpy as np
 import pandas as pd
-
-from pydeflate import imf_exchange, imf_gdp_deflate, set_pydeflate_path
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from src.data.config import BASE_YEAR, CURRENCIES, PATHS, TIME_RANGE, logger
-
-set_pydeflate_path(PATHS.PYDEFLATE)
+from src.data.scripts.codes import FLOWS, category_codes, distinct_values
+from src.data.scripts.profiling import profiled
 
 
 def _series_from_conversion(
@@ -46,34 +48,39 @@ def _series_from_conversion(
     return deduped.set_index("_pydeflate_row_id")[value_col].reindex(row_index)
 
 
-def add_currencies_and_prices(df: pd.DataFrame, id_column: str) -> pd.DataFrame:
-    """Attach wide value columns for each configured currency/price combination.
-    """
+def pydeflate_factors(keys: pd.DataFrame, id_column: str) -> pd.DataFrame:
+    """Return conversion factors for each configured currency/price combination.
 
-    if id_column not in df.columns:
-        raise KeyError(f"'{id_column}' column not found in DataFrame")
+    Conversions are linear, so converting a value of 1 for every unique
+    ``(id_column, year)`` pair yields the factor applied to all rows sharing
+    that pair. Pydeflate is therefore only called on this small key table.
 
-    logger.info("Adding currency and price columns")
+    Args:
+        keys: Unique ``id_column``/``year`` pairs.
+        id_column: Column holding the ISO3 code used by pydeflate.
 
-    # Separate the numeric series so we can reuse the non-numeric columns without
-    # repeatedly copying them.
-    value_series = df["value"].astype("float64", copy=True)
-    result = df.drop(columns="value").copy()
-    result["value_usd_current"] = value_series.astype("float32")
+    Returns:
+        ``keys`` with one ``value_{currency}_{prices}`` factor column per
+        combination.
+    """
+    from pydeflate import imf_exchange, imf_gdp_deflate, set_pydeflate_path
 
-    # Lightweight frame used for conversions; only the columns required by
-    # pydeflate are retained to minimise copying.
-    row_ids = np.arange(len(df), dtype=np.int64)
+    set_pydeflate_path(PATHS.PYDEFLATE)
+
+    row_ids = np.arange(len(keys), dtype=np.int64)
     conversion_input = pd.DataFrame(
         {
             "_pydeflate_row_id": row_ids,
-            id_column: df[id_column].astype("string"),
-            "year": df["year"].astype("int32"),
-            "value": value_series,
+            id_column: keys[id_column].astype("string").to_numpy(),
+            "year": keys["year"].astype("int32").to_numpy(),
+            "value": np.ones(len(keys), dtype="float64"),
         }
     )
     row_ids_index = pd.Index(row_ids, name="_pydeflate_row_id")
 
+    factors = keys.reset_index(drop=True)
+    factors["value_usd_current"] = 1.0
+
     for currency in CURRENCIES:
         lower = currency.lower()
 
@@ -90,10 +97,9 @@ def add_currencies_and_prices(df: pd.DataFrame, id_column: str) -> pd.DataFrame:
             id_column=id_column,
             target_value_column=constant_col,
         )
-        constant_series = _series_from_conversion(
+        factors[constant_col] = _series_from_conversion(
             constant_df, constant_col, row_ids_index
-        ).astype("float32")
-        result[constant_col] = constant_series.to_numpy(copy=False)
+        ).to_numpy()
 
         if currency == "USD":
             continue
@@ -107,16 +113,203 @@ def add_currencies_and_prices(df: pd.DataFrame, id_column: str) -> pd.DataFrame:
             id_column=id_column,
             target_value_column=current_col,
         )
-        current_series = _series_from_conversion(
+        factors[current_col] = _series_from_conversion(
             current_df, current_col, row_ids_index
-        ).astype("float32")
-        result[current_col] = current_series.to_numpy(copy=False)
+        ).to_numpy()
 
-    value_cols = sorted(c for c in result.columns if c.startswith("value_"))
+    return factors
+
+
+def _factor_table_metadata() -> dict[str, str]:
+    """Return the settings a factor table must have been built with."""
+    return {
+        "currencies": ",".join(CURRENCIES),
+        "base_year": str(BASE_YEAR),
+    }
+
+
+@profiled
+def build_factor_table(
+    iso3_codes: Sequence[str],
+    years: Sequence[int] = range(TIME_RANGE[0], TIME_RANGE[1] + 1),
+    path: Path = PATHS.FACTOR_TABLE,
+) -> pd.DataFrame:
+    """Materialise conversion factors for every ISO3 code and year to parquet.
+
+    The file records the pydeflate version, currencies and base year it was
+    built with, so ``offline_factors`` can refuse a table that no longer
+    matches the configuration.
+
+    Args:
+        iso3_codes: ISO3 codes to build factors for.
+        years: Years to build factors for.
+        path: Output parquet file.
+
+    Returns:
+        The factor table (columns ``iso3``, ``year`` and ``value_*``).
+    """
+    logger.info("Building conversion factor table")
+    keys = pd.MultiIndex.from_product(
+        [sorted(set(iso3_codes)), list(years)], names=["iso3", "year"]
+    ).to_frame(index=False)
+    factors = pydeflate_factors(keys, id_column="iso3")
+    factors["year"] = factors["year"].astype("int16")
+    value_cols = [c for c in factors.columns if c.startswith("value_")]
+    factors[value_cols] = factors[value_cols].astype("float64")
+
+    table = pa.Table.from_pandas(factors, preserve_index=False)
+    metadata = {
+        **(table.schema.metadata or {}),
+        **{
+            f"factors.{key}".encode(): value.encode()
+            for key, value in {
+                **_factor_table_metadata(),
+                "pydeflate_version": version("pydeflate"),
+            }.items()
+        },
+    }
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+    logger.info("Saved conversion factor table to %s", path)
+    return factors
+
+
+def offline_factors(
+    keys: pd.DataFrame,
+    id_column: str,
+    path: Path = PATHS.FACTOR_TABLE,
+) -> pd.DataFrame:
+    """Factor source reading the prebuilt table instead of calling pydeflate.
+
+    Raises:
+        FileNotFoundError: If the factor table has not been built.
+        ValueError: If it was built for different currencies or base year.
+    """
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Conversion factor table not found at {path}; run build_factor_table"
+        )
+
+    table = pq.read_table(path)
+    metadata = {
+        key.decode().removeprefix("factors."): value.decode()
+        for key, value in (table.schema.metadata or {}).items()
+        if key.startswith(b"factors.")
+    }
+    for key, expected in _factor_table_metadata().items():
+        if metadata.get(key) != expected:
+            raise ValueError(
+                f"Conversion factor table {path} was built with {key}="
+                f"{metadata.get(key)!r}, expected {expected!r}"
+            )
+
+    factors = table.to_pandas().rename(columns={"iso3": id_column})
+    merged = keys.astype({"year": "int64"}).merge(
+        factors.astype({"year": "int64"}), on=[id_column, "year"], how="left"
+    )
+
+    value_cols = [c for c in merged.columns if c.startswith("value_")]
+    missing = merged[value_cols].isna().all(axis=1)
+    if missing.any():
+        logger.warning(
+            "No conversion factors for %s id/year pairs in %s",
+            f"{missing.sum():,}",
+            path,
+        )
+    return merged
+
+
+@profiled
+def factor_lookup(
+    id_codes: np.ndarray,
+    id_values: Sequence[str],
+    years: np.ndarray,
+    id_column: str,
+    factor_source: Callable[[pd.DataFrame, str], pd.DataFrame],
+) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """Fetch factors for the unique ``(id, year)`` pairs and index them per row.
+
+    Args:
+        id_codes: Integer code of each row's id (-1 if missing).
+        id_values: Id value for each code.
+        years: Year of each row.
+        id_column: Name of the id column passed to ``factor_source``.
+        factor_source: Callable returning a factor table for the unique key
+            pairs (see ``pydeflate_factors``).
+
+    Returns:
+        The ``value_*`` column names, a float32 factor matrix with one row per
+        unique pair plus a trailing all-NaN row, and each row's position in it.
+    """
+    # Encode each row's (id, year) pair as a single integer key
+    years = years.astype("int64")
+    year_min = int(years.min()) if len(years) else 0
+    n_years = int(years.max()) - year_min + 1 if len(years) else 1
+    pair_codes = id_codes.astype("int64") * n_years + (years - year_min)
+    valid = id_codes >= 0
+
+    unique_pairs = np.unique(pair_codes[valid])
+    keys = pd.DataFrame(
+        {
+            id_column: np.asarray(id_values)[unique_pairs // n_years],
+            "year": unique_pairs % n_years + year_min,
+        }
+    )
+    factors = factor_source(keys, id_column)
+    value_cols = sorted(c for c in factors.columns if c.startswith("value_"))
+
+    # Rows without an id get an all-NaN factor row appended after the lookup
+    factor_matrix = np.vstack(
+        [
+            factors[value_cols].to_numpy(dtype="float32"),
+            np.full((1, len(value_cols)), np.nan, dtype="float32"),
+        ]
+    )
+    positions = np.where(
+        valid, np.searchsorted(unique_pairs, pair_codes), len(unique_pairs)
+    )
+    return value_cols, factor_matrix, positions
+
+
+def add_currencies_and_prices(
+    df: pd.DataFrame,
+    id_column: str,
+    factor_source: Callable[[pd.DataFrame, str], pd.DataFrame] = pydeflate_factors,
+) -> pd.DataFrame:
+    """Attach wide value columns for each configured currency/price combination.
+
+    Factors are looked up once per unique ``(id_column, year)`` pair and applied
+    to every row with a single broadcast multiply, indexed by integer key codes.
+
+    Args:
+        df: Long trade data with a ``value`` column in current USD.
+        id_column: Column holding the ISO3 code that determines the deflator.
+        factor_source: Callable returning a factor table for the unique key
+            pairs (see ``pydeflate_factors``).
+    """
+
+    if id_column not in df.columns:
+        raise KeyError(f"'{id_column}' column not found in DataFrame")
+
+    logger.info("Adding currency and price columns")
+
+    id_codes, id_uniques = pd.factorize(df[id_column])
+    value_cols, factor_matrix, positions = factor_lookup(
+        id_codes,
+        id_uniques,
+        df["year"].to_numpy(),
+        id_column,
+        factor_source,
+    )
+
+    values = factor_matrix[positions]
+    values *= df["value"].to_numpy(dtype="float32")[:, np.newaxis]
+
+    converted = pd.DataFrame(values, columns=value_cols, index=df.index)
+    result = pd.concat([df.drop(columns="value"), converted], axis=1)
     base_cols = [c for c in result.columns if c not in value_cols]
 
     if value_cols:
-        zero_mask = (result[value_cols] == 0).any(axis=1)
+        zero_mask = (values == 0).any(axis=1)
         if zero_mask.any():
             logger.info(
                 "Dropping %s rows with zero values across currency columns",
@@ -127,10 +320,223 @@ def add_currencies_and_prices(df: pd.DataFrame, id_column: str) -> pd.DataFrame:
     return result[base_cols + value_cols]
 
 
+def _grouped_sum(
+    keys: Sequence[np.ndarray],
+    radices: Sequence[int],
+    values: np.ndarray,
+) -> tuple[list[np.ndarray], np.ndarray]:
+    """Sum rows of ``values`` sharing the same integer key columns.
+
+    Keys are packed into a single int64 (mixed radix), factorised in sorted
+    order and summed per value column with ``np.bincount``. Missing values
+    count as zero, matching ``DataFrame.groupby(...).sum()``.
+
+    Args:
+        keys: Non-negative integer code arrays, one per key column.
+        radices: Number of distinct codes for each key column.
+        values: 2-D array of values to sum, one row per key.
+
+    Returns:
+        The unique key columns and the summed values, one row per unique key.
+    """
+    packed = np.zeros(len(values), dtype="int64")
+    for key, radix in zip(keys, radices):
+        packed = packed * radix + key
+
+    codes, uniques = pd.factorize(packed, sort=True)
+    sums = np.empty((len(uniques), values.shape[1]), dtype="float64")
+    for j in range(values.shape[1]):
+        sums[:, j] = np.bincount(
+            codes, weights=np.nan_to_num(values[:, j]), minlength=len(uniques)
+        )
+
+    unpacked: list[np.ndarray] = []
+    remainder = uniques
+    for radix in reversed(radices):
+        remainder, key = np.divmod(remainder, radix)
+        unpacked.append(key)
+    return unpacked[::-1], sums
+
+
+def membership_matrix(
+    membership: pd.DataFrame,
+    countries: pd.Index,
+    groups: pd.Index,
+) -> np.ndarray:
+    """Return a boolean country × group membership matrix.
+
+    Args:
+        membership: DataFrame linking ISO3 codes to group names (columns: iso3, group).
+        countries: ISO3 codes indexing the rows.
+        groups: Group names indexing the columns.
+    """
+    matrix = np.zeros((len(countries), len(groups)), dtype=bool)
+    country_idx = countries.get_indexer(membership["iso3"].astype(str).str.upper())
+    group_idx = groups.get_indexer(membership["group"])
+    known = (country_idx >= 0) & (group_idx >= 0)
+    matrix[country_idx[known], group_idx[known]] = True
+    return matrix
+
+
+def disjoint_group_mask(
+    groups: pd.Index,
+    group_to_iso: Mapping[str, Sequence[str]],
+) -> np.ndarray:
+    """Return a group × group mask of pairs with no members in common."""
+    member_sets = [
+        {code.upper() for code in group_to_iso.get(group, [])} for group in groups
+    ]
+    return np.array(
+        [[a.isdisjoint(b) for b in member_sets] for a in member_sets], dtype=bool
+    )
+
+
+def group_index(membership: pd.DataFrame) -> pd.Index:
+    """Return the sorted names of the country groups in ``membership``."""
+    return pd.Index(sorted(membership["group"].unique()))
+
+
+def group_view_codes(
+    year: np.ndarray,
+    category: np.ndarray,
+    exp: np.ndarray,
+    imp: np.ndarray,
+    exp_party: np.ndarray,
+    imp_party: np.ndarray,
+    values: np.ndarray,
+    radices: Sequence[int],
+    countries: pd.Index,
+    parties: pd.Index,
+    membership: pd.DataFrame,
+    group_to_iso: Mapping[str, Sequence[str]],
+    only_groups: Collection[str] | None = None,
+) -> list[tuple]:
+    """Compute the country group views of ``add_country_groups`` on codes.
+
+    Args:
+        year, category: Year and category codes of each row.
+        exp, imp: Exporter and importer codes in ``countries`` (-1: NA).
+        exp_party, imp_party: Exporter and importer name codes in ``parties``.
+        values: Float64 value matrix, one column per value column.
+        radices: Number of year and category codes.
+        countries: ISO3 code table.
+        parties: Name code table of countries and groups.
+        membership: DataFrame linking ISO3 codes to group names.
+        group_to_iso: Mapping of group names to their member ISO3 codes.
+        only_groups: Only return the views involving these groups.
+
+    Returns:
+        Each view as (year, category, exporter, exporter_iso3, importer,
+        importer_iso3, sums), where party and ISO3 codes may be scalars
+        shared by every row of the view and -1 means NA.
+    """
+    groups = group_index(membership)
+    group_party = parties.get_indexer(groups)
+
+    # Name code of each country; unnamed countries are dropped from views
+    # keyed by name
+    country_party = np.full(len(countries), -1, dtype="int64")
+    country_party[imp[imp >= 0]] = imp_party[imp >= 0]
+    country_party[exp[exp >= 0]] = exp_party[exp >= 0]
+    named = country_party >= 0
+
+    n_countries = len(countries)
+    radices = [*radices, n_countries, n_countries]
+
+    # Collapse to one row per year/category/exporter/importer
+    valid = (exp >= 0) & (imp >= 0) & (year >= 0) & (category >= 0)
+    if not valid.all():
+        year, category, exp, imp = year[valid], category[valid], exp[valid], imp[valid]
+        values = values[valid]
+    (year, category, exp, imp), values = _grouped_sum(
+        [year, category, exp, imp], radices, values
+    )
+
+    members = membership_matrix(membership, countries, groups)
+    disjoint = disjoint_group_mask(groups, group_to_iso)
+    if only_groups is None:
+        selected = np.ones(len(groups), dtype=bool)
+    else:
+        selected = groups.isin(list(only_groups))
+    # Group → country views seed the group → group views of selected groups
+    needed = selected | disjoint[:, selected].any(axis=1)
+
+    views: list[tuple] = []
+
+    # --- country → group (exclude country ∈ group)
+    for g in np.flatnonzero(selected):
+        mask = members[imp, g] & ~members[exp, g] & named[exp]
+        if not mask.any():
+            continue
+        (y, c, e), sums = _grouped_sum(
+            [year[mask], category[mask], exp[mask]], radices[:3], values[mask]
+        )
+        views.append((y, c, country_party[e], e, group_party[g], -1, sums))
+
+    # --- group → country (exclude country ∈ group), kept unfiltered by name
+    # so it can seed the group → group view
+    group_country: list[tuple[int, list[np.ndarray], np.ndarray]] = []
+    for g in np.flatnonzero(needed):
+        mask = members[exp, g] & ~members[imp, g]
+        if not mask.any():
+            continue
+        keys, sums = _grouped_sum(
+            [year[mask], category[mask], imp[mask]], radices[:3], values[mask]
+        )
+        group_country.append((g, keys, sums))
+        if not selected[g]:
+            continue
+
+        y, c, i = keys
+        keep = named[i]
+        views.append(
+            (
+                y[keep],
+                c[keep],
+                group_party[g],
+                -1,
+                country_party[i[keep]],
+                i[keep],
+                sums[keep],
+            )
+        )
+
+    # --- group → group (groups must be disjoint: no overlapping members).
+    # Importers of a disjoint group are never members of the exporting group,
+    # so summing the group → country view over importer members is exact.
+    for g, (y, c, i), sums in group_country:
+        for h in range(len(groups)):
+            if not disjoint[g, h] or not (selected[g] or selected[h]):
+                continue
+            mask = members[i, h]
+            if not mask.any():
+                continue
+            (yy, cc), gg_sums = _grouped_sum(
+                [y[mask], c[mask]], radices[:2], sums[mask]
+            )
+            views.append((yy, cc, group_party[g], -1, group_party[h], -1, gg_sums))
+
+    # --- keep original country → country
+    keep = named[exp] & named[imp] & (only_groups is None)
+    views.append(
+        (
+            year[keep],
+            category[keep],
+            country_party[exp[keep]],
+            exp[keep],
+            country_party[imp[keep]],
+            imp[keep],
+            values[keep],
+        )
+    )
+    return views
+
+
 def add_country_groups(
     df: pd.DataFrame,
     membership: pd.DataFrame,
     group_to_iso: Mapping[str, Sequence[str]],
+    only_groups: Collection[str] | None = None,
 ) -> pd.DataFrame:
     """
     Build trade views for:
@@ -139,217 +545,160 @@ def add_country_groups(
       - group→group (only between disjoint groups)
     Keeps original country→country rows.
 
+    Countries, groups, years and categories are encoded as integer codes, and
+    the views are returned as categoricals over the same code tables. Each
+    view is computed group by group from a boolean membership matrix with
+    grouped sums over the codes (see ``group_view_codes``), so no rows are
+    duplicated per membership and memory scales with the output rather than
+    with join fan-out.
+
     Args:
         df: DataFrame with trade values in wide format (value_* columns).
         membership: DataFrame linking ISO3 codes to group names (columns: iso3, group).
         group_to_iso: Mapping of group names to their member ISO3 codes.
+        only_groups: Only return the views involving these groups, without
+            the country→country rows (used by incremental rebuilds).
     """
 
     logger.info("Adding country groups...")
 
     value_cols = [c for c in df.columns if c.startswith("value_")]
-
-    base = df.copy()
-    for col in ["exporter_iso3", "importer_iso3"]:
-        if col not in base.columns:
-            base[col] = pd.NA
-        base[col] = base[col].astype("string").str.upper()
-
-    membership = membership.copy()
-    membership["iso3"] = membership["iso3"].astype("string").str.upper()
-    membership_flag = membership.assign(_member_flag=True)
-
-    importer_membership = membership.rename(
-        columns={"iso3": "importer_iso3", "group": "importer_group"}
-    )
-    exporter_membership = membership.rename(
-        columns={"iso3": "exporter_iso3", "group": "exporter_group"}
-    )
-
-    outputs: list[pd.DataFrame] = []
-
-    # --- country → group (exclude country ∈ group)
-    cg = base.merge(importer_membership, on="importer_iso3", how="inner")
-    if not cg.empty:
-        overlap_flag = membership_flag.rename(
-            columns={
-                "iso3": "exporter_iso3",
-                "group": "importer_group",
-                "_member_flag": "_has_overlap",
+    if df.empty:
+        return df.copy()
+
+    countries = pd.Index(
+        sorted(
+            {
+                *distinct_values(df["exporter_iso3"]),
+                *distinct_values(df["importer_iso3"]),
             }
         )
-        cg = cg.merge(
-            overlap_flag,
-            on=["exporter_iso3", "importer_group"],
-            how="left",
-        )
-        cg = cg[cg["_has_overlap"].isna()].drop(columns=["_has_overlap", "importer"])
-        if not cg.empty:
-            cg = (
-                cg.groupby(
-                    [
-                        "year",
-                        "category",
-                        "exporter",
-                        "exporter_iso3",
-                        "importer_group",
-                    ],
-                    as_index=False,
-                )[value_cols]
-                .sum()
-            )
-            cg = cg.rename(columns={"importer_group": "importer"})
-            cg["importer_iso3"] = pd.NA
-            outputs.append(cg)
-
-    # --- group → country (exclude country ∈ group)
-    gc = base.merge(exporter_membership, on="exporter_iso3", how="inner")
-    if not gc.empty:
-        overlap_flag = membership_flag.rename(
-            columns={
-                "iso3": "importer_iso3",
-                "group": "exporter_group",
-                "_member_flag": "_has_overlap",
+    )
+
+    # Countries and groups share one "party" code table for exporter/importer
+    parties = pd.Index(
+        sorted(
+            {
+                *distinct_values(df["exporter"]),
+                *distinct_values(df["importer"]),
+                *group_index(membership),
             }
         )
-        gc = gc.merge(
-            overlap_flag,
-            on=["importer_iso3", "exporter_group"],
-            how="left",
+    )
+
+    year_codes, year_values = pd.factorize(df["year"], sort=True)
+    section_codes, section_values = pd.factorize(df["category"], sort=True)
+    views = group_view_codes(
+        year_codes,
+        section_codes,
+        category_codes(df["exporter_iso3"], countries),
+        category_codes(df["importer_iso3"], countries),
+        category_codes(df["exporter"], parties),
+        category_codes(df["importer"], parties),
+        df[value_cols].to_numpy(dtype="float64"),
+        [len(year_values), len(section_values)],
+        countries,
+        parties,
+        membership,
+        group_to_iso,
+        only_groups,
+    )
+
+    iso3_dtype = pd.CategoricalDtype(countries)
+    party_dtype = pd.CategoricalDtype(parties)
+
+    def frame(year, category, exporter, exporter_iso3, importer, importer_iso3, sums):
+        """Build one view from year/category codes and party/ISO3 codes (-1: NA)."""
+        n = len(year)
+        view = pd.DataFrame(
+            {
+                "year": year_values.take(year),
+                "category": section_values.take(category),
+                "exporter_iso3": pd.Categorical.from_codes(
+                    np.broadcast_to(exporter_iso3, n), dtype=iso3_dtype
+                ),
+                "exporter": pd.Categorical.from_codes(
+                    np.broadcast_to(exporter, n), dtype=party_dtype
+                ),
+                "importer_iso3": pd.Categorical.from_codes(
+                    np.broadcast_to(importer_iso3, n), dtype=iso3_dtype
+                ),
+                "importer": pd.Categorical.from_codes(
+                    np.broadcast_to(importer, n), dtype=party_dtype
+                ),
+            },
+            index=pd.RangeIndex(n),
         )
-        gc = gc[gc["_has_overlap"].isna()].drop(columns=["_has_overlap", "exporter"])
-        if not gc.empty:
-            gc = (
-                gc.groupby(
-                    [
-                        "year",
-                        "category",
-                        "exporter_group",
-                        "importer",
-                        "importer_iso3",
-                    ],
-                    as_index=False,
-                )[value_cols]
-                .sum()
-            )
-            gc = gc.rename(columns={"exporter_group": "exporter"})
-            gc["exporter_iso3"] = pd.NA
-            outputs.append(gc)
-
-    # --- group → group (groups must be disjoint: no overlapping members)
-    gg = base.merge(exporter_membership, on="exporter_iso3", how="inner")
-    gg = gg.merge(importer_membership, on="importer_iso3", how="inner")
-    if not gg.empty:
-        member_sets = {
-            group: {code.upper() for code in members}
-            for group, members in group_to_iso.items()
-        }
-        overlap_pairs: set[tuple[str, str]] = set()
-        for exp_group, exp_members in member_sets.items():
-            for imp_group, imp_members in member_sets.items():
-                if not exp_members.isdisjoint(imp_members):
-                    overlap_pairs.add((exp_group, imp_group))
-
-        if overlap_pairs:
-            overlap_df = pd.DataFrame(
-                list(overlap_pairs),
-                columns=["exporter_group", "importer_group"],
-            ).assign(_has_overlap=True)
-            gg = gg.merge(
-                overlap_df,
-                on=["exporter_group", "importer_group"],
-                how="left",
-            )
-            gg = gg[gg["_has_overlap"].isna()].drop(columns="_has_overlap")
-
-        if not gg.empty:
-            gg = gg.drop(columns=["exporter", "importer"])
-            gg = (
-                gg.groupby(
-                    ["year", "category", "exporter_group", "importer_group"],
-                    as_index=False,
-                )[value_cols]
-                .sum()
-            )
-            gg = gg.rename(
-                columns={
-                    "exporter_group": "exporter",
-                    "importer_group": "importer",
-                }
-            )
-            gg["exporter_iso3"] = pd.NA
-            gg["importer_iso3"] = pd.NA
-            outputs.append(gg)
+        view[value_cols] = sums.astype("float32")
+        return view
 
-    # --- keep original country → country
-    cc = base.groupby(
-        [
-            "year",
-            "category",
-            "exporter_iso3",
-            "exporter",
-            "importer_iso3",
-            "importer",
-        ],
-        as_index=False,
-    )[value_cols].sum()
-    outputs.append(cc)
+    outputs = [frame(*view) for view in views]
 
-    outputs = [frame for frame in outputs if not frame.empty]
-    if not outputs:
-        return base.copy()
+    columns = [
+        "year",
+        "category",
+        "exporter_iso3",
+        "exporter",
+        "importer_iso3",
+        "importer",
+        *value_cols,
+    ]
+    non_empty = [view for view in outputs if not view.empty]
+    if not non_empty:
+        return df.copy() if only_groups is None else outputs[-1][columns]
 
-    result = pd.concat(outputs, ignore_index=True)
+    result = pd.concat(non_empty, ignore_index=True)
+    return result[columns]
 
-    for col in ["exporter", "importer", "exporter_iso3", "importer_iso3"]:
-        if col in result.columns:
-            result[col] = result[col].astype("string")
 
-    return result
+def _sort_codes(codes: np.ndarray, n_categories: int) -> np.ndarray:
+    """Return codes usable as a sort key, with missing values (-1) sorted last."""
+    return np.where(codes < 0, n_categories, codes)
 
 
 def reshape_to_country_flow(df: pd.DataFrame) -> pd.DataFrame:
-    """Duplicate rows to create explicit exports/imports per country-partner pair."""
+    """Lay out each row twice: as exports of the exporter and imports of the importer.
+
+    The doubled table is never built before sorting. The sort order of both
+    orientations is computed on integer codes, and each output column is
+    gathered from the input once through that order, so the stage holds the
+    input and the output but no intermediate copies.
+    """
 
     logger.info("Reshaping trade data to country/partner/flow structure...")
 
     value_cols = [c for c in df.columns if c.startswith("value_")]
-    base_cols = [c for c in df.columns if c not in value_cols]
-
-    exports = df[base_cols].copy()
-    exports[value_cols] = df[value_cols].to_numpy(copy=True)
-    exports["country"] = df["exporter"]
-    exports["partner"] = df["importer"]
-    exports["flow"] = "exports"
-
-    imports = df[base_cols].copy()
-    imports[value_cols] = df[value_cols].to_numpy(copy=True)
-    imports["country"] = df["importer"]
-    imports["partner"] = df["exporter"]
-    imports["flow"] = "imports"
+    n = len(df)
 
-    combined = pd.concat([exports, imports], ignore_index=True)
-
-    # Drop legacy/share helper columns and original exporter/importer
-    drop_cols = {
-        "exporter",
-        "importer",
-        "exporter_iso3",
-    }
-    combined = combined.drop(columns=[c for c in drop_cols if c in combined.columns])
-
-    combined = combined.assign(flow=combined["flow"].astype("category"))
-
-    ordered_cols = [
-        "year",
-        "country",
-        "partner",
-        "flow",
-        "category",
-        *value_cols,
-    ]
-    combined = combined[ordered_cols].sort_values(
-        ["country", "partner", "flow", "year", "category"], kind="stable"
+    parties = pd.Index(
+        sorted({*distinct_values(df["exporter"]), *distinct_values(df["importer"])})
     )
-
-    return combined
+    exporter = category_codes(df["exporter"], parties)
+    importer = category_codes(df["importer"], parties)
+    sections = pd.Index(distinct_values(df["category"])).sort_values()
+
+    # Rows [0, n) are exports and rows [n, 2n) imports of the input rows
+    country = np.concatenate([exporter, importer])
+    partner = np.concatenate([importer, exporter])
+    flow = np.repeat(np.arange(len(FLOWS.categories), dtype="int8"), n)
+    order = np.lexsort(
+        (
+            np.tile(_sort_codes(category_codes(df["category"], sections), n), 2),
+            np.tile(df["year"].to_numpy(), 2),
+            flow,
+            _sort_codes(partner, len(parties)),
+            _sort_codes(country, len(parties)),
+        )
+    )
+    source = order % n if n else order
+
+    party_dtype = pd.CategoricalDtype(parties)
+    columns = {
+        "year": df["year"].array.take(source),
+        "country": pd.Categorical.from_codes(country[order], dtype=party_dtype),
+        "partner": pd.Categorical.from_codes(partner[order], dtype=party_dtype),
+        "flow": pd.Categorical.from_codes(flow[order], dtype=FLOWS),
+        "category": df["category"].array.take(source),
+        **{col: df[col].array.take(source) for col in value_cols},
+    }
+    return pd.DataFrame(columns, copy=False)
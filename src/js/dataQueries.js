@@ -87,47 +87,36 @@ function excludeGroupPartners(column = "partner") {
 
 const metadataCache = new Map();
 const metadataPending = new Map();
+let manifestPromise = null;
 
-function encodePartitionValue(value) {
-  return encodeURIComponent(value)
-    .replace(/\*/g, "%2A")
-    .replace(/'/g, "%27");
+function downloadURLForObject(objectName) {
+  return `https://storage.googleapis.com/download/storage/v1/b/${BUCKET}/o/${encodeURIComponent(objectName)}?alt=media`;
 }
 
-function countryListURL(country, pageToken = null) {
-  const encoded = encodePartitionValue(country);
-  const url = new URL(`https://storage.googleapis.com/storage/v1/b/${BUCKET}/o`);
-  url.searchParams.set("prefix", `${PREFIX}country=${encoded}/`);
-  url.searchParams.set("fields", "items(name,size,updated),nextPageToken");
-  url.searchParams.set("maxResults", "200");
-  if (pageToken) {
-    url.searchParams.set("pageToken", pageToken);
+// _manifest.json lists the files of every partition: one request resolves
+// any country, and files it does not list are never read.
+function loadManifest() {
+  if (!manifestPromise) {
+    manifestPromise = fetch(downloadURLForObject(`${PREFIX}_manifest.json`), {cache: "no-cache"})
+      .then(async (response) => {
+        if (!response.ok) {
+          throw new Error(`Manifest ${response.status} ${response.statusText}`);
+        }
+        return response.json();
+      })
+      .catch((error) => {
+        manifestPromise = null;
+        throw error;
+      });
   }
-  return url.toString();
-}
-
-function downloadURLForObject(objectName) {
-  return `https://storage.googleapis.com/download/storage/v1/b/${BUCKET}/o/${encodeURIComponent(objectName)}?alt=media`;
+  return manifestPromise;
 }
 
 async function loadCountryMetadata(country) {
-  const objectNames = [];
-  let pageToken = null;
-
-  do {
-    const response = await fetch(countryListURL(country, pageToken));
-    if (!response.ok) {
-      throw new Error(`Metadata ${response.status} ${response.statusText} for ${country}`);
-    }
-    const data = await response.json();
-    const items = Array.isArray(data.items) ? data.items : [];
-    for (const item of items) {
-      if (item?.name?.endsWith(".parquet")) {
-        objectNames.push(item.name);
-      }
-    }
-    pageToken = data.nextPageToken ?? null;
-  } while (pageToken);
+  const manifest = await loadManifest();
+  const partition = manifest?.partitions?.[country];
+  const files = Array.isArray(partition?.files) ? partition.files : [];
+  const objectNames = files.map((file) => `${PREFIX}${partition.path}/${file.name}`);
 
   if (!objectNames.length) {
     throw new Error(`No parquet objects found for ${country}`);
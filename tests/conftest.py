@@ -0,0 +1,76 @@
+import shutil
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from src.data.config import PATHS
+from src.data.scripts import mappings as mappings_module
+from src.data.scripts import trade
+from src.data.scripts.synthetic import synthetic_factors, write_synthetic_baci
+
+# Synthetic BACI years the pipeline tests build.
+YEARS: list[int] = [2021, 2022, 2023]
+
+# Datasets written by a trade build.
+DATASETS: list[str] = ["trade", "trade_totals", "trade_top_partners"]
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """Point the pipeline at synthetic BACI years and scratch directories.
+
+    Conversion factors come from ``synthetic_factors`` and place names are
+    made up from the ISO3 codes, so no network access is needed.
+
+    Returns:
+        The scratch copy of the country groups file.
+    """
+    for name in [
+        "TRADE_CACHE",
+        "STAGE_CACHE",
+        "CDN_FILES",
+        "PROFILES",
+        "CHUNK_SPILL",
+        "DUCKDB_TEMP",
+    ]:
+        monkeypatch.setattr(PATHS, name, tmp_path / name.lower())
+    monkeypatch.setattr(PATHS, "COMPONENTS", tmp_path / "components")
+    PATHS.COMPONENTS.mkdir()
+    monkeypatch.setattr(PATHS, "MAPPINGS_SNAPSHOT", tmp_path / "mappings.pickle")
+    monkeypatch.setattr(PATHS, "PLACE_NAMES", tmp_path / "place_names.json")
+    monkeypatch.setattr(PATHS, "BUILD_STATE", tmp_path / "build_state.json")
+
+    groups = tmp_path / "country_groups.json"
+    shutil.copy(PATHS.COUNTRY_GROUPS, groups)
+    monkeypatch.setattr(PATHS, "COUNTRY_GROUPS", groups)
+    monkeypatch.setattr(
+        mappings_module,
+        "MAPPING_SOURCES",
+        (PATHS.HS_SECTIONS, PATHS.COUNTRY_CODES, groups),
+    )
+
+    paths = write_synthetic_baci(YEARS, 5_000, directory=tmp_path / "baci")
+    monkeypatch.setattr(PATHS, "BACI", paths[0].parent)
+
+    monkeypatch.setattr(trade, "pydeflate_factors", synthetic_factors)
+    monkeypatch.setattr(
+        trade, "_resolve_place_names", lambda iso3: {code: f"Name {code}" for code in iso3}
+    )
+    mappings_module.mappings.cache_clear()
+    trade.load_place_names.cache_clear()
+    yield groups
+    mappings_module.mappings.cache_clear()
+    trade.load_place_names.cache_clear()
+
+
+def read_dataset(name: str) -> pd.DataFrame:
+    """Read a written dataset as plain columns, sorted by every column."""
+    df = ds.dataset(PATHS.CDN_FILES / name, partitioning="hive").to_table().to_pandas()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+    df = df.astype(
+        {col: "int64" for col in df.columns if col.startswith("value_") or col in ("year", "rank")}
+    )
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
@@ -0,0 +1,26 @@
+import pytest
+
+from src.data.config import PATHS
+from src.data.scripts.chunked import (
+    CHUNK_BASE_BYTES,
+    CHUNK_BYTES_PER_ROW,
+    build_trade_dataset_chunked,
+    year_chunks,
+    year_rows,
+)
+from src.data.scripts.trade import build_trade_dataset
+from tests.conftest import DATASETS, YEARS, read_dataset
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_chunked_build_matches_single_pass(pipeline, tmp_path, monkeypatch, engine):
+    build_trade_dataset(engine=engine, years=YEARS, offline=False, inputs=False)
+    single_pass = {name: read_dataset(name) for name in DATASETS}
+
+    monkeypatch.setattr(PATHS, "CDN_FILES", tmp_path / "chunked")
+    budget = CHUNK_BASE_BYTES + CHUNK_BYTES_PER_ROW * max(year_rows(YEARS).values())
+    chunks = year_chunks(budget, YEARS)
+    assert len(chunks) >= 2
+    build_trade_dataset_chunked(chunks, engine=engine, offline=False, inputs=False)
+    for name in DATASETS:
+        assert read_dataset(name).equals(single_pass[name]), name
@@ -0,0 +1,27 @@
+import pytest
+
+from src.data.config import PATHS
+from src.data.scripts.trade import build_trade_dataset
+from tests.conftest import DATASETS, YEARS, read_dataset
+
+
+def build_datasets(engine: str) -> dict:
+    build_trade_dataset(engine=engine, years=YEARS, offline=False, inputs=False)
+    return {name: read_dataset(name) for name in DATASETS}
+
+
+def test_arrow_matches_pandas(pipeline, tmp_path, monkeypatch):
+    expected = build_datasets("pandas")
+    monkeypatch.setattr(PATHS, "CDN_FILES", tmp_path / "arrow")
+    result = build_datasets("arrow")
+    for name in DATASETS:
+        assert result[name].equals(expected[name]), name
+
+
+def test_duckdb_matches_pandas(pipeline, tmp_path, monkeypatch):
+    pytest.importorskip("duckdb")
+    expected = build_datasets("pandas")
+    monkeypatch.setattr(PATHS, "CDN_FILES", tmp_path / "duckdb")
+    result = build_datasets("duckdb")
+    for name in DATASETS:
+        assert result[name].equals(expected[name]), name
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from src.data.config import PATHS
+from src.data.scripts.chunked import CHUNK_BASE_BYTES, CHUNK_BYTES_PER_ROW, year_rows
+from src.data.scripts.incremental import plan_update, update_trade_dataset
+from src.data.scripts.mappings import mappings
+from src.data.scripts.synthetic import synthetic_baci_year
+from src.data.scripts.trade import (
+    baci_year_path,
+    build_state,
+    build_trade_dataset,
+    read_build_state,
+)
+from tests.conftest import DATASETS, YEARS, read_dataset
+
+
+def one_year_per_chunk() -> int:
+    """Return a memory budget that fits one synthetic year at a time."""
+    return CHUNK_BASE_BYTES + CHUNK_BYTES_PER_ROW * max(year_rows(YEARS).values())
+
+
+def assert_matches_full_build(tmp_path, monkeypatch) -> None:
+    updated = {name: read_dataset(name) for name in DATASETS}
+    monkeypatch.setattr(PATHS, "CDN_FILES", tmp_path / "full")
+    build_trade_dataset(engine="pandas", years=YEARS, offline=False, inputs=False)
+    for name in DATASETS:
+        assert updated[name].equals(read_dataset(name)), name
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_group_edit_matches_full_build(pipeline, tmp_path, monkeypatch, chunked):
+    build_trade_dataset(engine="pandas", years=YEARS, offline=False, inputs=False)
+
+    with open(pipeline, "r", encoding="utf-8") as f:
+        groups = json.load(f)
+    first, second, *_ = groups
+    groups[first] = groups[first][:-3]
+    groups["Test group"] = ["FRA", "DEU", "ITA"]
+    del groups[second]
+    with open(pipeline, "w", encoding="utf-8") as f:
+        json.dump(groups, f)
+    mappings.cache_clear()
+
+    plan = plan_update(read_build_state(), build_state(YEARS, offline=False, engine="pandas"))
+    assert plan["groups"] == sorted([first, "Test group"])
+    assert plan["removed_groups"] == [second]
+    assert plan["years"] == []
+
+    budget = one_year_per_chunk() if chunked else None
+    update_trade_dataset(YEARS, offline=False, memory_budget=budget)
+    assert_matches_full_build(tmp_path, monkeypatch)
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_year_edit_matches_full_build(pipeline, tmp_path, monkeypatch, chunked):
+    build_trade_dataset(engine="pandas", years=YEARS, offline=False, inputs=False)
+
+    synthetic_baci_year(YEARS[1], 5_000, seed=1).to_csv(baci_year_path(YEARS[1]), index=False)
+
+    plan = plan_update(read_build_state(), build_state(YEARS, offline=False, engine="pandas"))
+    assert plan["years"] == [YEARS[1]]
+    assert plan["groups"] == []
+
+    budget = one_year_per_chunk() if chunked else None
+    update_trade_dataset(YEARS, offline=False, memory_budget=budget)
+    assert_matches_full_build(tmp_path, monkeypatch)
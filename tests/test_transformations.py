@@ -0,0 +1,168 @@
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.scripts.codes import sorted_dtype
+from src.data.scripts.transformations import add_country_groups, reshape_to_country_flow
+
+ISO3 = [f"C{i:02d}" for i in range(12)]
+GROUPS = {"G1": ISO3[:4], "G2": ISO3[3:7], "G3": ISO3[8:], "G4": ["C00", "C09"]}
+VALUE_COLUMNS = ["value_usd_current", "value_eur_current"]
+
+
+def merge_country_groups(
+    df: pd.DataFrame,
+    membership: pd.DataFrame,
+    group_to_iso: Mapping[str, Sequence[str]],
+) -> pd.DataFrame:
+    """The group views as first computed, by merging with the membership table."""
+    base = df.copy()
+    for col in ["exporter_iso3", "importer_iso3"]:
+        base[col] = base[col].astype("string")
+    importer_membership = membership.rename(
+        columns={"iso3": "importer_iso3", "group": "importer_group"}
+    )
+    exporter_membership = membership.rename(
+        columns={"iso3": "exporter_iso3", "group": "exporter_group"}
+    )
+    overlap = membership.assign(_has_overlap=True)
+
+    cg = base.merge(importer_membership, on="importer_iso3").merge(
+        overlap.rename(columns={"iso3": "exporter_iso3", "group": "importer_group"}),
+        on=["exporter_iso3", "importer_group"],
+        how="left",
+    )
+    cg = (
+        cg[cg["_has_overlap"].isna()]
+        .groupby(
+            ["year", "category", "exporter", "exporter_iso3", "importer_group"],
+            as_index=False,
+        )[VALUE_COLUMNS]
+        .sum()
+        .rename(columns={"importer_group": "importer"})
+        .assign(importer_iso3=pd.NA)
+    )
+
+    gc = base.merge(exporter_membership, on="exporter_iso3").merge(
+        overlap.rename(columns={"iso3": "importer_iso3", "group": "exporter_group"}),
+        on=["importer_iso3", "exporter_group"],
+        how="left",
+    )
+    gc = (
+        gc[gc["_has_overlap"].isna()]
+        .groupby(
+            ["year", "category", "exporter_group", "importer", "importer_iso3"],
+            as_index=False,
+        )[VALUE_COLUMNS]
+        .sum()
+        .rename(columns={"exporter_group": "exporter"})
+        .assign(exporter_iso3=pd.NA)
+    )
+
+    disjoint = pd.DataFrame(
+        [
+            (exporter, importer)
+            for exporter, exporter_members in group_to_iso.items()
+            for importer, importer_members in group_to_iso.items()
+            if set(exporter_members).isdisjoint(importer_members)
+        ],
+        columns=["exporter_group", "importer_group"],
+    )
+    gg = (
+        base.merge(exporter_membership, on="exporter_iso3")
+        .merge(importer_membership, on="importer_iso3")
+        .merge(disjoint, on=["exporter_group", "importer_group"])
+        .groupby(["year", "category", "exporter_group", "importer_group"], as_index=False)[
+            VALUE_COLUMNS
+        ]
+        .sum()
+        .rename(columns={"exporter_group": "exporter", "importer_group": "importer"})
+        .assign(exporter_iso3=pd.NA, importer_iso3=pd.NA)
+    )
+
+    cc = base.groupby(
+        ["year", "category", "exporter_iso3", "exporter", "importer_iso3", "importer"],
+        as_index=False,
+    )[VALUE_COLUMNS].sum()
+    return pd.concat([cg, gc, gg, cc], ignore_index=True)
+
+
+def concat_country_flow(df: pd.DataFrame) -> pd.DataFrame:
+    """The country/partner/flow view as first computed, by concatenating two copies."""
+    exports = df.assign(country=df["exporter"], partner=df["importer"], flow="exports")
+    imports = df.assign(country=df["importer"], partner=df["exporter"], flow="imports")
+    return pd.concat([exports, imports], ignore_index=True)[
+        ["year", "country", "partner", "flow", "category", *VALUE_COLUMNS]
+    ].sort_values(["country", "partner", "flow", "year", "category"], kind="stable")
+
+
+def as_strings(df: pd.DataFrame, columns: list[str]) -> np.ndarray:
+    return df[columns].astype("string").fillna("").to_numpy()
+
+
+@pytest.fixture
+def trade():
+    rng = np.random.default_rng(0)
+    n = 3_000
+    df = pd.DataFrame(
+        {
+            "year": rng.integers(2002, 2006, n),
+            "category": rng.choice(["A", "B", "All products"], n),
+            "exporter_iso3": rng.choice([*ISO3, None], n),
+            "importer_iso3": rng.choice(ISO3, n),
+        }
+    )
+    df = df[df["exporter_iso3"] != df["importer_iso3"]].reset_index(drop=True)
+    # C11 has no name, so its rows are dropped as in the original views
+    names = {code: f"N{code}" for code in ISO3 if code != "C11"}
+    df["exporter"] = df["exporter_iso3"].map(names)
+    df["importer"] = df["importer_iso3"].map(names)
+    for col in VALUE_COLUMNS:
+        df[col] = rng.random(len(df)).astype("float32")
+    return df
+
+
+@pytest.fixture
+def membership():
+    return pd.DataFrame(
+        [(code, group) for group, members in GROUPS.items() for code in members],
+        columns=["iso3", "group"],
+    )
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_group_views_match_merges(trade, membership, categorical):
+    expected = merge_country_groups(trade, membership, GROUPS)
+    if categorical:
+        trade = trade.astype(
+            {
+                "exporter_iso3": sorted_dtype(ISO3),
+                "importer_iso3": sorted_dtype(ISO3),
+                "exporter": sorted_dtype([f"N{code}" for code in ISO3]),
+                "importer": sorted_dtype([f"N{code}" for code in ISO3]),
+                "category": sorted_dtype(["A", "B", "All products"]),
+            }
+        )
+    result = add_country_groups(trade, membership, GROUPS)
+
+    keys = ["year", "category", "exporter", "exporter_iso3", "importer", "importer_iso3"]
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    result = result.sort_values(keys).reset_index(drop=True)
+    assert len(result) == len(expected)
+    assert (as_strings(result, keys) == as_strings(expected, keys)).all()
+    np.testing.assert_allclose(
+        result[VALUE_COLUMNS].astype(float), expected[VALUE_COLUMNS].astype(float), rtol=1e-5
+    )
+
+
+def test_country_flow_matches_concat(trade, membership):
+    grouped = add_country_groups(trade, membership, GROUPS)
+    expected = concat_country_flow(grouped)
+    result = reshape_to_country_flow(grouped)
+
+    keys = ["country", "partner", "flow", "year", "category"]
+    assert list(result.columns) == list(expected.columns)
+    assert (as_strings(result, keys) == as_strings(expected, keys)).all()
+    np.testing.assert_array_equal(result[VALUE_COLUMNS], expected[VALUE_COLUMNS])